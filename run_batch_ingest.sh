@@ -1,23 +1,10 @@
 #!/bin/bash
 
 # Configuration
-SCRIPT_PATH="src/ingest_web.py"
-MAX_DEPTH=2
+SCRIPT_PATH="src/ingest_batch.py"
+SOURCES_FILE="ingest_sources.yaml"   # URLs and directories to ingest
 LOG_FILE="ingest_web.log"
 
-# List of URLs to crawl
-declare -a URLS=(
-    "https://arc42.org/overview"
-    "https://mermaid.js.org/intro/"
-    "https://dbus.freedesktop.org/doc/dbus-specification.html"
-    "https://www.doxygen.nl/manual/markdown.html"
-    "https://protobuf.dev/programming-guides/style/"
-    "https://www.freedesktop.org/software/systemd/man/latest/systemd.service.html"
-    "https://cmake.org/cmake/help/latest/guide/tutorial/index.html"
-    "https://google.github.io/styleguide/cppguide.html"
-    "https://isocpp.github.io/CppCoreGuidelines/CppCoreGuidelines"
-)
-
 # Colors for output
 GREEN='\033[0;32m'
 RED='\033[0;31m'
@@ -37,37 +24,17 @@ else
     exit 1
 fi
 
-# Main Loop
-FAILED_URLS=()
+# All sources are crawled in parallel by one process sharing a single
+# embedder and Chroma writer; it prints a per-source success/failure summary.
+echo -e "\n${YELLOW}Processing: $SOURCES_FILE${NC}" | tee -a "$LOG_FILE"
 
-for url in "${URLS[@]}"; do
-    echo -e "\n${YELLOW}Processing: $url${NC}" | tee -a "$LOG_FILE"
-    
-    python "$SCRIPT_PATH" "$url" --max-depth "$MAX_DEPTH" 2>&1 | tee -a "$LOG_FILE"
-    
-    EXIT_CODE=${PIPESTATUS[0]} # Get exit code of python script
-    
-    if [ $EXIT_CODE -eq 0 ]; then
-        echo -e "${GREEN}✅ Success: $url${NC}" | tee -a "$LOG_FILE"
-    else
-        echo -e "${RED}❌ Failed: $url (Exit Code: $EXIT_CODE)${NC}" | tee -a "$LOG_FILE"
-        FAILED_URLS+=("$url")
-    fi
-    
-    echo "------------------------------------------" | tee -a "$LOG_FILE"
-done
+python "$SCRIPT_PATH" "$SOURCES_FILE" "$@" 2>&1 | tee -a "$LOG_FILE"
 
-# Summary
-echo -e "\n==========================================" | tee -a "$LOG_FILE"
-echo "Ingestion Summary" | tee -a "$LOG_FILE"
-echo "==========================================" | tee -a "$LOG_FILE"
+EXIT_CODE=${PIPESTATUS[0]} # Get exit code of python script
 
-if [ ${#FAILED_URLS[@]} -eq 0 ]; then
-    echo -e "${GREEN}All tasks completed successfully!${NC}" | tee -a "$LOG_FILE"
+if [ $EXIT_CODE -eq 0 ]; then
+    echo -e "${GREEN}✅ Bulk ingestion finished${NC}" | tee -a "$LOG_FILE"
 else
-    echo -e "${RED}Some URLs failed to ingest:${NC}" | tee -a "$LOG_FILE"
-    for failed in "${FAILED_URLS[@]}"; do
-        echo " - $failed" | tee -a "$LOG_FILE"
-    done
+    echo -e "${RED}❌ Bulk ingestion finished with failures (Exit Code: $EXIT_CODE)${NC}" | tee -a "$LOG_FILE"
     exit 1
 fi
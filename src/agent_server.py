@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+RAG Agent Service for AutoDoc-RAG.
+Serves rag_agent.py's question answering over HTTP so a whole team can share
+one warm instance. A plain ASGI application run by uvicorn on one asyncio
+event loop, so many sessions are in flight at once:
+
+  - retrieval: lookups arriving within BATCH_WINDOW of each other are
+    coalesced into one retrieval.search() call (one embedding request and one
+    collection query for the whole batch), run off the event loop; question
+    embeddings for the semantic answer cache are batched the same way;
+  - answers: a question close enough to an earlier one is answered from the
+    semantic answer cache (answer_cache.py) without retrieval or generation;
+  - generation: at most --max-llm-concurrency answers are generated at once
+    (an asyncio semaphore); further questions wait for a slot.
+
+Endpoints:
+    GET  /health  -> {"status": "ok", "in_flight", "waiting_for_llm", "retrieval", "answer_cache", ...}
+    POST /ask     {"question": "...", "k": 5, "search_type": "similarity", "stream": true}
+        stream=true  -> text/event-stream:
+                        event: sources  {"source_documents": [...]}
+                        event: token    {"text": "..."}            (repeated)
+                        event: done     {"answer", "source_documents", "metrics", "cached"}
+                        event: error    {"error": "..."}
+        stream=false -> {"answer", "source_documents", "metrics", "cached"}
+
+source_documents entries: {"rank", "id", "source", "metadata", "page_content"}.
+cached: null, or {"question", "similarity", "saved_s"} of the reused answer.
+
+Usage:
+    python src/rag_agent.py --serve --port 8770 --max-llm-concurrency 2
+    curl -N -X POST localhost:8770/ask -d '{"question": "How do I declare a D-Bus signal?"}'
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from answer_cache import THRESHOLD as ANSWER_CACHE_THRESHOLD, SemanticAnswerCache
+from rag_agent import RETRIEVAL_K, build_messages, create_answer_cache, create_llm, source_records
+from retrieval import SEARCH_TYPES, embed_queries, search
+from streaming import astream_generation
+from tracing import tracer
+
+# Configuration
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8770
+MAX_LLM_CONCURRENCY = 2
+BATCH_WINDOW = 0.01  # seconds a lookup waits for others to join its batch
+MAX_BATCH_SIZE = 32
+MAX_K = 20
+MAX_BODY_BYTES = 64 * 1024
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent lookups into batched calls of a blocking function.
+    The first lookup of a batch opens a BATCH_WINDOW; lookups with the same key
+    that arrive meanwhile join it, up to MAX_BATCH_SIZE. Each batch is one
+    run(key, items) call in a worker thread, returning one result per item.
+    """
+
+    def __init__(self, name: str, run: Callable[[Hashable, List[str]], list],
+                 window: float = BATCH_WINDOW, max_batch_size: int = MAX_BATCH_SIZE):
+        self.name = name
+        self.run = run
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.lookups = 0
+        self._pending: Dict[Hashable, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+
+    async def submit(self, key: Hashable, item: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future))
+        self.lookups += 1
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            self.batches += 1
+            asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key: Hashable, batch: List[Tuple[str, asyncio.Future]]):
+        items = list(dict.fromkeys(item for item, _ in batch))
+        try:
+            with tracer.start_as_current_span(f"agent.{self.name}_batch", attributes={
+                "lookups": len(batch), "items": len(items)
+            }):
+                results = await asyncio.to_thread(self.run, key, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_item = dict(zip(items, results))
+        for item, future in batch:
+            if not future.done():
+                future.set_result(by_item[item])
+
+    def stats(self) -> dict:
+        return {"lookups": self.lookups, "batches": self.batches}
+
+
+def sse_event(event: str, payload: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class AgentApp:
+    """ASGI application answering questions with retrieval + streamed generation."""
+
+    def __init__(self, search_type: str = "similarity", use_cache: bool = True,
+                 max_llm_concurrency: int = MAX_LLM_CONCURRENCY, batch_window: float = BATCH_WINDOW,
+                 answer_cache: bool = True, answer_threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.search_type = search_type
+        self.llm, self.cache = create_llm(use_cache)
+        self.max_llm_concurrency = max(1, max_llm_concurrency)
+        self.retriever = MicroBatcher("retrieve", lambda key, queries: search(queries, *key), batch_window)
+        self.embedder = MicroBatcher("embed", lambda key, questions: embed_queries(questions), batch_window)
+        self.use_answer_cache = answer_cache
+        self.answer_threshold = answer_threshold
+        self._answer_caches: Dict[Tuple[str, int], SemanticAnswerCache] = {}
+        self._llm_slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting_for_llm = 0
+        self.answered = 0
+
+    @property
+    def llm_slots(self) -> asyncio.Semaphore:
+        # Created on first use, inside the server's event loop
+        if self._llm_slots is None:
+            self._llm_slots = asyncio.Semaphore(self.max_llm_concurrency)
+        return self._llm_slots
+
+    def answer_cache(self, search_type: str, k: int) -> Optional[SemanticAnswerCache]:
+        if not self.use_answer_cache:
+            return None
+        if (search_type, k) not in self._answer_caches:
+            self._answer_caches[(search_type, k)] = create_answer_cache(search_type, k, self.answer_threshold)
+        return self._answer_caches[(search_type, k)]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if scope["method"] == "GET" and scope["path"] == "/health":
+            await self._send_json(send, 200, self.health())
+        elif scope["method"] == "POST" and scope["path"] == "/ask":
+            await self._handle_ask(receive, send)
+        else:
+            await self._send_json(send, 404, {"error": "not found"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.cache:
+                    print(self.cache.stats_line())
+                for answer_cache in self._answer_caches.values():
+                    print(answer_cache.stats_line())
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "in_flight": self.in_flight,
+            "waiting_for_llm": self.waiting_for_llm,
+            "answered": self.answered,
+            "max_llm_concurrency": self.max_llm_concurrency,
+            "retrieval": self.retriever.stats(),
+            "embedding": self.embedder.stats(),
+            "answer_cache": {f"{search_type}|{k}": cache.stats()
+                             for (search_type, k), cache in self._answer_caches.items()},
+        }
+
+    async def _send_json(self, send, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_json(self, receive) -> dict:
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ConnectionError("client disconnected")
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_BYTES:
+                raise ValueError(f"request body exceeds {MAX_BODY_BYTES} bytes")
+            if not message.get("more_body"):
+                return json.loads(body.decode("utf-8")) if body else {}
+
+    def _parse_request(self, request: dict) -> Tuple[str, int, str, bool]:
+        if not isinstance(request, dict):
+            raise TypeError("request body must be a JSON object")
+        question = request.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("'question' must be a non-empty string")
+        k = int(request.get("k", RETRIEVAL_K))
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"'k' must be between 1 and {MAX_K}")
+        search_type = request.get("search_type", self.search_type)
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"'search_type' must be one of {SEARCH_TYPES}")
+        return question.strip(), k, search_type, bool(request.get("stream", True))
+
+    async def _handle_ask(self, receive, send):
+        try:
+            question, k, search_type, stream = self._parse_request(await self._read_json(receive))
+        except ConnectionError:
+            return
+        except (TypeError, ValueError) as e:
+            await self._send_json(send, 400, {"error": str(e)})
+            return
+
+        self.in_flight += 1
+        try:
+            with tracer.start_as_current_span("agent.question", attributes={
+                "stream": stream, "search_type": search_type, "k": k, "served": True
+            }):
+                if stream:
+                    await self._answer_stream(question, k, search_type, receive, send)
+                else:
+                    await self._answer_json(question, k, search_type, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _generate(self, question: str, sources: List[Document], on_token) -> dict:
+        """Generate the answer in an LLM slot; returns the metrics record."""
+        messages = build_messages(question, sources)
+        self.waiting_for_llm += 1
+        try:
+            await self.llm_slots.acquire()
+        finally:
+            self.waiting_for_llm -= 1
+        try:
+            _, metrics = await astream_generation(self.llm, messages, question, on_token)
+        finally:
+            self.llm_slots.release()
+        self.answered += 1
+        return metrics.record()
+
+    async def _answer(self, question: str, k: int, search_type: str,
+                      emit: Callable[[str, dict], None]) -> dict:
+        """
+        Answer one question, emitting 'sources' and 'token' events as they
+        become available. Returns the final response.
+        """
+        started = time.perf_counter()
+        answer_cache = self.answer_cache(search_type, k)
+        vector, hit = None, None
+        if answer_cache:
+            vector = await self.embedder.submit(None, question)
+            with tracer.start_as_current_span("agent.answer_cache_lookup") as span:
+                hit = answer_cache.lookup(vector, started)
+                span.set_attribute("hit", hit is not None)
+        if hit:
+            emit("sources", {"source_documents": hit["source_documents"]})
+            emit("token", {"text": hit["answer"]})
+            return {
+                "answer": hit["answer"],
+                "source_documents": hit["source_documents"],
+                "metrics": None,
+                "cached": {key: hit[key] for key in ("question", "similarity", "saved_s")},
+            }
+
+        sources = await self.retriever.submit((k, search_type), question)
+        records = source_records(sources)
+        emit("sources", {"source_documents": records})
+        parts: List[str] = []
+
+        def on_token(text: str):
+            parts.append(text)
+            emit("token", {"text": text})
+
+        metrics = await self._generate(question, sources, on_token)
+        answer = "".join(parts)
+        if answer_cache:
+            answer_cache.store(question, vector, answer, records, time.perf_counter() - started)
+        return {"answer": answer, "source_documents": records, "metrics": metrics, "cached": None}
+
+    async def _answer_json(self, question: str, k: int, search_type: str, send):
+        try:
+            response = await self._answer(question, k, search_type, lambda event, payload: None)
+        except Exception as e:
+            await self._send_json(send, 500, {"error": str(e)})
+            return
+        await self._send_json(send, 200, response)
+
+    async def _answer_stream(self, question: str, k: int, search_type: str, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ]})
+        events: asyncio.Queue = asyncio.Queue()
+
+        def emit(event: str, payload: dict):
+            events.put_nowait(sse_event(event, payload))
+
+        async def answer():
+            emit("done", await self._answer(question, k, search_type, emit))
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        task = asyncio.ensure_future(answer())
+        disconnected = asyncio.ensure_future(watch_disconnect())
+        try:
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait([getter, task, disconnected], return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    await send({"type": "http.response.body", "body": getter.result(), "more_body": True})
+                    continue
+                getter.cancel()
+                if disconnected.done():
+                    # Client went away: stop generating and free the LLM slot
+                    task.cancel()
+                    return
+                while not events.empty():
+                    await send({"type": "http.response.body", "body": events.get_nowait(), "more_body": True})
+                if task.exception() is not None:
+                    await send({"type": "http.response.body", "more_body": True,
+                                "body": sse_event("error", {"error": str(task.exception())})})
+                break
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            if not task.done():
+                task.cancel()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, search_type: str = "similarity",
+          use_cache: bool = True, max_llm_concurrency: int = MAX_LLM_CONCURRENCY,
+          answer_cache: bool = True, answer_threshold: float = ANSWER_CACHE_THRESHOLD):
+    """Run the agent service until interrupted."""
+    import uvicorn
+
+    app = AgentApp(search_type, use_cache, max_llm_concurrency,
+                   answer_cache=answer_cache, answer_threshold=answer_threshold)
+    print(f"✅ RAG agent listening on http://{host}:{port} "
+          f"({search_type} retrieval, {app.max_llm_concurrency} concurrent LLM requests)", flush=True)
+    started = time.perf_counter()
+    uvicorn.run(app, host=host, port=port, log_level="warning", timeout_keep_alive=30)
+    print(f"Shutting down after {time.perf_counter() - started:.0f}s ({app.answered} answers).")
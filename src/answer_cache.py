@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Semantic Answer Cache for AutoDoc-RAG.
+Lets rag_agent.py (CLI and --serve) skip retrieval and generation for
+questions it has effectively answered before: incoming questions are embedded
+and compared with the stored ones, and an answer (with its source list) is
+returned when the cosine similarity reaches THRESHOLD. "what is arc42" and
+"explain the arc42 overview" thus share one 8B-model generation, which the
+exact-prompt LLM cache (llm_cache.py) cannot do.
+
+Entries live in SQLite, bounded to MAX_ENTRIES by least-recent use, and are
+scoped to the collection version (see retrieval_cache.py): after any
+re-ingest, older answers are dropped. Every hit is credited with the time the
+original answer took minus the lookup time, reported by stats_line().
+
+Usage:
+    cache = SemanticAnswerCache(namespace="llama3.1:8b|similarity|5", threshold=0.92)
+    vector = embed_queries([question])[0]
+    hit = cache.lookup(vector)              # {"question", "answer", "source_documents", "similarity", ...} or None
+    ...
+    cache.store(question, vector, answer, source_documents, seconds)
+    print(cache.stats_line())
+
+    python src/answer_cache.py --stats      # or --clear
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from retrieval_cache import VERSION_PATH, VersionWatcher
+
+# Configuration
+CACHE_PATH = "data/answer_cache.sqlite"
+MAX_ENTRIES = 5000
+# Minimum cosine similarity between questions for a cached answer to be reused
+THRESHOLD = float(os.environ.get("AUTODOC_ANSWER_CACHE_THRESHOLD", "0.92"))
+
+
+def unit_vector(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+
+class SemanticAnswerCache:
+    """
+    Nearest-question answer cache: SQLite storage plus an in-memory matrix of
+    the question embeddings of the current namespace and collection version.
+
+    Args:
+        namespace: Settings that change answers (LLM model, search type, k).
+        threshold: Minimum cosine similarity for a hit.
+        cache_path: SQLite file holding the answers.
+        max_entries: Least recently used answers are evicted beyond this count.
+        version_path: Collection version file written by ingestion.
+    """
+
+    def __init__(self, namespace: str = "", threshold: float = THRESHOLD, cache_path: str = CACHE_PATH,
+                 max_entries: int = MAX_ENTRIES, version_path: str = VERSION_PATH):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        self._versions = VersionWatcher(version_path)
+        self._ids: List[int] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " namespace TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " question TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " sources TEXT NOT NULL,"
+            " seconds REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used)")
+        self._conn.commit()
+
+    def _sync(self) -> int:
+        """Current collection version; drops stale answers and reloads the matrix when it changes."""
+        first = self._versions.version is None
+        version, changed = self._versions.current()
+        if changed:
+            if not first:
+                self.invalidations += 1
+            self._conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT id, embedding FROM answers WHERE namespace = ? AND version = ?", (self.namespace, version)
+            ).fetchall()
+            self._ids = [row[0] for row in rows]
+            self._matrix = (np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                            if rows else np.zeros((0, 0), dtype=np.float32))
+        return version
+
+    def lookup(self, vector, started: Optional[float] = None) -> Optional[dict]:
+        """
+        The stored answer of the most similar earlier question, if it is similar enough.
+
+        Args:
+            vector: Embedding of the incoming question.
+            started: perf_counter() when the question arrived (for the saved-time estimate).
+        """
+        query = unit_vector(vector)
+        with self._lock:
+            self._sync()
+            if not self._ids or self._matrix.shape[1] != len(query):
+                self.misses += 1
+                return None
+            similarities = self._matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = self._ids[best]
+            row = self._conn.execute(
+                "SELECT question, answer, sources, seconds FROM answers WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET hits = hits + 1, last_used = ? WHERE id = ?",
+                               (time.time(), entry_id))
+            self._conn.commit()
+            lookup_seconds = time.perf_counter() - started if started is not None else 0.0
+            saved = max(0.0, row[3] - lookup_seconds)
+            self.hits += 1
+            self.saved_seconds += saved
+        return {
+            "question": row[0],
+            "answer": row[1],
+            "source_documents": json.loads(row[2]),
+            "similarity": round(similarity, 4),
+            "saved_s": round(saved, 3),
+        }
+
+    def store(self, question: str, vector, answer: str, source_documents: List[dict], seconds: float):
+        """Remember an answer and the time it took to produce (retrieval + generation)."""
+        embedding = unit_vector(vector)
+        with self._lock:
+            version = self._sync()
+            cursor = self._conn.execute(
+                "INSERT INTO answers (namespace, version, question, embedding, answer, sources, seconds, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, version, question, embedding.tobytes(), answer,
+                 json.dumps(source_documents, ensure_ascii=False, default=str), seconds, time.time())
+            )
+            if not self._ids:
+                self._matrix = embedding[None, :]
+                self._ids = [cursor.lastrowid]
+            elif self._matrix.shape[1] == len(embedding):
+                self._matrix = np.vstack([self._matrix, embedding])
+                self._ids.append(cursor.lastrowid)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if count <= self.max_entries:
+            return
+        victims = {row[0] for row in self._conn.execute(
+            "SELECT id FROM answers ORDER BY last_used ASC LIMIT ?", (count - self.max_entries,)
+        )}
+        self._conn.executemany("DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in victims])
+        keep = [i for i, entry_id in enumerate(self._ids) if entry_id not in victims]
+        self._ids = [self._ids[i] for i in keep]
+        self._matrix = self._matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def totals(self) -> dict:
+        """Stored answers and their reuse across all runs."""
+        with self._lock:
+            count, hits, saved = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * seconds), 0) FROM answers"
+            ).fetchone()
+        return {"answers": count, "hits": hits, "saved_s": round(saved, 1)}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._ids = []
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_s": round(self.saved_seconds, 3),
+            "invalidations": self.invalidations,
+            "threshold": self.threshold,
+        }
+
+    def stats_line(self) -> str:
+        """One-line summary of the cache counters."""
+        stats = self.stats()
+        return (f"Answer cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate'] * 100:.1f}% hit rate), ~{stats['saved_s']:.1f}s saved")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect or clear the semantic answer cache of rag_agent.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/answer_cache.py --stats
+    python src/answer_cache.py --clear
+        """
+    )
+    parser.add_argument("--stats", action="store_true", help="Show stored answers and their reuse")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached answer")
+    args = parser.parse_args()
+
+    if not args.stats and not args.clear:
+        parser.print_help()
+        return
+    cache = SemanticAnswerCache()
+    if args.clear:
+        cache.clear()
+        print(f"🗑️  Cleared {CACHE_PATH}")
+    if args.stats:
+        totals = cache.totals()
+        print(f"📦 {CACHE_PATH}: {totals['answers']} answers, reused {totals['hits']} times "
+              f"(~{totals['saved_s']:.1f}s of retrieval and generation saved)")
+
+
+if __name__ == "__main__":
+    main()
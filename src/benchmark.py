@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+End-to-end Benchmark Suite for AutoDoc-RAG.
+Measures the pipeline against a local fake Ollama server (fake_ollama.py)
+with fixed latencies instead of a real llama3.1:8b, so runs are fast and the
+numbers only move when the code does:
+
+  - ingest: load -> split -> embed -> Chroma throughput (chunks/s),
+  - retrieval: single-query latency p50/p99 per search type over the
+    verify_ingestion.py test queries,
+  - generate: No-RAG and RAG batch generation throughput per concurrency level,
+  - evaluate: batch judge throughput per concurrency level.
+
+Everything runs in a scratch working directory (vector DB, manifest, BM25
+index, generated docs), with the LLM response cache off and the retrieval
+service bypassed. Generation uses a deterministic synthetic Python corpus
+that is also ingested with the --corpus directory. Results are written to
+output/benchmarks/<timestamp>-<commit>.json for comparison across commits.
+
+Usage:
+    python src/benchmark.py                                    # all stages
+    python src/benchmark.py --stages ingest retrieval --corpus docs
+    python src/benchmark.py --concurrency 1 4 16 --ttft 0.5 --parallel 2
+    python src/benchmark.py --compare output/benchmarks/A.json output/benchmarks/B.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from langchain_chroma import Chroma
+
+import embedding_backend
+import fake_ollama
+import retrieval
+import vector_index
+from embedding_backend import create_embeddings
+from evaluate_docs import AGGREGATE_REPORT_NAME, EVALUATION_DIR_NAME, evaluate_batch
+from generate_docs import OUTPUT_BASE_DIR, PROGRESS_FILE_NAME, generate_batch
+from ingest_data import COLLECTION_NAME, DB_DIR, EMBEDDING_MODEL, iter_sources
+from ingest_manifest import directory_scope, load_manifest
+from ingest_pipeline import EMBED_BATCH_SIZE, run_ingest_pipeline
+from tracing import percentile
+from verify_ingestion import TEST_QUERIES
+
+# Configuration
+RESULTS_DIR = "output/benchmarks"
+STAGES = ["ingest", "retrieval", "generate", "evaluate"]
+DEFAULT_CORPUS = "ground_truth"
+CONCURRENCY_LEVELS = [1, 2, 4, 8]
+RETRIEVAL_ROUNDS = 20
+RETRIEVAL_K = 5
+SYNTHETIC_FILES = 8
+SYNTHETIC_FUNCTIONS = 12
+SYNTHETIC_DIR_NAME = "benchcorpus"
+SERVER_START_TIMEOUT = 30
+GENERATION_MODES = ["no-rag", "rag"]
+
+# A stage needs the data produced by the stages listed here
+STAGE_DEPENDENCIES = {"retrieval": ["ingest"], "generate": ["ingest"], "evaluate": ["ingest", "generate"]}
+
+
+def write_synthetic_corpus(root: str, files: int = SYNTHETIC_FILES,
+                           functions: int = SYNTHETIC_FUNCTIONS) -> List[str]:
+    """Deterministic Python modules (same content for every run and commit)."""
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for index in range(files):
+        lines = [f'"""Synthetic module {index}: connection pool and request helpers."""', "import os", ""]
+        lines += [f"class Pool{index}:", f'    """Pool {index} of reusable connections."""', "",
+                  "    def __init__(self, size=4):", "        self.size = size", "        self.items = []", ""]
+        for number in range(functions):
+            lines += [
+                f"    def request_{number}(self, url, timeout={number + 1}):",
+                f'        """Send request {number} to url and return the decoded response."""',
+                "        connection = self.items.pop() if self.items else object()",
+                f"        data = {{'url': url, 'timeout': timeout, 'attempt': {number}}}",
+                "        self.items.append(connection)",
+                "        return data",
+                "",
+            ]
+        lines += [f"def make_pool_{index}(size=4):", f'    """Create Pool{index}."""',
+                  f"    return Pool{index}(size)", ""]
+        path = os.path.join(root, f"module_{index:02d}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        paths.append(path)
+    return paths
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_ollama(args) -> Tuple[subprocess.Popen, str]:
+    """Start fake_ollama.py in its own process and wait until it answers."""
+    port = free_port()
+    command = [
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ollama.py"),
+        "--port", str(port), "--embed-latency", str(args.embed_latency),
+        "--embed-per-input", str(args.embed_per_input), "--ttft", str(args.ttft),
+        "--token-latency", str(args.token_latency), "--output-tokens", str(args.output_tokens),
+        "--parallel", str(args.parallel),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return process, url
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Fake Ollama server did not start on {url}")
+
+
+def server_stats(url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{url}/api/stats", timeout=5) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def stats_delta(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    return {key: after[key] - before.get(key, 0) for key in after if key != "max_queued_chats"}
+
+
+def git_commit() -> Dict[str, object]:
+    """Commit and dirty flag of the source tree being benchmarked."""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=src_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=src_dir,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool):
+    """Swallow the progress output of the benchmarked scripts."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_ingest(source_dirs: List[str], url: str, batch_size: int, workers: Optional[int]) -> dict:
+    """Ingest the source directories into an empty collection."""
+    embeddings = create_embeddings(EMBEDDING_MODEL, url)
+    vector_store = Chroma(persist_directory=DB_DIR, embedding_function=embeddings,
+                          collection_name=COLLECTION_NAME)
+    before = server_stats(url)
+    started = time.perf_counter()
+    stats = run_ingest_pipeline(
+        itertools.chain.from_iterable(iter_sources(source_dir, workers) for source_dir in source_dirs),
+        vector_store,
+        embeddings,
+        load_manifest(),
+        scope=[directory_scope(d) for d in source_dirs],
+        batch_size=batch_size,
+    )
+    seconds = time.perf_counter() - started
+    return {
+        "sources": stats["sources_changed"],
+        "chunks": stats["chunks_written"],
+        "seconds": round(seconds, 3),
+        "chunks_per_sec": round(stats["chunks_written"] / seconds, 2) if seconds > 0 else 0.0,
+        "server": stats_delta(before, server_stats(url)),
+    }
+
+
+def bench_retrieval(rounds: int, k: int) -> dict:
+    """
+    Single-query latency per search type, after one warm-up query each.
+    Timed with the retrieval cache bypassed; cached_p50_ms is the same query
+    served from the cache.
+    """
+    results = {}
+    for search_type in retrieval.SEARCH_TYPES:
+        retrieval.search(TEST_QUERIES[:1], k=k, search_type=search_type, use_cache=False)
+        latencies = []
+        for _ in range(rounds):
+            for query in TEST_QUERIES:
+                started = time.perf_counter()
+                retrieval.search([query], k=k, search_type=search_type, use_cache=False)
+                latencies.append((time.perf_counter() - started) * 1000)
+        retrieval.search(TEST_QUERIES, k=k, search_type=search_type)
+        cached_latencies = []
+        for query in TEST_QUERIES:
+            started = time.perf_counter()
+            retrieval.search([query], k=k, search_type=search_type)
+            cached_latencies.append((time.perf_counter() - started) * 1000)
+        results[search_type] = {
+            "queries": len(latencies),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "cached_p50_ms": round(percentile(cached_latencies, 50), 3),
+        }
+    return results
+
+
+def bench_generate(root: str, mode: str, concurrency: int, url: str) -> dict:
+    """One batch generation run (no resume, no LLM cache)."""
+    before = server_stats(url)
+    started = time.perf_counter()
+    asyncio.run(generate_batch(root, mode, concurrency=concurrency, resume=False, use_cache=False))
+    seconds = time.perf_counter() - started
+    progress_path = os.path.join(OUTPUT_BASE_DIR, mode, os.path.basename(os.path.normpath(root)), PROGRESS_FILE_NAME)
+    with open(progress_path, "r", encoding="utf-8") as f:
+        records = list(json.load(f).values())
+    done = [r for r in records if r.get("status") == "done"]
+    latencies = [r["seconds"] for r in done]
+    tokens = sum(r.get("output_tokens", 0) for r in done)
+    return {
+        "files": len(done),
+        "failed": len(records) - len(done),
+        "seconds": round(seconds, 3),
+        "files_per_min": round(len(done) / (seconds / 60), 2) if seconds > 0 else 0.0,
+        "tokens_per_sec": round(tokens / seconds, 2) if seconds > 0 else 0.0,
+        "file_p50_s": round(percentile(latencies, 50), 3),
+        "file_p95_s": round(percentile(latencies, 95), 3),
+        "server": stats_delta(before, server_stats(url)),
+    }
+
+
+def bench_evaluate(root: str, concurrency: int, url: str) -> dict:
+    """One batch judge run over the docs of the last generation run."""
+    before = server_stats(url)
+    started = time.perf_counter()
+    asyncio.run(evaluate_batch(root, os.path.join(OUTPUT_BASE_DIR, "no-rag"), os.path.join(OUTPUT_BASE_DIR, "rag"),
+                               concurrency=concurrency, use_cache=False))
+    seconds = time.perf_counter() - started
+    report_path = os.path.join(OUTPUT_BASE_DIR, EVALUATION_DIR_NAME,
+                               os.path.basename(os.path.normpath(root)), AGGREGATE_REPORT_NAME)
+    with open(report_path, "r", encoding="utf-8") as f:
+        judge = json.load(f)["judge"]
+    return {
+        "judgments": judge["calls"],
+        "failed": judge["failed"],
+        "seconds": round(seconds, 3),
+        "judgments_per_min": round(judge["calls"] / (seconds / 60), 2) if seconds > 0 else 0.0,
+        "latency_p50_s": judge["latency_p50"],
+        "latency_p95_s": judge["latency_p95"],
+        "server": stats_delta(before, server_stats(url)),
+    }
+
+
+def flatten(data: dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a nested result dict, keyed by their dotted path."""
+    values = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def compare_results(base_path: str, new_path: str):
+    """Print every metric present in both result files with its change."""
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"📊 {base['commit']} ({base['timestamp']}) -> {new['commit']} ({new['timestamp']})")
+    base_values, new_values = flatten(base["results"]), flatten(new["results"])
+    print(f"\n{'Metric':<52} {'Base':>12} {'New':>12} {'Change':>9}")
+    print("-" * 88)
+    for key in base_values:
+        if key not in new_values or ".server." in key:
+            continue
+        old, current = base_values[key], new_values[key]
+        change = f"{(current - old) / old * 100:+.1f}%" if old else "-"
+        print(f"{key[:52]:<52} {old:>12.2f} {current:>12.2f} {change:>9}")
+
+
+def print_summary(results: dict):
+    if "ingest" in results:
+        ingest = results["ingest"]
+        print(f"\n📥 Ingest   : {ingest['chunks']} chunks from {ingest['sources']} sources in {ingest['seconds']:.2f}s "
+              f"({ingest['chunks_per_sec']:.1f} chunks/s)")
+    if "retrieval" in results:
+        print("\n🔍 Retrieval (single query)")
+        for search_type, entry in results["retrieval"].items():
+            cached = f"   cached p50 {entry['cached_p50_ms']:>6.2f} ms" if "cached_p50_ms" in entry else ""
+            print(f"   {search_type:<11} p50 {entry['p50_ms']:>8.2f} ms   p99 {entry['p99_ms']:>8.2f} ms{cached}")
+    if "generate" in results:
+        print(f"\n📝 Generate   {'Mode':<8} {'Conc':>5} {'Files/min':>10} {'Tokens/s':>10} {'p50 s':>8} {'p95 s':>8}")
+        for mode, levels in results["generate"].items():
+            for level, entry in levels.items():
+                print(f"            {mode:<8} {level:>5} {entry['files_per_min']:>10.1f} {entry['tokens_per_sec']:>10.1f} "
+                      f"{entry['file_p50_s']:>8.2f} {entry['file_p95_s']:>8.2f}")
+    if "evaluate" in results:
+        print(f"\n⚖️  Evaluate  {'Conc':>5} {'Judg./min':>10} {'p50 s':>8} {'p95 s':>8}")
+        for level, entry in results["evaluate"].items():
+            print(f"            {level:>5} {entry['judgments_per_min']:>10.1f} "
+                  f"{entry['latency_p50_s']:>8.2f} {entry['latency_p95_s']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingest, retrieval, generation and evaluation against a fake Ollama server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/benchmark.py
+    python src/benchmark.py --stages ingest retrieval --corpus docs
+    python src/benchmark.py --concurrency 1 4 16 --ttft 0.5 --token-latency 0.03 --parallel 2
+    python src/benchmark.py --compare output/benchmarks/20260101-120000-abc1234.json output/benchmarks/20260102-090000-def5678.json
+        """
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stages to run; stages they depend on are added (default: all)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS,
+                        help=f"Directory ingested together with the synthetic sources (default: {DEFAULT_CORPUS})")
+    parser.add_argument("--files", type=int, default=SYNTHETIC_FILES,
+                        help=f"Synthetic source files generated and documented (default: {SYNTHETIC_FILES})")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY_LEVELS,
+                        help=f"Concurrency levels of the generate/evaluate stages (default: {CONCURRENCY_LEVELS})")
+    parser.add_argument("--rounds", type=int, default=RETRIEVAL_ROUNDS,
+                        help=f"Passes over the test queries per search type (default: {RETRIEVAL_ROUNDS})")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help=f"Chunks per embedding request (default: {EMBED_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=None, help="Loader processes (default: CPU count)")
+    parser.add_argument("--embed-latency", type=float, default=fake_ollama.EMBED_LATENCY,
+                        help=f"Fake server: seconds per embed request (default: {fake_ollama.EMBED_LATENCY})")
+    parser.add_argument("--embed-per-input", type=float, default=fake_ollama.EMBED_PER_INPUT,
+                        help=f"Fake server: seconds per embedded text (default: {fake_ollama.EMBED_PER_INPUT})")
+    parser.add_argument("--ttft", type=float, default=fake_ollama.TTFT,
+                        help=f"Fake server: seconds to the first token (default: {fake_ollama.TTFT})")
+    parser.add_argument("--token-latency", type=float, default=fake_ollama.TOKEN_LATENCY,
+                        help=f"Fake server: seconds per further token (default: {fake_ollama.TOKEN_LATENCY})")
+    parser.add_argument("--output-tokens", type=int, default=fake_ollama.OUTPUT_TOKENS,
+                        help=f"Fake server: tokens per reply (default: {fake_ollama.OUTPUT_TOKENS})")
+    parser.add_argument("--parallel", type=int, default=fake_ollama.PARALLEL,
+                        help=f"Fake server: chat requests generated at once (default: {fake_ollama.PARALLEL})")
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temporary directory, removed afterwards)")
+    parser.add_argument("--output", "-o", help=f"Result file (default: {RESULTS_DIR}/<timestamp>-<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the benchmarked scripts")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    stages = set(args.stages)
+    for stage in args.stages:
+        stages.update(STAGE_DEPENDENCIES.get(stage, []))
+    stages = [stage for stage in STAGES if stage in stages]
+
+    source = git_commit()
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    output_path = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"{timestamp}-{source['commit']}.json"))
+    corpus = os.path.abspath(args.corpus)
+    if not os.path.isdir(corpus):
+        print(f"❌ Corpus directory not found: {args.corpus}")
+        return
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="autodoc-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    print(f"🚀 Starting fake Ollama (TTFT {args.ttft}s, {args.token_latency}s/token, {args.parallel} parallel)...")
+    server, url = start_fake_ollama(args)
+    # ChatOllama and the retrieval client's OllamaEmbeddings read OLLAMA_HOST;
+    # the retrieval service (if any) serves the real collection, so bypass it
+    os.environ["OLLAMA_HOST"] = url
+    retrieval.SERVICE_URL = ""
+    embedding_backend.ONNX_MODEL_DIR = os.path.abspath(embedding_backend.ONNX_MODEL_DIR)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+
+    results: Dict[str, object] = {}
+    try:
+        synthetic_root = os.path.join(workdir, SYNTHETIC_DIR_NAME)
+        write_synthetic_corpus(synthetic_root, args.files)
+        print(f"📂 Working directory: {workdir} ({args.files} synthetic sources)")
+        if "ingest" in stages:
+            print(f"⏳ Ingest: {args.corpus} + synthetic sources...")
+            with quiet(not args.verbose):
+                results["ingest"] = bench_ingest([corpus, synthetic_root], url, args.embed_batch_size, args.workers)
+        if "retrieval" in stages:
+            if retrieval.VECTOR_STORE == "mmap":
+                with quiet(not args.verbose):
+                    vector_index.export_collection()
+            print(f"⏳ Retrieval: {len(TEST_QUERIES)} queries x {args.rounds} rounds per search type...")
+            with quiet(not args.verbose):
+                results["retrieval"] = bench_retrieval(args.rounds, RETRIEVAL_K)
+        if "generate" in stages:
+            results["generate"] = {mode: {} for mode in GENERATION_MODES}
+            for level in args.concurrency:
+                for mode in GENERATION_MODES:
+                    print(f"⏳ Generate: {mode}, concurrency {level}...")
+                    with quiet(not args.verbose):
+                        results["generate"][mode][str(level)] = bench_generate(synthetic_root, mode, level, url)
+        if "evaluate" in stages:
+            results["evaluate"] = {}
+            for level in args.concurrency:
+                print(f"⏳ Evaluate: concurrency {level}...")
+                with quiet(not args.verbose):
+                    results["evaluate"][str(level)] = bench_evaluate(synthetic_root, level, url)
+        max_queued = server_stats(url)["max_queued_chats"]
+    finally:
+        os.chdir(previous_dir)
+        server.terminate()
+        server.wait()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": timestamp,
+        **source,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "stages": stages,
+            "corpus": args.corpus,
+            "synthetic_files": args.files,
+            "concurrency": args.concurrency,
+            "retrieval_rounds": args.rounds,
+            "embed_batch_size": args.embed_batch_size,
+            "embedding_backend": embedding_backend.EMBEDDING_BACKEND,
+            "vector_store": retrieval.VECTOR_STORE,
+            "fake_ollama": {
+                "embed_latency": args.embed_latency,
+                "embed_per_input": args.embed_per_input,
+                "ttft": args.ttft,
+                "token_latency": args.token_latency,
+                "output_tokens": args.output_tokens,
+                "parallel": args.parallel,
+                "max_queued_chats": max_queued,
+            },
+        },
+        "results": results,
+    }
+    print_summary(results)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
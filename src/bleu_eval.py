@@ -2,14 +2,29 @@
 """
 BLEU Score Evaluation Script.
 Compares generated documentation against official Ground Truth using BLEU and other metrics.
+
+Scores are computed by a NumPy engine that tokenizes each document once and
+derives BLEU-1..4 and token overlap from the same integer-encoded n-gram
+counts; the numbers match NLTK's sentence_bleu with method1 smoothing.
+Given a directory, every Ground Truth file is paired with the generated docs
+of the same name under output/no-rag and output/rag and scored in a process pool.
 """
 import argparse
+import math
 import os
-from nltk.translate.bleu_score import sentence_bleu, corpus_bleu, SmoothingFunction
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
 from nltk.tokenize import word_tokenize
 import nltk
 import json
 
+from tracing import init_tracing, record_span, tracer
+
 # Ensure NLTK data is available
 try:
     nltk.data.find('tokenizers/punkt')
@@ -20,6 +35,23 @@ try:
 except LookupError:
     nltk.download('punkt_tab', quiet=True)
 
+# BLEU-n weights (BLEU-3 keeps the historical 0.33 weights so scores stay comparable)
+BLEU_WEIGHTS = {
+    "bleu_1": (1, 0, 0, 0),
+    "bleu_2": (0.5, 0.5, 0, 0),
+    "bleu_3": (0.33, 0.33, 0.33, 0),
+    "bleu_4": (0.25, 0.25, 0.25, 0.25),
+}
+MAX_NGRAM = 4
+SMOOTHING_EPSILON = 0.1  # SmoothingFunction().method1 default
+
+# Directory mode: result key -> generated docs sub-directory
+DOC_MODES = {"no_rag": "no-rag", "rag": "rag"}
+GROUND_TRUTH_EXTENSIONS = {".md", ".txt", ".rst"}
+
+# Clipped n-gram matches / candidate n-gram totals per order, and document lengths
+NgramStats = namedtuple("NgramStats", ["matches", "totals", "hyp_len", "ref_len"])
+
 
 def load_document(filepath: str) -> str:
     """Load and return document content."""
@@ -32,8 +64,8 @@ def preprocess_text(text: str) -> list:
     return word_tokenize(text.lower())
 
 
-def calculate_bleu(reference: str, candidate: str) -> dict:
-    """Calculate BLEU scores (1-4 gram) between reference and candidate."""
+def calculate_bleu_nltk(reference: str, candidate: str) -> dict:
+    """Reference implementation: four NLTK sentence_bleu calls (used by --check-nltk)."""
     ref_tokens = preprocess_text(reference)
     cand_tokens = preprocess_text(candidate)
     
@@ -41,78 +73,290 @@ def calculate_bleu(reference: str, candidate: str) -> dict:
     smoothing = SmoothingFunction().method1
     
     # Individual n-gram scores
-    bleu_1 = sentence_bleu([ref_tokens], cand_tokens, weights=(1, 0, 0, 0), smoothing_function=smoothing)
-    bleu_2 = sentence_bleu([ref_tokens], cand_tokens, weights=(0.5, 0.5, 0, 0), smoothing_function=smoothing)
-    bleu_3 = sentence_bleu([ref_tokens], cand_tokens, weights=(0.33, 0.33, 0.33, 0), smoothing_function=smoothing)
-    bleu_4 = sentence_bleu([ref_tokens], cand_tokens, weights=(0.25, 0.25, 0.25, 0.25), smoothing_function=smoothing)
-    
-    return {
-        "bleu_1": round(bleu_1 * 100, 2),
-        "bleu_2": round(bleu_2 * 100, 2),
-        "bleu_3": round(bleu_3 * 100, 2),
-        "bleu_4": round(bleu_4 * 100, 2),
+    scores = {
+        name: sentence_bleu([ref_tokens], cand_tokens, weights=weights, smoothing_function=smoothing)
+        for name, weights in BLEU_WEIGHTS.items()
     }
+    return {name: round(score * 100, 2) for name, score in scores.items()}
 
 
-def calculate_token_overlap(reference: str, candidate: str) -> dict:
-    """Calculate token-level overlap metrics."""
-    ref_tokens = set(preprocess_text(reference))
-    cand_tokens = set(preprocess_text(candidate))
-    
-    intersection = ref_tokens & cand_tokens
+def encode_tokens(*token_lists: List[str]) -> List[np.ndarray]:
+    """Map token lists onto one shared integer vocabulary."""
+    vocab: Dict[str, int] = {}
+    return [
+        np.fromiter((vocab.setdefault(token, len(vocab)) for token in tokens), dtype=np.int64, count=len(tokens))
+        for tokens in token_lists
+    ]
+
+
+def ngram_stats(reference: np.ndarray, candidate: np.ndarray, max_n: int = MAX_NGRAM) -> NgramStats:
+    """
+    Clipped n-gram matches and candidate n-gram totals for n = 1..max_n.
+
+    n-grams are identified by integers: each n-gram ID is built from the
+    (n-1)-gram ID and the next token, then re-compacted with np.unique, so
+    counting is a pair of bincounts per order instead of tuple hashing.
+    """
+    base = int(max(reference.max(initial=-1), candidate.max(initial=-1))) + 1
+    ref_grams, cand_grams = reference, candidate
+    matches, totals = [], []
+    for n in range(1, max_n + 1):
+        if n > 1:
+            ref_grams = ref_grams[:-1] * base + reference[n - 1:]
+            cand_grams = cand_grams[:-1] * base + candidate[n - 1:]
+        unique, inverse = np.unique(np.concatenate([ref_grams, cand_grams]), return_inverse=True)
+        ref_grams, cand_grams = inverse[:len(ref_grams)], inverse[len(ref_grams):]
+        ref_counts = np.bincount(ref_grams, minlength=len(unique))
+        cand_counts = np.bincount(cand_grams, minlength=len(unique))
+        matches.append(int(np.minimum(ref_counts, cand_counts).sum()))
+        totals.append(max(1, len(cand_grams)))
+    return NgramStats(matches, totals, len(candidate), len(reference))
+
+
+def sum_stats(stats: List[NgramStats]) -> NgramStats:
+    """Corpus-level statistics: n-gram counts and lengths summed over all pairs."""
+    return NgramStats(
+        [sum(s.matches[i] for s in stats) for i in range(MAX_NGRAM)],
+        [sum(s.totals[i] for s in stats) for i in range(MAX_NGRAM)],
+        sum(s.hyp_len for s in stats),
+        sum(s.ref_len for s in stats),
+    )
+
+
+def bleu_from_stats(stats: NgramStats) -> dict:
+    """
+    BLEU-1..4 from n-gram statistics, following NLTK corpus_bleu exactly:
+    brevity penalty exp(1 - r/c), method1 smoothing (epsilon for zero
+    matches) and 0 when there is no unigram match.
+    """
+    if stats.hyp_len > stats.ref_len:
+        bp = 1
+    elif stats.hyp_len == 0:
+        bp = 0
+    else:
+        bp = math.exp(1 - stats.ref_len / stats.hyp_len)
+
+    if stats.matches[0] == 0:
+        return {name: 0.0 for name in BLEU_WEIGHTS}
+
+    p_n = [
+        (match + SMOOTHING_EPSILON) / total if match == 0 else match / total
+        for match, total in zip(stats.matches, stats.totals)
+    ]
+    scores = {}
+    for name, weights in BLEU_WEIGHTS.items():
+        log_sum = math.fsum(w_i * math.log(p_i) for w_i, p_i in zip(weights, p_n) if p_i > 0)
+        scores[name] = round(bp * math.exp(log_sum) * 100, 2)
+    return scores
+
+
+def overlap_from_ids(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Token-set overlap of two encoded documents."""
+    ref_vocab = np.unique(reference)
+    cand_vocab = np.unique(candidate)
+    overlap = len(np.intersect1d(ref_vocab, cand_vocab, assume_unique=True))
     
-    precision = len(intersection) / len(cand_tokens) if cand_tokens else 0
-    recall = len(intersection) / len(ref_tokens) if ref_tokens else 0
+    precision = overlap / len(cand_vocab) if len(cand_vocab) else 0
+    recall = overlap / len(ref_vocab) if len(ref_vocab) else 0
     f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
     
     return {
         "precision": round(precision * 100, 2),
         "recall": round(recall * 100, 2),
         "f1": round(f1 * 100, 2),
-        "overlap_tokens": len(intersection),
+        "overlap_tokens": overlap,
     }
 
 
+def score_candidates(reference: str, candidates: Dict[str, str]) -> Tuple[dict, Dict[str, NgramStats]]:
+    """
+    BLEU and overlap of several candidates against one reference.
+    Every document is tokenized exactly once.
+
+    Returns:
+        ({name: {"bleu": ..., "overlap": ...}}, {name: NgramStats})
+    """
+    names = list(candidates)
+    with tracer.start_as_current_span("bleu.tokenize", attributes={"documents": len(names) + 1}):
+        encoded = encode_tokens(preprocess_text(reference), *(preprocess_text(candidates[n]) for n in names))
+    ref_ids = encoded[0]
+    results, stats = {}, {}
+    with tracer.start_as_current_span("bleu.score", attributes={"candidates": len(names), "ref_tokens": len(ref_ids)}):
+        for name, cand_ids in zip(names, encoded[1:]):
+            stats[name] = ngram_stats(ref_ids, cand_ids)
+            results[name] = {
+                "bleu": bleu_from_stats(stats[name]),
+                "overlap": overlap_from_ids(ref_ids, cand_ids),
+            }
+    return results, stats
+
+
+def calculate_bleu(reference: str, candidate: str) -> dict:
+    """Calculate BLEU scores (1-4 gram) between reference and candidate."""
+    return score_candidates(reference, {"candidate": candidate})[0]["candidate"]["bleu"]
+
+
+def calculate_token_overlap(reference: str, candidate: str) -> dict:
+    """Calculate token-level overlap metrics."""
+    return score_candidates(reference, {"candidate": candidate})[0]["candidate"]["overlap"]
+
+
+def find_score_pairs(ground_truth_dir: str, output_dir: str) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Match Ground Truth files with generated docs of the same name.
+
+    Returns:
+        (ground truth path, {"no_rag": doc path, "rag": doc path}) pairs; a mode
+        is omitted when it has no doc for that file. The shallowest doc wins
+        when several share a name.
+    """
+    docs: Dict[str, Dict[str, str]] = {}
+    for key, mode_dir in DOC_MODES.items():
+        found = []
+        for dirpath, _, filenames in os.walk(os.path.join(output_dir, mode_dir)):
+            found.extend(os.path.join(dirpath, name) for name in filenames if name.endswith(".md"))
+        for path in sorted(found, key=lambda p: (p.count(os.sep), p)):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            docs.setdefault(stem, {}).setdefault(key, path)
+
+    pairs = []
+    for dirpath, dirnames, filenames in os.walk(ground_truth_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in GROUND_TRUTH_EXTENSIONS and stem in docs:
+                pairs.append((os.path.join(dirpath, name), docs[stem]))
+    return pairs
+
+
+def score_pair_files(ground_truth_path: str, doc_paths: Dict[str, str],
+                     check_nltk: bool = False) -> Tuple[dict, Dict[str, NgramStats], float]:
+    """Process pool task: score one Ground Truth file against its generated docs (and the seconds it took)."""
+    started = time.perf_counter()
+    reference = load_document(ground_truth_path)
+    candidates = {key: load_document(path) for key, path in doc_paths.items()}
+    results, stats = score_candidates(reference, candidates)
+    for key, path in doc_paths.items():
+        results[key]["path"] = path
+        if check_nltk:
+            expected = calculate_bleu_nltk(reference, candidates[key])
+            results[key]["nltk_max_diff"] = max(abs(expected[m] - results[key]["bleu"][m]) for m in expected)
+    return {"ground_truth": ground_truth_path, **results}, stats, time.perf_counter() - started
+
+
+def score_directory(ground_truth_dir: str, output_dir: str, output_path: str,
+                    workers: Optional[int] = None, check_nltk: bool = False):
+    """
+    Score every Ground Truth / generated doc pair in a process pool.
+
+    Args:
+        ground_truth_dir: Directory of Ground Truth documents (searched recursively).
+        output_dir: Directory containing the no-rag/ and rag/ generated docs.
+        output_path: JSON file receiving per-pair results and the summary.
+        workers: Process pool size (default: CPU count).
+        check_nltk: Also score every pair with NLTK and record the difference.
+    """
+    pairs = find_score_pairs(ground_truth_dir, output_dir)
+    if not pairs:
+        print(f"❌ No Ground Truth file in {ground_truth_dir} has a generated doc of the same name in {output_dir}")
+        return
+    print(f"📂 Scoring {len(pairs)} Ground Truth files against {output_dir} ({workers or os.cpu_count()} workers)")
+
+    started = time.perf_counter()
+    pair_results, pair_stats = [], {key: [] for key in DOC_MODES}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(score_pair_files, path, doc_paths, check_nltk) for path, doc_paths in pairs]
+        for future in as_completed(futures):
+            result, stats, seconds = future.result()
+            # Scored in a worker process: the span is recorded here from the worker's timing
+            record_span("bleu.score_pair", seconds, {"ground_truth": result["ground_truth"], "docs": len(stats)})
+            pair_results.append(result)
+            for key, s in stats.items():
+                pair_stats[key].append(s)
+    elapsed = time.perf_counter() - started
+    pair_results.sort(key=lambda r: r["ground_truth"])
+
+    summary = {"pairs": len(pair_results), "seconds": round(elapsed, 2)}
+    for key in DOC_MODES:
+        scored = [r[key] for r in pair_results if key in r]
+        if not scored:
+            continue
+        summary[key] = {
+            "documents": len(scored),
+            "corpus_bleu": bleu_from_stats(sum_stats(pair_stats[key])),
+            "mean_bleu": {m: round(sum(r["bleu"][m] for r in scored) / len(scored), 2) for m in BLEU_WEIGHTS},
+            "mean_overlap": {m: round(sum(r["overlap"][m] for r in scored) / len(scored), 2)
+                             for m in ["precision", "recall", "f1"]},
+        }
+        if check_nltk:
+            summary[key]["nltk_max_diff"] = max(r["nltk_max_diff"] for r in scored)
+
+    # Print Results
+    print("\n" + "=" * 60)
+    print("📊 BLEU-4 PER DOCUMENT")
+    print("=" * 60)
+    print(f"\n{'Ground Truth':<34} {'No-RAG':>8} {'RAG':>8} {'Δ':>8}")
+    print("-" * 60)
+    for result in pair_results:
+        name = os.path.relpath(result["ground_truth"], ground_truth_dir)
+        no_rag_val = result.get("no_rag", {}).get("bleu", {}).get("bleu_4")
+        rag_val = result.get("rag", {}).get("bleu", {}).get("bleu_4")
+        delta = f"{rag_val - no_rag_val:+.2f}" if no_rag_val is not None and rag_val is not None else "-"
+        no_rag_str = f"{no_rag_val:.2f}" if no_rag_val is not None else "-"
+        rag_str = f"{rag_val:.2f}" if rag_val is not None else "-"
+        print(f"{name[:34]:<34} {no_rag_str:>8} {rag_str:>8} {delta:>8}")
+    print("-" * 60)
+    for key in DOC_MODES:
+        if key in summary:
+            corpus = summary[key]["corpus_bleu"]
+            print(f"Corpus BLEU ({key}): " + ", ".join(f"{m.upper()} {corpus[m]:.2f}%" for m in BLEU_WEIGHTS))
+            if check_nltk:
+                print(f"   max |Δ| vs NLTK: {summary[key]['nltk_max_diff']:.2f}")
+    print(f"\n⏱️  {len(pair_results)} pairs in {elapsed:.2f}s")
+
+    with open(output_path, 'w') as f:
+        json.dump({"summary": summary, "pairs": pair_results}, f, indent=2)
+    print(f"💾 Results saved to: {output_path}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Compare generated docs with Ground Truth using BLEU score")
-    parser.add_argument("ground_truth", help="Path to the Ground Truth (official) documentation")
+    parser.add_argument("ground_truth", help="Path to the Ground Truth (official) documentation, or a directory of them")
     parser.add_argument("--no-rag", dest="no_rag", help="Path to No-RAG generated documentation")
     parser.add_argument("--rag", help="Path to RAG generated documentation")
-    parser.add_argument("--output", "-o", default="output/bleu_results.json", help="Output file path for results")
+    parser.add_argument("--output", "-o", help="Output file path for results "
+                        "(default: output/bleu_results.json, or output/bleu_results_batch.json for a directory)")
+    parser.add_argument("--docs-dir", default="output",
+                        help="Directory mode: directory containing no-rag/ and rag/ docs (default: output)")
+    parser.add_argument("--workers", type=int, help="Directory mode: number of worker processes (default: CPU count)")
+    parser.add_argument("--check-nltk", action="store_true",
+                        help="Directory mode: also score with NLTK and report the largest difference")
     
     args = parser.parse_args()
+    init_tracing("bleu_eval")
+    
+    if os.path.isdir(args.ground_truth):
+        score_directory(args.ground_truth, args.docs_dir, args.output or "output/bleu_results_batch.json",
+                        workers=args.workers, check_nltk=args.check_nltk)
+        return
     
     # Load Ground Truth
     print(f"📖 Loading Ground Truth: {args.ground_truth}")
     ground_truth = load_document(args.ground_truth)
     
-    results = {}
+    candidates = {}
     
     # Evaluate No-RAG
     if args.no_rag and os.path.exists(args.no_rag):
         print(f"📄 Loading No-RAG doc: {args.no_rag}")
-        no_rag_doc = load_document(args.no_rag)
-        
-        bleu_scores = calculate_bleu(ground_truth, no_rag_doc)
-        overlap = calculate_token_overlap(ground_truth, no_rag_doc)
-        
-        results["no_rag"] = {
-            "bleu": bleu_scores,
-            "overlap": overlap,
-        }
+        candidates["no_rag"] = load_document(args.no_rag)
     
     # Evaluate RAG
     if args.rag and os.path.exists(args.rag):
         print(f"📄 Loading RAG doc: {args.rag}")
-        rag_doc = load_document(args.rag)
-        
-        bleu_scores = calculate_bleu(ground_truth, rag_doc)
-        overlap = calculate_token_overlap(ground_truth, rag_doc)
-        
-        results["rag"] = {
-            "bleu": bleu_scores,
-            "overlap": overlap,
-        }
+        candidates["rag"] = load_document(args.rag)
+    
+    results, _ = score_candidates(ground_truth, candidates)
     
     # Print Results
     print("\n" + "=" * 60)
@@ -156,7 +400,7 @@ def main():
     print("=" * 60)
     
     # Save results
-    output_path = args.output
+    output_path = args.output or "output/bleu_results.json"
     with open(output_path, 'w') as f:
         json.dump(results, f, indent=2)
     print(f"\n💾 Results saved to: {output_path}")
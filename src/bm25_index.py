@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Lexical BM25 Index for AutoDoc-RAG.
+An inverted index over the same chunks as the Chroma collection, kept next to
+it in data/bm25_index.sqlite. Code documentation queries are full of exact
+identifiers (NMDBusManager, Session.send, JoinHandle) that dense retrieval
+often misses; BM25 matches them directly and without an embedding round-trip.
+
+Postings live on disk and are updated per chunk: ingestion adds and removes
+chunks without loading or rewriting the index, and every chunk is tokenized
+once, when it is added. Searches read only the postings of the query terms,
+and readers in other processes see each committed write without reloading.
+
+The ingestion pipeline keeps the index in sync. To (re)build it from an
+existing collection (also migrates a pre-SQLite data/bm25_index.json):
+    python src/bm25_index.py --rebuild
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from retrieval_cache import bump_version
+
+# Configuration
+INDEX_PATH = "data/bm25_index.sqlite"
+LEGACY_INDEX_PATH = "data/bm25_index.json"
+DB_DIR = "data/vector_db"
+COLLECTION_NAME = "autodoc_rag"
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+SQL_BATCH = 500  # bound parameters per IN (...) lookup
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:(?:\.|::)[A-Za-z_][A-Za-z0-9_]*)*|\d+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Identifier-aware tokenizer.
+    'Session.send' yields 'session.send', 'session' and 'send';
+    'JoinHandle' yields 'joinhandle', 'join' and 'handle'.
+    """
+    tokens = []
+    for match in IDENTIFIER_PATTERN.findall(text):
+        parts = re.split(r"\.|::", match)
+        tokens.append(match.lower())
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+        for part in parts:
+            words = [w.lower() for w in CAMEL_PATTERN.findall(part.replace("_", " "))]
+            if len(words) > 1:
+                tokens.extend(words)
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 inverted index in SQLite with add/remove by chunk ID.
+
+    Terms are interned with their document frequency, postings hold
+    (term, chunk, tf, chunk length), and each chunk keeps the IDs of its
+    terms so it can be removed without tokenizing it again.
+
+    Args:
+        path: SQLite file of the index (created if missing).
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        index_dir = os.path.dirname(path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " chunk INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL UNIQUE,"
+            " text TEXT NOT NULL,"
+            " metadata TEXT NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " terms BLOB NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS terms ("
+            " term_id INTEGER PRIMARY KEY,"
+            " term TEXT NOT NULL UNIQUE,"
+            " df INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term_id INTEGER NOT NULL,"
+            " chunk INTEGER NOT NULL,"
+            " tf INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " PRIMARY KEY (term_id, chunk)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS totals (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO totals VALUES ('chunks', 0), ('length', 0)")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._totals()[0]
+
+    def _totals(self) -> Tuple[int, int]:
+        totals = dict(self._conn.execute("SELECT key, value FROM totals"))
+        return totals["chunks"], totals["length"]
+
+    def _term_ids(self, terms: List[str]) -> Dict[str, Tuple[int, int]]:
+        """term -> (term_id, df) for the known terms among `terms`."""
+        found = {}
+        for start in range(0, len(terms), SQL_BATCH):
+            part = terms[start:start + SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT term, term_id, df FROM terms WHERE term IN ({','.join('?' * len(part))})", part
+            )
+            found.update((term, (term_id, df)) for term, term_id, df in rows)
+        return found
+
+    def term_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Optional[dict]], commit: bool = True):
+        """Add or replace chunks."""
+        with self._lock:
+            self._remove(ids)
+            counted = [Counter(tokenize(text or "")) for text in texts]
+            vocabulary = sorted({term for term_counts in counted for term in term_counts})
+            self._conn.executemany("INSERT OR IGNORE INTO terms (term, df) VALUES (?, 0)",
+                                   [(term,) for term in vocabulary])
+            term_ids = {term: term_id for term, (term_id, _) in self._term_ids(vocabulary).items()}
+
+            document_frequency: Counter = Counter()
+            postings = []
+            added_length = 0
+            for chunk_id, text, metadata, term_counts in zip(ids, texts, metadatas, counted):
+                length = sum(term_counts.values())
+                chunk_terms = array("I", (term_ids[term] for term in term_counts))
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (id, text, metadata, length, terms) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, text or "", json.dumps(metadata or {}, ensure_ascii=False, default=str),
+                     length, chunk_terms.tobytes())
+                )
+                postings.extend((term_ids[term], cursor.lastrowid, count, length)
+                                for term, count in term_counts.items())
+                document_frequency.update(chunk_terms)
+                added_length += length
+            # Inserted in key order, so each touched page of the postings tree is visited once
+            postings.sort()
+            self._conn.executemany("INSERT INTO postings (term_id, chunk, tf, length) VALUES (?, ?, ?, ?)", postings)
+            self._conn.executemany("UPDATE terms SET df = df + ? WHERE term_id = ?",
+                                   [(count, term_id) for term_id, count in document_frequency.items()])
+            self._update_totals(len(ids), added_length)
+            if commit:
+                self._conn.commit()
+
+    def remove(self, ids: List[str], commit: bool = True):
+        """Remove chunks; unknown IDs are ignored."""
+        with self._lock:
+            self._remove(ids)
+            if commit:
+                self._conn.commit()
+
+    def _remove(self, ids: List[str]):
+        document_frequency: Counter = Counter()
+        removed, removed_length = 0, 0
+        for start in range(0, len(ids), SQL_BATCH):
+            part = ids[start:start + SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT chunk, length, terms FROM chunks WHERE id IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for chunk, length, blob in rows:
+                chunk_terms = array("I")
+                chunk_terms.frombytes(blob)
+                self._conn.executemany("DELETE FROM postings WHERE term_id = ? AND chunk = ?",
+                                       [(term_id, chunk) for term_id in chunk_terms])
+                document_frequency.update(chunk_terms)
+                removed += 1
+                removed_length += length
+            self._conn.executemany("DELETE FROM chunks WHERE chunk = ?", [(row[0],) for row in rows])
+        if removed:
+            self._conn.executemany("UPDATE terms SET df = df - ? WHERE term_id = ?",
+                                   [(count, term_id) for term_id, count in document_frequency.items()])
+            self._conn.execute("DELETE FROM terms WHERE df <= 0")
+            self._update_totals(-removed, -removed_length)
+
+    def _update_totals(self, chunks: int, length: int):
+        self._conn.executemany("UPDATE totals SET value = value + ? WHERE key = ?",
+                               [(chunks, "chunks"), (length, "length")])
+
+    def clear(self, commit: bool = True):
+        """Remove every chunk."""
+        with self._lock:
+            for table in ("chunks", "terms", "postings"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute("UPDATE totals SET value = 0")
+            if commit:
+                self._conn.commit()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Return the top-k (chunk ID, BM25 score) pairs for a query."""
+        with self._lock:
+            n_docs, total_length = self._totals()
+            terms = self._term_ids(sorted(set(tokenize(query)))).values() if n_docs else []
+            if not terms:
+                return []
+            weights = [(term_id, math.log(1 + (n_docs - df + 0.5) / (df + 0.5))) for term_id, df in terms]
+            # Scored and ranked inside SQLite: only the postings of the query terms are read
+            rows = self._conn.execute(
+                f"WITH query (term_id, idf) AS (VALUES {', '.join(['(?, ?)'] * len(weights))}) "
+                "SELECT c.id, s.score FROM ("
+                "  SELECT p.chunk, SUM(q.idf * p.tf * ? / (p.tf + ? * (? + ? * p.length))) AS score"
+                "  FROM query q JOIN postings p ON p.term_id = q.term_id"
+                "  GROUP BY p.chunk ORDER BY score DESC, p.chunk LIMIT ?"
+                ") s JOIN chunks c ON c.chunk = s.chunk ORDER BY s.score DESC, s.chunk",
+                [value for weight in weights for value in weight]
+                + [BM25_K1 + 1, BM25_K1, 1 - BM25_B, BM25_B * n_docs / max(total_length, 1), k]
+            ).fetchall()
+        return [(chunk_id, score) for chunk_id, score in rows]
+
+    def get_document(self, chunk_id: str) -> Document:
+        """Return a stored chunk as a Document."""
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+        if row is None:
+            raise KeyError(chunk_id)
+        return Document(id=chunk_id, page_content=row[0], metadata=json.loads(row[1]))
+
+
+def document_key(doc: Document) -> str:
+    """Identity of a retrieved chunk, used to merge result lists."""
+    return doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 5, rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Merge ranked result lists with reciprocal-rank fusion.
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, 1):
+            key = document_key(doc)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+def rebuild_from_collection(path: str = INDEX_PATH, batch_size: int = 1000) -> BM25Index:
+    """
+    Re-index every chunk stored in the Chroma collection, in one transaction,
+    so readers keep seeing the previous index until the rebuild commits.
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(persist_directory=DB_DIR, collection_name=COLLECTION_NAME)._collection
+    index = BM25Index(path)
+    index.clear(commit=False)
+    ids = collection.get(include=[])["ids"]
+    for start in range(0, len(ids), batch_size):
+        page = collection.get(ids=ids[start:start + batch_size], include=["documents", "metadatas"])
+        index.add(page["ids"], page["documents"], page["metadatas"], commit=False)
+    index.commit()
+    if os.path.exists(LEGACY_INDEX_PATH):
+        os.remove(LEGACY_INDEX_PATH)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build or query the lexical BM25 index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/bm25_index.py --rebuild
+    python src/bm25_index.py --query "NMDBusManager signal"
+        """
+    )
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from the Chroma collection")
+    parser.add_argument("--query", help="Run a lexical query against the index")
+    parser.add_argument("-k", type=int, default=5, help="Number of results for --query (default: 5)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"🔨 Rebuilding BM25 index from '{DB_DIR}'...")
+        index = rebuild_from_collection()
+        bump_version()
+        print(f"✅ Indexed {len(index)} chunks ({index.term_count()} terms) to {INDEX_PATH}")
+
+    if args.query:
+        index = BM25Index()
+        for rank, (chunk_id, score) in enumerate(index.search(args.query, args.k), 1):
+            source = index.get_document(chunk_id).metadata.get("source", "Unknown")
+            print(f"{rank}. [{score:.2f}] {source}")
+
+    if not args.rebuild and not args.query:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Parallel Document Loading for AutoDoc-RAG.
+Loads Markdown and PDF files in a process pool instead of two serial
+DirectoryLoader passes. PDF text extraction (pypdf) is pure Python and
+CPU-bound, so every PDF is a task of its own and large PDFs are further split
+into page ranges that are extracted by different workers. Small Markdown files
+are grouped into one task to keep the inter-process overhead low.
+
+Sources are yielded as soon as all of their parts are done (not in directory
+order), each as (source, documents) with one document per Markdown file or
+per PDF page, like TextLoader / PyPDFLoader.
+
+Usage:
+    timings = LoadTimings()
+    for source, docs in iter_text_documents("docs", workers=4, timings=timings):
+        ...
+    timings.print_report()
+
+    python src/doc_loader.py docs --workers 4          # load only, print the timing report
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pypdf
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
+
+from tracing import init_tracing, record_span
+
+# Configuration
+TEXT_EXTENSIONS = {".md": "markdown", ".pdf": "pdf"}
+PDF_PAGES_PER_TASK = 32
+MARKDOWN_FILES_PER_TASK = 32
+TASKS_PER_WORKER = 4
+EXCLUDED_DIRS = {".git", ".venv", "venv", "node_modules", "__pycache__"}
+
+# PDF document info fields copied into page metadata
+PDF_INFO_FIELDS = {"/Title": "title", "/Author": "author", "/Subject": "subject",
+                   "/Creator": "creator", "/Producer": "producer"}
+
+
+def discover_text_files(source_dir: str) -> List[str]:
+    """Markdown and PDF files under a directory, in walk order."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS)
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS:
+                files.append(os.path.join(dirpath, name))
+    return files
+
+
+def file_type(path: str) -> str:
+    return TEXT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "other")
+
+
+def pdf_page_count(path: str) -> int:
+    """Number of pages of a PDF (reads the page tree only, no text extraction)."""
+    return len(pypdf.PdfReader(path).pages)
+
+
+def pdf_metadata(reader: pypdf.PdfReader, path: str) -> Dict:
+    """Document-level metadata shared by every page of a PDF."""
+    metadata = {"source": path, "total_pages": len(reader.pages)}
+    info = reader.metadata or {}
+    for key, name in PDF_INFO_FIELDS.items():
+        value = info.get(key)
+        if isinstance(value, str) and value.strip():
+            metadata[name] = value.strip()
+    return metadata
+
+
+def load_pdf_pages(path: str, start: int, stop: int) -> List[Document]:
+    """Extract pages [start, stop) of a PDF, one Document per page (as PyPDFLoader)."""
+    reader = pypdf.PdfReader(path)
+    metadata = pdf_metadata(reader, path)
+    labels = reader.page_labels
+    documents = []
+    for number in range(start, min(stop, len(reader.pages))):
+        text = reader.pages[number].extract_text(extraction_mode="plain").strip()
+        documents.append(Document(
+            page_content=text,
+            metadata={**metadata, "page": number, "page_label": labels[number]}
+        ))
+    return documents
+
+
+def load_markdown(path: str) -> List[Document]:
+    return TextLoader(path).load()
+
+
+def run_task(task: Tuple) -> List[Tuple[str, int, List[Document], float]]:
+    """
+    Process pool task.
+
+    Args:
+        task: ("markdown", [paths]) or ("pdf", path, part, start, stop).
+
+    Returns:
+        (path, part, documents, seconds) for every file (part) of the task.
+    """
+    results = []
+    if task[0] == "markdown":
+        for path in task[1]:
+            started = time.perf_counter()
+            documents = load_markdown(path)
+            results.append((path, 0, documents, time.perf_counter() - started))
+    else:
+        _, path, part, start, stop = task
+        started = time.perf_counter()
+        documents = load_pdf_pages(path, start, stop)
+        results.append((path, part, documents, time.perf_counter() - started))
+    return results
+
+
+def plan_tasks(files: List[str], pages_per_task: int = PDF_PAGES_PER_TASK) -> Tuple[List[Tuple], Dict[str, int]]:
+    """
+    Split the files into pool tasks.
+
+    Returns:
+        The tasks, and the number of parts every file is loaded in.
+    """
+    tasks, parts = [], {}
+    markdown = []
+    for path in files:
+        if file_type(path) == "markdown":
+            markdown.append(path)
+            parts[path] = 1
+            if len(markdown) >= MARKDOWN_FILES_PER_TASK:
+                tasks.append(("markdown", markdown))
+                markdown = []
+            continue
+        try:
+            pages = pdf_page_count(path)
+        except Exception:
+            pages = 0  # Let a worker raise the real error
+        ranges = [(start, start + pages_per_task) for start in range(0, pages, pages_per_task)] or [(0, 0)]
+        parts[path] = len(ranges)
+        for part, (start, stop) in enumerate(ranges):
+            tasks.append(("pdf", path, part, start, stop))
+    if markdown:
+        tasks.append(("markdown", markdown))
+    return tasks, parts
+
+
+class LoadTimings:
+    """Per file type counters of the load phase."""
+
+    def __init__(self):
+        self.types: Dict[str, Dict[str, float]] = {}
+        self.started = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    def add(self, path: str, documents: List[Document], seconds: float, new_file: bool):
+        entry = self.types.setdefault(file_type(path), {"files": 0, "documents": 0, "bytes": 0, "seconds": 0.0})
+        if new_file:
+            entry["files"] += 1
+            try:
+                entry["bytes"] += os.path.getsize(path)
+            except OSError:
+                pass
+        entry["documents"] += len(documents)
+        entry["seconds"] += seconds
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def print_report(self):
+        """Table of files, documents, MB and worker time per file type."""
+        print(f"\n{'Type':<10} {'Files':>7} {'Docs':>7} {'MB':>8} {'Worker s':>9} {'s/file':>8}")
+        print("-" * 54)
+        for name, entry in sorted(self.types.items()):
+            per_file = entry["seconds"] / entry["files"] if entry["files"] else 0.0
+            print(f"{name:<10} {entry['files']:>7} {entry['documents']:>7} {entry['bytes'] / (1024 * 1024):>8.1f} "
+                  f"{entry['seconds']:>9.2f} {per_file:>8.3f}")
+        print("-" * 54)
+        busy = sum(entry["seconds"] for entry in self.types.values())
+        print(f"Load phase: {self.wall_seconds:.2f}s wall, {busy:.2f}s worker time")
+
+
+def iter_text_documents(source_dir: str, workers: Optional[int] = None,
+                        timings: Optional[LoadTimings] = None,
+                        pages_per_task: int = PDF_PAGES_PER_TASK) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Load every Markdown and PDF file under a directory in a process pool.
+
+    Args:
+        source_dir: Directory to load.
+        workers: Loader processes (default: CPU count).
+        timings: Optional LoadTimings filled while loading.
+        pages_per_task: PDFs with more pages are split into ranges of this size.
+
+    Yields:
+        (source, documents) per file, in completion order.
+    """
+    files = discover_text_files(source_dir)
+    if not files:
+        return
+    tasks, parts = plan_tasks(files, pages_per_task)
+    workers = workers or os.cpu_count() or 1
+    window = workers * TASKS_PER_WORKER
+    pending_parts: Dict[str, Dict[int, List[Document]]] = {}
+
+    # 'spawn' keeps workers independent of the pipeline threads of this process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        queued = iter(tasks)
+        in_flight = set()
+        while True:
+            for task in queued:
+                in_flight.add(pool.submit(run_task, task))
+                if len(in_flight) >= window:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for path, part, documents, seconds in future.result():
+                    record_span(f"ingest.load.{file_type(path)}", seconds,
+                                {"source": path, "part": part, "documents": len(documents)})
+                    received = pending_parts.setdefault(path, {})
+                    if timings is not None:
+                        timings.add(path, documents, seconds, new_file=not received)
+                    received[part] = documents
+                    if len(received) == parts[path]:
+                        del pending_parts[path]
+                        yield path, [doc for index in sorted(received) for doc in received[index]]
+    if timings is not None:
+        timings.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load Markdown and PDF files in parallel and report load times per type")
+    parser.add_argument("source", help="Directory of documents")
+    parser.add_argument("--workers", type=int, default=None, help="Loader processes (default: CPU count)")
+    parser.add_argument("--pages-per-task", type=int, default=PDF_PAGES_PER_TASK,
+                        help=f"Page range size large PDFs are split into (default: {PDF_PAGES_PER_TASK})")
+    args = parser.parse_args()
+    init_tracing("doc_loader")
+
+    timings = LoadTimings()
+    for _ in iter_text_documents(args.source, args.workers, timings, args.pages_per_task):
+        pass
+    timings.print_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Embedding Backends for AutoDoc-RAG.
+Every chunk and query embedding goes through create_embeddings(), which
+returns either
+  - ollama: OllamaEmbeddings, one HTTP request per batch to `ollama serve`
+    (default), or
+  - onnx: OnnxEmbeddings, an ONNX export of the embedding model run
+    in-process with onnxruntime: texts are tokenized in one `tokenizers` call,
+    sorted by length into batches (little padding) and the batches are run
+    on a thread pool (onnxruntime releases the GIL), with no HTTP or JSON
+    serialization on the hot path.
+
+The backend is selected with AUTODOC_EMBEDDING_BACKEND=ollama|onnx, the ONNX
+model directory (model.onnx + tokenizer.json, e.g. from
+`optimum-cli export onnx --model nomic-ai/nomic-embed-text-v1.5 <dir>`) with
+AUTODOC_ONNX_MODEL_DIR. Vectors of different backends are not comparable:
+ingest into a fresh vector DB after switching.
+
+Usage:
+    embeddings = create_embeddings(EMBEDDING_MODEL, OLLAMA_BASE_URL)
+    vectors = embeddings.embed_documents(texts)
+
+    python src/embedding_backend.py --make-test-model data/onnx/test   # tiny model from the words in docs/
+    AUTODOC_EMBEDDING_BACKEND=onnx AUTODOC_ONNX_MODEL_DIR=data/onnx/test python src/embedding_backend.py --check docs
+"""
+import argparse
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import numpy as np
+import onnxruntime
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings
+from tokenizers import Tokenizer, normalizers, pre_tokenizers
+from tokenizers.models import WordLevel
+
+# Configuration
+EMBEDDING_BACKENDS = ["ollama", "onnx"]
+EMBEDDING_BACKEND = os.environ.get("AUTODOC_EMBEDDING_BACKEND", "ollama")
+ONNX_MODEL_DIR = os.environ.get("AUTODOC_ONNX_MODEL_DIR", "data/onnx/nomic-embed-text")
+ONNX_BATCH_SIZE = 32
+ONNX_MAX_LENGTH = 512
+ONNX_WORKERS = 2  # batches run at once; CPU threads are split between them
+MODEL_FILE_NAME = "model.onnx"
+TOKENIZER_FILE_NAME = "tokenizer.json"
+
+# Test model (--make-test-model)
+TEST_MODEL_DIM = 64
+TEST_VOCAB_SIZE = 5000
+PAD_TOKEN = "[PAD]"
+UNK_TOKEN = "[UNK]"
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    In-process embedding model backed by onnxruntime.
+
+    Accepts models with input_ids / attention_mask (/ token_type_ids) inputs
+    and either a pooled [batch, dim] output or a [batch, tokens, dim] hidden
+    state, which is mean-pooled over the attention mask. Vectors are L2-normalized.
+
+    Args:
+        model_dir: Directory with model.onnx and tokenizer.json.
+        batch_size: Texts per inference call.
+        max_length: Texts are truncated to this many tokens.
+        workers: Inference calls running at once.
+        document_prefix / query_prefix: Task prefixes some models expect
+            (nomic-embed-text: "search_document: " / "search_query: ").
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, batch_size: int = ONNX_BATCH_SIZE,
+                 max_length: int = ONNX_MAX_LENGTH, workers: int = ONNX_WORKERS,
+                 document_prefix: str = "", query_prefix: str = ""):
+        model_path = os.path.join(model_dir, MODEL_FILE_NAME)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE_NAME))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length)
+        self.pad_id = self.tokenizer.token_to_id(PAD_TOKEN) or 0
+        self.batch_size = max(1, batch_size)
+        self.document_prefix = document_prefix
+        self.query_prefix = query_prefix
+        # Part of the embedding cache key: a replaced model file gets new cache entries
+        self.model = f"onnx:{os.path.basename(os.path.normpath(model_dir))}:{os.path.getsize(model_path)}"
+
+        workers = max(1, workers)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 1) // workers)
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        output_names = [node.name for node in self.session.get_outputs()]
+        self.output_name = "sentence_embedding" if "sentence_embedding" in output_names else output_names[0]
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onnx-embed")
+
+    def _run_batch(self, encodings) -> np.ndarray:
+        length = max(1, max(len(encoding.ids) for encoding in encodings))
+        input_ids = np.full((len(encodings), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask,
+                 "token_type_ids": np.zeros_like(input_ids)}
+        output = self.session.run([self.output_name], {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        if output.ndim == 3:
+            mask = attention_mask[:, :, None].astype(output.dtype)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1)
+        return output / (np.linalg.norm(output, axis=1, keepdims=True) + 1e-12)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(texts)
+        # Similar lengths share a batch, so little compute is spent on padding
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        results = self._pool.map(lambda batch: self._run_batch([encodings[i] for i in batch]), batches)
+        for batch, output in zip(batches, results):
+            for index, vector in zip(batch, output.tolist()):
+                vectors[index] = vector
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([self.document_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([self.query_prefix + text])[0]
+
+
+def create_embeddings(ollama_model: str, base_url: Optional[str] = None,
+                      backend: Optional[str] = None) -> Embeddings:
+    """
+    Embedding model of the configured backend.
+
+    Args:
+        ollama_model: Ollama model name (ollama backend).
+        base_url: Ollama server URL (default: OLLAMA_HOST or localhost).
+        backend: 'ollama' or 'onnx' (default: AUTODOC_EMBEDDING_BACKEND).
+
+    Returns:
+        A LangChain Embeddings object; its `model` attribute names the model
+        (used as the embedding cache key).
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx":
+        return OnnxEmbeddings(ONNX_MODEL_DIR)
+    if backend == "ollama":
+        return OllamaEmbeddings(model=ollama_model, base_url=base_url)
+    raise ValueError(f"Unknown embedding backend: {backend} (expected one of {EMBEDDING_BACKENDS})")
+
+
+# Minimal ONNX protobuf writer for the test model (the `onnx` package is not a dependency)
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number: int, value) -> bytes:
+    """One protobuf field: ints as varints, str/bytes as length-delimited."""
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _tensor_type(elem_type: int, dims: List) -> bytes:
+    """TypeProto of a tensor; str dims are symbolic (dim_param)."""
+    shape = b"".join(_field(1, _field(2 if isinstance(d, str) else 1, d)) for d in dims)
+    return _field(1, _field(1, elem_type) + _field(2, shape))
+
+
+def _value_info(name: str, elem_type: int, dims: List) -> bytes:
+    return _field(1, name) + _field(2, _tensor_type(elem_type, dims))
+
+
+def build_test_model(embedding_table: np.ndarray) -> bytes:
+    """
+    Serialized ONNX model: last_hidden_state = Gather(embedding_table, input_ids).
+    attention_mask is declared (like a transformer export) but unused.
+    """
+    float_type, int64_type = 1, 7
+    vocab_size, dim = embedding_table.shape
+    initializer = (b"".join(_field(1, d) for d in (vocab_size, dim)) + _field(2, float_type)
+                   + _field(8, "embedding_table") + _field(9, embedding_table.astype("<f4").tobytes()))
+    node = _field(1, "embedding_table") + _field(1, "input_ids") + _field(2, "last_hidden_state") \
+        + _field(3, "lookup") + _field(4, "Gather")
+    graph = (_field(1, node) + _field(2, "autodoc_test_embedder") + _field(5, initializer)
+             + _field(11, _value_info("input_ids", int64_type, ["batch", "tokens"]))
+             + _field(11, _value_info("attention_mask", int64_type, ["batch", "tokens"]))
+             + _field(12, _value_info("last_hidden_state", float_type, ["batch", "tokens", dim])))
+    opset = _field(1, "") + _field(2, 17)
+    return _field(1, 8) + _field(2, "autodoc-rag") + _field(7, graph) + _field(8, opset)
+
+
+def build_test_tokenizer(words: Iterable[str]) -> Tokenizer:
+    """Lower-casing whitespace/punctuation word-level tokenizer over a fixed vocabulary."""
+    vocab = {PAD_TOKEN: 0, UNK_TOKEN: 1}
+    for word in words:
+        vocab.setdefault(word, len(vocab))
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token=UNK_TOKEN))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    return tokenizer
+
+
+def write_test_model(model_dir: str, source_dir: Optional[str] = None, dim: int = TEST_MODEL_DIM,
+                     vocab_size: int = TEST_VOCAB_SIZE, seed: int = 0) -> str:
+    """
+    Write a tiny random-weight embedding model (model.onnx + tokenizer.json).
+    The vocabulary is the most frequent words of the text files under source_dir,
+    so texts sharing words get similar vectors.
+    """
+    counts = Counter()
+    for dirpath, _, filenames in os.walk(source_dir or "."):
+        if not source_dir:
+            break
+        for name in filenames:
+            try:
+                with open(os.path.join(dirpath, name), "r", encoding="utf-8") as f:
+                    counts.update(re.findall(r"\w+", f.read().lower()))
+            except (OSError, UnicodeDecodeError):
+                continue
+    words = [word for word, _ in counts.most_common(vocab_size)]
+    tokenizer = build_test_tokenizer(words)
+
+    table = np.random.default_rng(seed).standard_normal((tokenizer.get_vocab_size(), dim)).astype(np.float32)
+    table[0] = 0.0  # padding
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, MODEL_FILE_NAME), "wb") as f:
+        f.write(build_test_model(table))
+    tokenizer.save(os.path.join(model_dir, TOKENIZER_FILE_NAME))
+    return model_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a tiny ONNX test embedding model or check the configured embedding backend",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/embedding_backend.py --make-test-model data/onnx/test --vocab-from docs
+    AUTODOC_EMBEDDING_BACKEND=onnx AUTODOC_ONNX_MODEL_DIR=data/onnx/test python src/embedding_backend.py --check docs
+    AUTODOC_EMBEDDING_BACKEND=onnx AUTODOC_ONNX_MODEL_DIR=data/onnx/test python src/ingest_data.py --source docs
+        """
+    )
+    parser.add_argument("--make-test-model", metavar="DIR", help="Write a tiny random-weight model to DIR")
+    parser.add_argument("--vocab-from", default="docs", help="Directory whose words form the test vocabulary (default: docs)")
+    parser.add_argument("--dim", type=int, default=TEST_MODEL_DIM, help=f"Test model dimension (default: {TEST_MODEL_DIM})")
+    parser.add_argument("--check", metavar="DIR", help="Embed the lines of the text files under DIR and report throughput")
+    parser.add_argument("--model", default="nomic-embed-text", help="Ollama model for --check (default: nomic-embed-text)")
+    args = parser.parse_args()
+
+    if args.make_test_model:
+        write_test_model(args.make_test_model, args.vocab_from, args.dim)
+        print(f"✅ Test model written to {args.make_test_model} ({MODEL_FILE_NAME}, {TOKENIZER_FILE_NAME})")
+    if args.check:
+        texts = []
+        for dirpath, _, filenames in os.walk(args.check):
+            for name in sorted(filenames):
+                try:
+                    with open(os.path.join(dirpath, name), "r", encoding="utf-8") as f:
+                        texts.extend(line.strip() for line in f if line.strip())
+                except (OSError, UnicodeDecodeError):
+                    continue
+        embeddings = create_embeddings(args.model)
+        print(f"🔢 Backend: {EMBEDDING_BACKEND} ({getattr(embeddings, 'model', args.model)}), {len(texts)} texts")
+        started = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+        dim = len(vectors[0]) if vectors else 0
+        print(f"   {dim} dimensions, {elapsed:.2f}s ({len(texts) / elapsed if elapsed > 0 else 0:.1f} texts/s)")
+    if not args.make_test_model and not args.check:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
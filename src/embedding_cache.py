@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Persistent Embedding Cache for AutoDoc-RAG.
+Wraps any LangChain embedding model with an on-disk SQLite cache keyed by
+(embedding model, SHA-256 of the chunk text), so re-ingesting unchanged
+chunks does not call the embedder again.
+
+Usage:
+    embeddings = CachedEmbeddings(OllamaEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+    vectors = embeddings.embed_documents(texts)
+    print(embeddings.stats_line())
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+CACHE_PATH = "data/embedding_cache.sqlite"
+MAX_ENTRIES = 200_000
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of a chunk for a given embedding model."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that serves repeated chunk texts from disk.
+
+    Args:
+        embeddings: The underlying embedding model (e.g. OllamaEmbeddings).
+        model_name: Name of the embedding model, part of the cache key.
+        cache_path: SQLite file holding the cached vectors.
+        max_entries: Least recently used entries beyond this count are evicted.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str,
+                 cache_path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+            [(key, self.model_name, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        )
+        self._evict()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed chunk texts, calling the underlying model only for cache misses."""
+        keys = [cache_key(self.model_name, text) for text in texts]
+
+        with self._lock:
+            cached = self._lookup(keys)
+            self._conn.commit()
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        miss_count = sum(1 for key in keys if key in missing)
+        self.hits += len(keys) - miss_count
+        self.misses += miss_count
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self._store(fresh)
+                self._conn.commit()
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are not cached; they are embedded by the underlying model."""
+        return self.embeddings.embed_query(text)
+
+    def stats_line(self) -> str:
+        """One-line summary of the cache counters."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        return (f"Embedding cache: {self.hits} hits, {self.misses} misses "
+                f"({hit_rate:.1f}% hit rate), {self.evictions} evicted")
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
@@ -2,19 +2,38 @@
 """
 LLM-as-a-Judge Evaluation Framework.
 Compares API documentation generated with No-RAG vs RAG modes.
+
+Given a directory instead of a single source file, every source file that has
+docs under both --no-rag-dir and --rag-dir is judged concurrently, and
+per-file results plus an aggregate report are written to
+output/evaluation/<directory name>/.
 """
 import argparse
+import asyncio
 import json
 import os
 import re
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from generate_docs import discover_source_files
+from llm_cache import attach_llm_cache
+from tracing import init_tracing, instrument_llm, percentile, tracer
+
 # Configuration
 LLM_MODEL = "llama3.1:8b"
 OUTPUT_DIR = "output"
 
+# Batch mode configuration
+DEFAULT_CONCURRENCY = 2
+EVALUATION_DIR_NAME = "evaluation"
+AGGREGATE_REPORT_NAME = "summary.json"
+
 EVALUATION_CRITERIA = [
     "completeness",
     "accuracy", 
@@ -99,29 +118,7 @@ def parse_scores(response: str) -> dict:
     return scores
 
 
-def evaluate_documentation(source_path: str, no_rag_path: str, rag_path: str):
-    """
-    Evaluate and compare documentation quality.
-    """
-    print(f"📖 Reading source: {source_path}")
-    source_code = read_file(source_path)
-    
-    print(f"📄 Reading No-RAG doc: {no_rag_path}")
-    no_rag_doc = read_file(no_rag_path)
-    
-    print(f"📄 Reading RAG doc: {rag_path}")
-    rag_doc = read_file(rag_path)
-    
-    # Initialize LLM
-    print(f"🤖 Initializing Judge LLM ({LLM_MODEL})...")
-    llm = ChatOllama(
-        model=LLM_MODEL,
-        temperature=0.1,
-        keep_alive="5m"
-    )
-    
-    # Judge Prompt Template
-    template = """You are an expert technical documentation reviewer.
+JUDGE_TEMPLATE = """You are an expert technical documentation reviewer.
 Your task is to evaluate the quality of API documentation generated from source code.
 
 **Evaluation Criteria** (score each 1-10):
@@ -157,9 +154,70 @@ Please provide your evaluation in the following JSON format:
 }}
 ```
 """
+
+
+def create_judge_chain(use_cache: bool = True):
+    """Judge prompt | LLM | string parser, plus the attached response cache (or None)."""
+    llm = ChatOllama(
+        model=LLM_MODEL,
+        temperature=0.1,
+        keep_alive="5m"
+    )
+    cache = attach_llm_cache(llm, enabled=use_cache)
+    instrument_llm(llm)
+    prompt = ChatPromptTemplate.from_template(JUDGE_TEMPLATE)
+    return prompt | llm | StrOutputParser(), cache
+
+
+def score_response(response: str) -> dict:
+    """Parse a judge response and add the total over all criteria."""
+    with tracer.start_as_current_span("judge.parse_scores", attributes={"response_chars": len(response)}) as span:
+        scores = parse_scores(response)
+        scores["total"] = sum(scores.get(c, 0) for c in EVALUATION_CRITERIA)
+        span.set_attribute("criteria_found", sum(1 for c in EVALUATION_CRITERIA if scores.get(c)))
+    return scores
+
+
+def decide_winner(results: dict) -> str:
+    """'rag', 'no-rag' or 'tie' by total score."""
+    no_rag_total = results["no_rag"].get("total", 0)
+    rag_total = results["rag"].get("total", 0)
+    if rag_total > no_rag_total:
+        return "rag"
+    if no_rag_total > rag_total:
+        return "no-rag"
+    return "tie"
+
+
+def print_score_table(results: dict):
+    """Per-criterion No-RAG vs RAG table."""
+    print(f"\n{'Criterion':<20} {'No-RAG':>10} {'RAG':>10}")
+    print("-" * 42)
+    for criterion in EVALUATION_CRITERIA:
+        no_rag_score = results["no_rag"].get(criterion, "N/A")
+        rag_score = results["rag"].get(criterion, "N/A")
+        print(f"{criterion:<20} {str(no_rag_score):>10} {str(rag_score):>10}")
+    print("-" * 42)
+    print(f"{'TOTAL':<20} {results['no_rag'].get('total', 0):>10} {results['rag'].get('total', 0):>10}")
+
+
+def evaluate_documentation(source_path: str, no_rag_path: str, rag_path: str, use_cache: bool = True):
+    """
+    Evaluate and compare documentation quality.
+    Identical judge prompts are answered from the LLM response cache unless use_cache is False.
+    """
+    print(f"📖 Reading source: {source_path}")
+    source_code = read_file(source_path)
+    
+    print(f"📄 Reading No-RAG doc: {no_rag_path}")
+    no_rag_doc = read_file(no_rag_path)
+    
+    print(f"📄 Reading RAG doc: {rag_path}")
+    rag_doc = read_file(rag_path)
     
-    prompt = ChatPromptTemplate.from_template(template)
-    chain = prompt | llm | StrOutputParser()
+    # Initialize LLM
+    print(f"🤖 Initializing Judge LLM ({LLM_MODEL})...")
+    chain, cache = create_judge_chain(use_cache)
     
     results = {
         "source_file": os.path.basename(source_path),
@@ -171,14 +229,12 @@ Please provide your evaluation in the following JSON format:
     # Evaluate No-RAG doc
     print("⏳ Evaluating No-RAG documentation...")
     try:
-        no_rag_response = chain.invoke({
-            "source_code": source_code,
-            "doc_content": no_rag_doc
-        })
-        results["no_rag"] = parse_scores(no_rag_response)
-        results["no_rag"]["total"] = sum(
-            results["no_rag"].get(c, 0) for c in EVALUATION_CRITERIA
-        )
+        with tracer.start_as_current_span("judge.call", attributes={"doc": "no-rag", "doc_chars": len(no_rag_doc)}):
+            no_rag_response = chain.invoke({
+                "source_code": source_code,
+                "doc_content": no_rag_doc
+            })
+        results["no_rag"] = score_response(no_rag_response)
     except Exception as e:
         print(f"❌ Error evaluating No-RAG: {e}")
         results["no_rag"] = {"error": str(e), "total": 0}
@@ -186,28 +242,17 @@ Please provide your evaluation in the following JSON format:
     # Evaluate RAG doc
     print("⏳ Evaluating RAG documentation...")
     try:
-        rag_response = chain.invoke({
-            "source_code": source_code,
-            "doc_content": rag_doc
-        })
-        results["rag"] = parse_scores(rag_response)
-        results["rag"]["total"] = sum(
-            results["rag"].get(c, 0) for c in EVALUATION_CRITERIA
-        )
+        with tracer.start_as_current_span("judge.call", attributes={"doc": "rag", "doc_chars": len(rag_doc)}):
+            rag_response = chain.invoke({
+                "source_code": source_code,
+                "doc_content": rag_doc
+            })
+        results["rag"] = score_response(rag_response)
     except Exception as e:
         print(f"❌ Error evaluating RAG: {e}")
         results["rag"] = {"error": str(e), "total": 0}
     
-    # Determine winner
-    no_rag_total = results["no_rag"].get("total", 0)
-    rag_total = results["rag"].get("total", 0)
-    
-    if rag_total > no_rag_total:
-        results["winner"] = "rag"
-    elif no_rag_total > rag_total:
-        results["winner"] = "no-rag"
-    else:
-        results["winner"] = "tie"
+    results["winner"] = decide_winner(results)
     
     # Save results
     output_path = os.path.join(OUTPUT_DIR, "evaluation_results.json")
@@ -218,28 +263,203 @@ Please provide your evaluation in the following JSON format:
     print("\n" + "=" * 50)
     print("📊 EVALUATION RESULTS")
     print("=" * 50)
-    print(f"\n{'Criterion':<20} {'No-RAG':>10} {'RAG':>10}")
-    print("-" * 42)
-    for criterion in EVALUATION_CRITERIA:
-        no_rag_score = results["no_rag"].get(criterion, "N/A")
-        rag_score = results["rag"].get(criterion, "N/A")
-        print(f"{criterion:<20} {str(no_rag_score):>10} {str(rag_score):>10}")
-    print("-" * 42)
-    print(f"{'TOTAL':<20} {no_rag_total:>10} {rag_total:>10}")
+    print_score_table(results)
     print(f"\n🏆 Winner: {results['winner'].upper()}")
+    if cache:
+        print(f"\n{cache.stats_line()}")
     print(f"\n💾 Results saved to: {output_path}")
 
 
+def find_doc_path(doc_dir: str, root_name: str, rel_path: str, allow_flat: bool = True) -> Optional[str]:
+    """
+    Generated doc for a source file, in either output layout:
+    batch runs write <doc_dir>/<root name>/<relative path>.md,
+    single-file runs write <doc_dir>/<file name>.md.
+
+    Args:
+        allow_flat: Accept the single-file layout. Only safe when no other
+            scanned source file has the same name (mod.rs, __init__.py, ...).
+    """
+    candidates = [os.path.join(doc_dir, root_name, f"{os.path.splitext(rel_path)[0]}.md")]
+    if allow_flat:
+        candidates.append(os.path.join(doc_dir, f"{os.path.splitext(os.path.basename(rel_path))[0]}.md"))
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_doc_pairs(root: str, no_rag_dir: str, rag_dir: str,
+                   pattern: Optional[str] = None) -> List[Tuple[str, str, str]]:
+    """
+    Source files under root that have both a No-RAG and a RAG doc.
+    A flat <file name>.md doc is only paired with a source file whose name is
+    unique under root; same-named files need the batch layout.
+
+    Returns:
+        (source path, No-RAG doc path, RAG doc path) triples.
+    """
+    root_name = os.path.basename(os.path.normpath(root))
+    paths = discover_source_files(root, pattern)
+    name_counts = Counter(os.path.splitext(os.path.basename(path))[0] for path in paths)
+    pairs, ambiguous = [], 0
+    for path in paths:
+        rel_path = os.path.relpath(path, root)
+        unique = name_counts[os.path.splitext(os.path.basename(path))[0]] == 1
+        no_rag_path = find_doc_path(no_rag_dir, root_name, rel_path, allow_flat=unique)
+        rag_path = find_doc_path(rag_dir, root_name, rel_path, allow_flat=unique)
+        if no_rag_path and rag_path:
+            pairs.append((path, no_rag_path, rag_path))
+        elif not unique and all(find_doc_path(doc_dir, root_name, rel_path) for doc_dir in (no_rag_dir, rag_dir)):
+            ambiguous += 1
+    if ambiguous:
+        print(f"⚠️  Skipped {ambiguous} files whose only docs are flat <name>.md files shared by "
+              f"same-named sources (generate them in batch mode to evaluate them)")
+    return pairs
+
+
+def summarize_batch(file_results: List[dict], latencies: List[float], elapsed: float) -> dict:
+    """Aggregate report over all evaluated files."""
+    report = {
+        "files": len(file_results),
+        "wins": {"rag": 0, "no-rag": 0, "tie": 0},
+        "mean_scores": {"no_rag": {}, "rag": {}},
+        "judge": {},
+    }
+    for results in file_results:
+        report["wins"][results["winner"]] += 1
+    for mode in ["no_rag", "rag"]:
+        scored = [r[mode] for r in file_results if "error" not in r[mode]]
+        for criterion in EVALUATION_CRITERIA + ["total"]:
+            values = [scores.get(criterion, 0) for scores in scored]
+            report["mean_scores"][mode][criterion] = round(sum(values) / len(values), 2) if values else 0.0
+    report["judge"] = {
+        "calls": len(latencies),
+        "failed": sum(1 for r in file_results for mode in ["no_rag", "rag"] if "error" in r[mode]),
+        "latency_mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 2),
+        "latency_p95": round(percentile(latencies, 95), 2),
+        "latency_max": round(max(latencies), 2) if latencies else 0.0,
+        "elapsed": round(elapsed, 2),
+        "calls_per_min": round(len(latencies) / (elapsed / 60), 2) if elapsed > 0 else 0.0,
+        "files_per_min": round(len(file_results) / (elapsed / 60), 2) if elapsed > 0 else 0.0,
+    }
+    return report
+
+
+async def evaluate_batch(root: str, no_rag_dir: str, rag_dir: str, pattern: Optional[str] = None,
+                         concurrency: int = DEFAULT_CONCURRENCY, use_cache: bool = True):
+    """
+    Judge every source/doc pair under a directory.
+
+    Both docs of every pair are queued as independent judge calls; at most
+    `concurrency` of them run at once against one shared LLM client. Each
+    file's results are written as soon as both of its judgments are in.
+
+    Args:
+        root: Source directory the docs were generated from.
+        no_rag_dir: Directory containing No-RAG generated docs.
+        rag_dir: Directory containing RAG generated docs.
+        pattern: Optional glob restricting which source files are evaluated.
+        concurrency: Maximum number of judge calls in flight.
+        use_cache: Serve identical judge prompts from the LLM response cache.
+    """
+    pairs = find_doc_pairs(root, no_rag_dir, rag_dir, pattern)
+    if not pairs:
+        print(f"❌ No source files in {root} have docs in both {no_rag_dir} and {rag_dir}")
+        return
+
+    root_name = os.path.basename(os.path.normpath(root))
+    output_dir = os.path.join(OUTPUT_DIR, EVALUATION_DIR_NAME, root_name)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📂 Found {len(pairs)} documented source files in {root}")
+
+    print(f"🤖 Initializing Judge LLM ({LLM_MODEL})...")
+    chain, cache = create_judge_chain(use_cache)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    latencies: List[float] = []
+    file_results: List[dict] = []
+
+    async def judge(source_code: str, doc_content: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                with tracer.start_as_current_span("judge.call", attributes={"doc_chars": len(doc_content)}):
+                    response = await chain.ainvoke({"source_code": source_code, "doc_content": doc_content})
+                scores = score_response(response)
+            except Exception as e:
+                scores = {"error": str(e), "total": 0}
+            latency = time.perf_counter() - started
+            latencies.append(latency)
+            scores["seconds"] = round(latency, 2)
+            return scores
+
+    async def evaluate_pair(source_path: str, no_rag_path: str, rag_path: str):
+        rel_path = os.path.relpath(source_path, root)
+        source_code = read_file(source_path)
+        no_rag_scores, rag_scores = await asyncio.gather(
+            judge(source_code, read_file(no_rag_path)),
+            judge(source_code, read_file(rag_path)),
+        )
+        results = {
+            "source_file": rel_path,
+            "no_rag_doc": no_rag_path,
+            "rag_doc": rag_path,
+            "no_rag": no_rag_scores,
+            "rag": rag_scores,
+        }
+        results["winner"] = decide_winner(results)
+
+        output_path = os.path.join(output_dir, f"{os.path.splitext(rel_path)[0]}.json")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+        file_results.append(results)
+        status = "❌" if "error" in no_rag_scores or "error" in rag_scores else "✅"
+        print(f"{status} [{len(file_results)}/{len(pairs)}] {rel_path}: "
+              f"No-RAG {no_rag_scores['total']} vs RAG {rag_scores['total']} -> {results['winner']}")
+
+    print(f"⏳ Judging {len(pairs) * 2} documents (concurrency: {concurrency})...")
+    run_started = time.perf_counter()
+    await asyncio.gather(*(evaluate_pair(*pair) for pair in pairs))
+    elapsed = time.perf_counter() - run_started
+
+    report = summarize_batch(sorted(file_results, key=lambda r: r["source_file"]), latencies, elapsed)
+    report_path = os.path.join(output_dir, AGGREGATE_REPORT_NAME)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    # Print Summary
+    judge_stats = report["judge"]
+    print("\n" + "=" * 50)
+    print("📊 BATCH EVALUATION RESULTS")
+    print("=" * 50)
+    print_score_table(report["mean_scores"])
+    print(f"\n🏆 Wins: RAG {report['wins']['rag']}, No-RAG {report['wins']['no-rag']}, tie {report['wins']['tie']}")
+    print(f"Judge calls : {judge_stats['calls']} ({judge_stats['failed']} failed)")
+    print(f"Latency     : mean {judge_stats['latency_mean']:.2f}s, p50 {judge_stats['latency_p50']:.2f}s, "
+          f"p95 {judge_stats['latency_p95']:.2f}s, max {judge_stats['latency_max']:.2f}s")
+    print(f"Throughput  : {judge_stats['calls_per_min']:.2f} judgments/min, "
+          f"{judge_stats['files_per_min']:.2f} files/min ({judge_stats['elapsed']:.1f}s total)")
+    if cache:
+        print(cache.stats_line())
+    print(f"\n💾 Per-file results in {output_dir}, aggregate report: {report_path}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="LLM-as-a-Judge Evaluation for API Documentation",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
-Example:
+Examples:
     python src/evaluate_docs.py docs/sample_middleware.cpp
+
+    # Every documented file of a tree, 4 judge calls in flight:
+    python src/evaluate_docs.py test_data/requests --concurrency 4
         """
     )
-    parser.add_argument("source", help="Path to the original source code file")
+    parser.add_argument("source", help="Path to the original source code file, or a directory to evaluate in batch")
     parser.add_argument(
         "--no-rag-dir",
         default="output/no-rag",
@@ -250,8 +470,35 @@ Example:
         default="output/rag",
         help="Directory containing RAG generated docs (default: output/rag)"
     )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Bypass the LLM response cache (always call the judge, store nothing)"
+    )
+    parser.add_argument(
+        "--glob",
+        help="Directory mode: only evaluate files matching this pattern (e.g. '*.py')"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Directory mode: number of judge calls in flight (default: {DEFAULT_CONCURRENCY})"
+    )
     
     args = parser.parse_args()
+    init_tracing("evaluate_docs")
+    
+    if os.path.isdir(args.source):
+        asyncio.run(evaluate_batch(
+            args.source,
+            args.no_rag_dir,
+            args.rag_dir,
+            pattern=args.glob,
+            concurrency=args.concurrency,
+            use_cache=not args.no_llm_cache
+        ))
+        return
     
     # Derive doc paths from source file name
     base_name = os.path.splitext(os.path.basename(args.source))[0]
@@ -264,7 +511,7 @@ Example:
             print(f"❌ File not found: {path}")
             return
     
-    evaluate_documentation(args.source, no_rag_path, rag_path)
+    evaluate_documentation(args.source, no_rag_path, rag_path, use_cache=not args.no_llm_cache)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama Server for AutoDoc-RAG benchmarks.
+Local stand-in for `ollama serve` implementing the two endpoints the project
+uses, with configurable latency and deterministic outputs, so performance
+changes can be measured without a GPU or a real llama3.1:8b / nomic-embed-text:
+
+    POST /api/embed  {"model", "input": str | [str]}  -> {"embeddings": [[...]], ...}
+                     Hashed bag-of-words vectors: the same text always gets the
+                     same vector, and texts sharing words are close.
+    POST /api/chat   {"model", "messages", "stream"}  -> NDJSON chunks (or one JSON object)
+                     Pseudo-random words seeded by the prompt; judge prompts
+                     (evaluate_docs.JUDGE_TEMPLATE) get a parseable JSON score block.
+    GET  /api/stats  Request counters of this server (not part of the Ollama API).
+
+Latency model: every embed request sleeps EMBED_LATENCY plus EMBED_PER_INPUT
+per text; every chat request waits for one of PARALLEL generation slots (like
+OLLAMA_NUM_PARALLEL), sleeps TTFT, then TOKEN_LATENCY per streamed token.
+
+Usage:
+    python src/fake_ollama.py --port 11435 --ttft 0.2 --token-latency 0.01
+    export OLLAMA_HOST=http://127.0.0.1:11435   # ChatOllama / OllamaEmbeddings now use it
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+
+# Configuration
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 11435
+EMBEDDING_DIM = 768  # nomic-embed-text
+EMBED_LATENCY = 0.02
+EMBED_PER_INPUT = 0.002
+TTFT = 0.2
+TOKEN_LATENCY = 0.01
+OUTPUT_TOKENS = 200
+PARALLEL = 4
+
+JUDGE_MARKER = '"context_enrichment": <score 1-10>'
+JUDGE_CRITERIA = ["completeness", "accuracy", "clarity", "structure", "context_enrichment"]
+WORD_PATTERN = re.compile(r"\w+")
+VOCABULARY = (
+    "the module class function returns value parameter request session object list string "
+    "buffer message handler connection error state config instance method call data index "
+    "stream client server response header option default field type cache lock thread"
+).split()
+
+
+def stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Deterministic unit vector: signed hashed counts of the lower-cased words."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in WORD_PATTERN.findall(text.lower()):
+        h = stable_hash(word)
+        vector[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0], norm = 1.0, 1.0
+    return (vector / norm).round(6).tolist()
+
+
+def count_prompt_tokens(messages: List[dict]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+
+
+def reply_tokens(messages: List[dict], output_tokens: int = OUTPUT_TOKENS) -> List[str]:
+    """The streamed pieces of the reply to a prompt (same prompt, same reply)."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    seed = stable_hash(prompt)
+    if JUDGE_MARKER in prompt:
+        scores = {c: 1 + (seed >> (4 * i)) % 10 for i, c in enumerate(JUDGE_CRITERIA)}
+        scores["reasoning"] = "Deterministic score from the fake Ollama server."
+        text = "```json\n" + json.dumps(scores, indent=2) + "\n```"
+        return [piece + " " for piece in text.split(" ")]
+    rng = np.random.default_rng(seed)
+    words = rng.choice(VOCABULARY, size=output_tokens)
+    return [f"{word} " for word in words]
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """HTTP server holding the latency settings and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, embed_latency: float = EMBED_LATENCY, embed_per_input: float = EMBED_PER_INPUT,
+                 ttft: float = TTFT, token_latency: float = TOKEN_LATENCY,
+                 output_tokens: int = OUTPUT_TOKENS, parallel: int = PARALLEL):
+        super().__init__(address, FakeOllamaHandler)
+        self.embed_latency = embed_latency
+        self.embed_per_input = embed_per_input
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.slots = threading.BoundedSemaphore(max(1, parallel))
+        self.stats_lock = threading.Lock()
+        self.stats = {"embed_requests": 0, "embed_inputs": 0, "chat_requests": 0,
+                      "prompt_tokens": 0, "output_tokens": 0, "max_queued_chats": 0}
+        self._queued_chats = 0
+
+    def count(self, **increments):
+        with self.stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Ollama-compatible /api/embed and /api/chat with simulated latency."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid the delayed-ACK stall
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+
+    def do_GET(self):
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": []})
+        elif self.path == "/api/stats":
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if self.path == "/api/embed":
+            self._handle_embed(request)
+        elif self.path == "/api/chat":
+            self._handle_chat(request)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _handle_embed(self, request: dict):
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        started = time.perf_counter()
+        time.sleep(self.server.embed_latency + self.server.embed_per_input * len(inputs))
+        embeddings = [embed_text(text) for text in inputs]
+        self.server.count(embed_requests=1, embed_inputs=len(inputs))
+        self._send_json(200, {
+            "model": request.get("model", ""),
+            "embeddings": embeddings,
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": sum(len(text) // 4 + 1 for text in inputs),
+        })
+
+    def _chunk(self, payload: dict):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _handle_chat(self, request: dict):
+        server = self.server
+        messages = request.get("messages", [])
+        model = request.get("model", "")
+        prompt_tokens = count_prompt_tokens(messages)
+        tokens = reply_tokens(messages, server.output_tokens)
+        started = time.perf_counter()
+
+        with server.stats_lock:
+            server._queued_chats += 1
+            server.stats["max_queued_chats"] = max(server.stats["max_queued_chats"], server._queued_chats)
+        with server.slots:
+            with server.stats_lock:
+                server._queued_chats -= 1
+            time.sleep(server.ttft)
+            final = {
+                "model": model,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "done": True,
+                "done_reason": "stop",
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": len(tokens),
+            }
+            if request.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, token in enumerate(tokens):
+                    if index:
+                        time.sleep(server.token_latency)
+                    self._chunk({"model": model, "created_at": final["created_at"],
+                                 "message": {"role": "assistant", "content": token}, "done": False})
+                final["message"] = {"role": "assistant", "content": ""}
+                final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                self._chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(server.token_latency * max(0, len(tokens) - 1))
+                final["message"] = {"role": "assistant", "content": "".join(tokens)}
+                final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                self._send_json(200, final)
+        server.count(chat_requests=1, prompt_tokens=prompt_tokens, output_tokens=len(tokens))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a fake Ollama server with configurable latency and deterministic outputs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/fake_ollama.py
+    python src/fake_ollama.py --port 11435 --ttft 0.5 --token-latency 0.03 --parallel 1   # slow, serial GPU
+    OLLAMA_HOST=http://127.0.0.1:11435 python src/generate_docs.py target_file.py --mode no-rag
+        """
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--embed-latency", type=float, default=EMBED_LATENCY,
+                        help=f"Seconds per embed request (default: {EMBED_LATENCY})")
+    parser.add_argument("--embed-per-input", type=float, default=EMBED_PER_INPUT,
+                        help=f"Additional seconds per embedded text (default: {EMBED_PER_INPUT})")
+    parser.add_argument("--ttft", type=float, default=TTFT, help=f"Seconds to the first chat token (default: {TTFT})")
+    parser.add_argument("--token-latency", type=float, default=TOKEN_LATENCY,
+                        help=f"Seconds per further chat token (default: {TOKEN_LATENCY})")
+    parser.add_argument("--output-tokens", type=int, default=OUTPUT_TOKENS,
+                        help=f"Tokens per chat reply (default: {OUTPUT_TOKENS})")
+    parser.add_argument("--parallel", type=int, default=PARALLEL,
+                        help=f"Chat requests generated at once, the rest queue (default: {PARALLEL})")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), args.embed_latency, args.embed_per_input,
+                              args.ttft, args.token_latency, args.output_tokens, args.parallel)
+    print(f"✅ Fake Ollama listening on http://{args.host}:{args.port} "
+          f"(TTFT {args.ttft}s, {args.token_latency}s/token, {args.parallel} parallel)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,90 +4,56 @@ API Documentation Generator.
 Supports two modes:
   - no-rag: Generate docs using only the source file content (LLM baseline).
   - rag: Generate docs using source file + relevant context from VectorDB.
+
+The target can be a single source file or a directory. For directories every
+matching source file is documented through a bounded asyncio work pool that
+shares one LLM client; retrieval goes through src/retrieval.py (retrieval
+service or one shared in-process store). Progress is persisted after each
+file so an interrupted run resumes where it stopped.
+
+Files larger than the model context window are documented with map-reduce
+(see map_reduce_docs.py): segments are generated concurrently and merged.
+
+With --stream, tokens are written to the output Markdown as they arrive
+(checkpointed to '<name>.md.partial') and time-to-first-token, latency and
+tokens/sec of every request are logged (see streaming.py). For map-reduce
+files the final reduce request is streamed, after the segments are done.
 """
 import argparse
+import asyncio
+import fnmatch
+import json
 import os
-from langchain_ollama import ChatOllama, OllamaEmbeddings
-from langchain_chroma import Chroma
+import time
+from typing import List, Optional
+
+from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from llm_cache import attach_llm_cache
+from map_reduce_docs import MAP_REDUCE_CHOICES, SEGMENT_CONCURRENCY, generate_map_reduce, needs_map_reduce
+from retrieval import SEARCH_TYPES, multi_search, search
+from streaming import CheckpointFile, astream_generation, stream_generation
+from tracing import init_tracing, instrument_llm, tracer
+from symbol_queries import build_queries
+
 # Configuration
 LLM_MODEL = "llama3.1:8b"
-EMBEDDING_MODEL = "nomic-embed-text"
-DB_DIR = "data/vector_db"
-COLLECTION_NAME = "autodoc_rag"
 OUTPUT_BASE_DIR = "output"
 
+# 'symbols' retrieval: one short query per public symbol, merged with MMR
+RETRIEVAL_CHOICES = SEARCH_TYPES + ["symbols"]
+SYMBOL_CONTEXT_TOKEN_BUDGET = 3000
 
-def get_rag_context(file_content: str, file_name: str, k: int = 5) -> str:
-    """
-    Retrieves relevant context from VectorDB based on the file content.
-    """
-    print(f"🔍 Searching VectorDB for related context (top {k})...")
-    
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-    vector_store = Chroma(
-        persist_directory=DB_DIR,
-        embedding_function=embeddings,
-        collection_name=COLLECTION_NAME
-    )
-    
-    # Use key portions of the file as query (first ~1000 chars for efficiency)
-    query = f"API documentation context for: {file_name}\n{file_content[:2000]}"
-    
-    results = vector_store.similarity_search(query, k=k)
-    
-    if not results:
-        print("   No relevant context found.")
-        return ""
-    
-    context_parts = []
-    for i, doc in enumerate(results, 1):
-        source = doc.metadata.get('source', 'Unknown')
-        context_parts.append(f"[Source {i}: {source}]\n{doc.page_content}")
-    
-    context = "\n\n---\n\n".join(context_parts)
-    print(f"   Found {len(results)} relevant documents.")
-    return context
-
-
-def generate_documentation(file_path: str, mode: str):
-    """
-    Generates API documentation for a single file.
-    
-    Args:
-        file_path: Path to the source code file.
-        mode: 'no-rag' or 'rag'.
-    """
-    if not os.path.exists(file_path):
-        print(f"❌ File not found: {file_path}")
-        return
-
-    print(f"📖 Reading file: {file_path}")
-    with open(file_path, "r", encoding="utf-8") as f:
-        file_content = f.read()
-
-    file_name = os.path.basename(file_path)
-    base_name = os.path.splitext(file_name)[0]
+# Batch mode configuration
+SOURCE_EXTENSIONS = [".c", ".h", ".cc", ".cpp", ".hpp", ".rs", ".go", ".py"]
+EXCLUDED_DIRS = {".git", ".venv", "venv", "node_modules", "target", "build", "__pycache__"}
+DEFAULT_CONCURRENCY = 2
+PROGRESS_FILE_NAME = ".progress.json"
 
-    # Initialize LLM
-    print(f"🤖 Initializing LLM ({LLM_MODEL})...")
-    llm = ChatOllama(
-        model=LLM_MODEL,
-        temperature=0.1,
-        keep_alive="5m"
-    )
-
-    # Prepare context based on mode
-    rag_context = ""
-    if mode == "rag":
-        rag_context = get_rag_context(file_content, file_name, k=5)
-    
-    # Define Prompt based on mode
-    if mode == "no-rag":
-        # Minimal baseline prompt - pure LLM capability test
-        template = """Analyze the following source code file: "{file_name}" and provide a summary of its contents.
+# Minimal baseline prompt - pure LLM capability test
+NO_RAG_TEMPLATE = """Analyze the following source code file: "{file_name}" and provide a summary of its contents.
 
 Describe the main components and functions briefly.
 
@@ -98,9 +64,9 @@ Describe the main components and functions briefly.
 
 **Summary**:
 """
-    else:
-        # RAG mode: Aggressive context utilization
-        template = """You are an expert technical writer and software engineer.
+
+# RAG mode: Aggressive context utilization
+RAG_TEMPLATE = """You are an expert technical writer and software engineer.
 Your task is to generate comprehensive API documentation for the following source code file: "{file_name}"
 
 **IMPORTANT: You have access to valuable reference materials from a knowledge base.**
@@ -145,32 +111,386 @@ The documentation should include:
 **Markdown Output**:
 """
 
-    prompt = ChatPromptTemplate.from_template(template)
-    chain = prompt | llm | StrOutputParser()
 
-    print(f"⏳ Generating documentation (Mode: {mode})... (This may take a while)")
-    try:
-        invoke_args = {
-            "file_name": file_name,
-            "file_content": file_content
-        }
-        if mode == "rag":
-            invoke_args["rag_context"] = rag_context
-        
-        doc_content = chain.invoke(invoke_args)
-    except Exception as e:
-        print(f"❌ Error during generation: {e}")
+def create_llm(use_cache: bool = True) -> ChatOllama:
+    """Create the generation LLM client, backed by the disk response cache unless bypassed."""
+    llm = ChatOllama(
+        model=LLM_MODEL,
+        temperature=0.1,
+        keep_alive="5m"
+    )
+    attach_llm_cache(llm, enabled=use_cache)
+    return instrument_llm(llm)
+
+
+def get_rag_context(file_content: str, file_name: str, k: int = 5,
+                    search_type: str = "similarity") -> str:
+    """
+    Retrieves relevant context from VectorDB based on the file content.
+    Uses the retrieval service when it is running, otherwise the in-process store.
+
+    Args:
+        file_content: Source code used to build the query.
+        file_name: Name of the file being documented.
+        k: Number of chunks to retrieve.
+        search_type: 'similarity', 'hybrid' (vector + BM25), 'lexical' (BM25 only)
+            or 'symbols' (one query per public symbol, merged with MMR under a
+            token budget; k is ignored).
+    """
+    if search_type == "symbols":
+        queries = build_queries(file_content, file_name)
+        print(f"🔍 Searching VectorDB with {len(queries)} symbol queries "
+              f"(budget {SYMBOL_CONTEXT_TOKEN_BUDGET} tokens)...")
+        results = multi_search(queries, token_budget=SYMBOL_CONTEXT_TOKEN_BUDGET)
+    else:
+        print(f"🔍 Searching VectorDB for related context (top {k}, {search_type})...")
+
+        # Use key portions of the file as query (first ~1000 chars for efficiency)
+        query = f"API documentation context for: {file_name}\n{file_content[:2000]}"
+
+        results = search([query], k=k, search_type=search_type)[0]
+
+    if not results:
+        print("   No relevant context found.")
+        return ""
+
+    context_parts = []
+    for i, doc in enumerate(results, 1):
+        source = doc.metadata.get('source', 'Unknown')
+        context_parts.append(f"[Source {i}: {source}]\n{doc.page_content}")
+
+    context = "\n\n---\n\n".join(context_parts)
+    print(f"   Found {len(results)} relevant documents.")
+    return context
+
+
+def build_prompt(mode: str) -> ChatPromptTemplate:
+    """Return the prompt template for the given generation mode."""
+    template = NO_RAG_TEMPLATE if mode == "no-rag" else RAG_TEMPLATE
+    return ChatPromptTemplate.from_template(template)
+
+
+def build_invoke_args(file_name: str, file_content: str, mode: str, rag_context: str = "") -> dict:
+    """Build the prompt variables for a generation request."""
+    invoke_args = {
+        "file_name": file_name,
+        "file_content": file_content
+    }
+    if mode == "rag":
+        invoke_args["rag_context"] = rag_context
+    return invoke_args
+
+
+def generate_documentation(file_path: str, mode: str, search_type: str = "similarity",
+                           use_cache: bool = True, map_reduce: str = "auto",
+                           segment_concurrency: int = SEGMENT_CONCURRENCY, stream: bool = False):
+    """
+    Generates API documentation for a single file.
+
+    Args:
+        file_path: Path to the source code file.
+        mode: 'no-rag' or 'rag'.
+        search_type: Retrieval type used in 'rag' mode.
+        use_cache: Serve identical requests from the LLM response cache.
+        map_reduce: 'auto' (segments for files over the context threshold), 'on' or 'off'.
+        segment_concurrency: Segments generated at once in map-reduce mode.
+        stream: Write tokens to the output file as they arrive and report TTFT.
+    """
+    if not os.path.exists(file_path):
+        print(f"❌ File not found: {file_path}")
         return
 
-    # Save Output to mode-specific folder
+    print(f"📖 Reading file: {file_path}")
+    with open(file_path, "r", encoding="utf-8") as f:
+        file_content = f.read()
+
+    file_name = os.path.basename(file_path)
+    base_name = os.path.splitext(file_name)[0]
+
+    # Output goes to a mode-specific folder
     output_dir = os.path.join(OUTPUT_BASE_DIR, mode)
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, f"{base_name}.md")
-    
+
+    # Initialize LLM
+    print(f"🤖 Initializing LLM ({LLM_MODEL})...")
+    llm = create_llm(use_cache)
+
+    if needs_map_reduce(file_content, map_reduce):
+        print(f"⏳ Generating documentation in segments (Mode: {mode}, map-reduce)...")
+        if stream:
+            print(f"   The reduce step is streamed to {output_path}.partial")
+            with CheckpointFile(output_path) as sink:
+                try:
+                    _, _, metrics = asyncio.run(generate_map_reduce(
+                        llm, file_name, file_content, mode, search_type, segment_concurrency, on_token=sink.write
+                    ))
+                except Exception as e:
+                    print(f"❌ Error during generation: {e}")
+                    print(f"   Partial output kept at: {sink.partial_path}")
+                    return
+                sink.commit()
+            print(f"✅ Documentation saved to: {output_path}")
+            print(f"   {metrics.stats_line()}")
+            if llm.cache:
+                print(f"   {llm.cache.stats_line()}")
+            return
+        try:
+            doc_content, _, _ = asyncio.run(generate_map_reduce(
+                llm, file_name, file_content, mode, search_type, segment_concurrency
+            ))
+        except Exception as e:
+            print(f"❌ Error during generation: {e}")
+            return
+    else:
+        # Prepare context based on mode
+        rag_context = ""
+        if mode == "rag":
+            rag_context = get_rag_context(file_content, file_name, k=5, search_type=search_type)
+
+        invoke_args = build_invoke_args(file_name, file_content, mode, rag_context)
+
+        if stream:
+            print(f"⏳ Streaming documentation (Mode: {mode}) to {output_path}.partial ...")
+            messages = build_prompt(mode).invoke(invoke_args).to_messages()
+            with CheckpointFile(output_path) as sink:
+                try:
+                    _, metrics = stream_generation(llm, messages, file_name, sink.write)
+                except Exception as e:
+                    print(f"❌ Error during generation: {e}")
+                    print(f"   Partial output kept at: {sink.partial_path}")
+                    return
+                sink.commit()
+            print(f"✅ Documentation saved to: {output_path}")
+            print(f"   {metrics.stats_line()}")
+            if llm.cache:
+                print(f"   {llm.cache.stats_line()}")
+            return
+
+        chain = build_prompt(mode) | llm | StrOutputParser()
+
+        print(f"⏳ Generating documentation (Mode: {mode})... (This may take a while)")
+        try:
+            doc_content = chain.invoke(invoke_args)
+        except Exception as e:
+            print(f"❌ Error during generation: {e}")
+            return
+
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(doc_content)
-    
+
     print(f"✅ Documentation saved to: {output_path}")
+    if llm.cache:
+        print(f"   {llm.cache.stats_line()}")
+
+
+def discover_source_files(root: str, pattern: Optional[str] = None) -> List[str]:
+    """
+    Recursively collect source files under a directory.
+
+    Args:
+        root: Directory to scan.
+        pattern: Optional glob (e.g. '*.rs') matched against the path relative to root.
+            When omitted, files with a known source extension are collected.
+
+    Returns:
+        Sorted list of file paths.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(path, root)
+            if pattern:
+                if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern):
+                    files.append(path)
+            elif os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS:
+                files.append(path)
+    return sorted(files)
+
+
+def load_progress(progress_path: str) -> dict:
+    """Load the per-file progress record of a previous batch run."""
+    if not os.path.exists(progress_path):
+        return {}
+    with open(progress_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_progress(progress_path: str, progress: dict):
+    """Atomically persist the batch progress record."""
+    tmp_path = f"{progress_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, progress_path)
+
+
+def count_output_tokens(message) -> int:
+    """Completion token count reported by Ollama, or a whitespace estimate."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("output_tokens"):
+        return usage["output_tokens"]
+    return len(str(message.content).split())
+
+
+async def generate_batch(root: str, mode: str, pattern: Optional[str] = None,
+                         concurrency: int = DEFAULT_CONCURRENCY, resume: bool = True,
+                         search_type: str = "similarity", use_cache: bool = True,
+                         map_reduce: str = "auto", segment_concurrency: int = SEGMENT_CONCURRENCY,
+                         stream: bool = False):
+    """
+    Generates API documentation for every source file under a directory.
+
+    Args:
+        root: Directory to document.
+        mode: 'no-rag' or 'rag'.
+        pattern: Optional glob restricting which files are documented.
+        concurrency: Maximum number of files retrieved/generated at once.
+        resume: Skip files already completed by a previous run.
+        search_type: Retrieval type used in 'rag' mode.
+        use_cache: Serve identical requests from the LLM response cache.
+        map_reduce: 'auto' (segments for files over the context threshold), 'on' or 'off'.
+        segment_concurrency: Segments of one file generated at once in map-reduce mode.
+        stream: Stream every file's tokens to its output (checkpointed) and record TTFT.
+    """
+    files = discover_source_files(root, pattern)
+    if not files:
+        print(f"❌ No source files found in: {root}")
+        return
+
+    root_name = os.path.basename(os.path.normpath(root))
+    output_dir = os.path.join(OUTPUT_BASE_DIR, mode, root_name)
+    os.makedirs(output_dir, exist_ok=True)
+    progress_path = os.path.join(output_dir, PROGRESS_FILE_NAME)
+    progress = load_progress(progress_path) if resume else {}
+
+    pending = [p for p in files if progress.get(os.path.relpath(p, root), {}).get("status") != "done"]
+    print(f"📂 Found {len(files)} source files in {root} ({len(files) - len(pending)} already done)")
+    if not pending:
+        print("✅ Nothing to do.")
+        return
+
+    # Shared clients for the whole run
+    print(f"🤖 Initializing LLM ({LLM_MODEL})...")
+    llm = create_llm(use_cache)
+    prompt = build_prompt(mode)
+    chain = prompt | llm
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in pending:
+        queue.put_nowait(path)
+
+    stats = {"done": 0, "failed": 0, "output_tokens": 0, "ttft": []}
+    progress_lock = asyncio.Lock()
+
+    async def worker():
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            rel_path = os.path.relpath(path, root)
+            with tracer.start_as_current_span("generate.file", attributes={"file": rel_path, "mode": mode}) as span:
+                started = time.perf_counter()
+                try:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        file_content = f.read()
+                    file_name = os.path.basename(path)
+                    segmented = needs_map_reduce(file_content, map_reduce)
+                    output_path = os.path.join(output_dir, f"{os.path.splitext(rel_path)[0]}.md")
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    metrics = None
+
+                    if segmented and stream:
+                        with CheckpointFile(output_path) as sink:
+                            doc_content, messages, metrics = await generate_map_reduce(
+                                llm, file_name, file_content, mode, search_type, segment_concurrency,
+                                on_token=sink.write, label=rel_path
+                            )
+                            sink.commit()
+                    elif segmented:
+                        doc_content, messages, _ = await generate_map_reduce(
+                            llm, file_name, file_content, mode, search_type, segment_concurrency
+                        )
+                    else:
+                        rag_context = ""
+                        if mode == "rag":
+                            rag_context = await asyncio.to_thread(
+                                get_rag_context, file_content, file_name, 5, search_type
+                            )
+                        invoke_args = build_invoke_args(file_name, file_content, mode, rag_context)
+                        if stream:
+                            with CheckpointFile(output_path) as sink:
+                                doc_content, metrics = await astream_generation(
+                                    llm, prompt.invoke(invoke_args).to_messages(), rel_path, sink.write
+                                )
+                                sink.commit()
+                            messages = []
+                        else:
+                            message = await chain.ainvoke(invoke_args)
+                            doc_content, messages = str(message.content), [message]
+
+                    if metrics is None:
+                        with open(output_path, "w", encoding="utf-8") as f:
+                            f.write(doc_content)
+
+                    # Streamed requests are counted by their metrics, the rest by message
+                    tokens = sum(count_output_tokens(message) for message in messages)
+                    llm_calls = len(messages)
+                    if metrics is not None:
+                        tokens += metrics.output_tokens
+                        llm_calls += 1
+                    record = {
+                        "status": "done",
+                        "output": output_path,
+                        "output_tokens": tokens,
+                        "llm_calls": llm_calls,
+                        "map_reduce": segmented,
+                        "seconds": round(time.perf_counter() - started, 2),
+                    }
+                    if metrics is not None and metrics.ttft is not None:
+                        record["ttft_s"] = round(metrics.ttft, 2)
+                        record["tokens_per_sec"] = round(metrics.tokens_per_sec, 2)
+                        stats["ttft"].append(metrics.ttft)
+                    stats["done"] += 1
+                    stats["output_tokens"] += tokens
+                    print(f"✅ [{stats['done'] + stats['failed']}/{len(pending)}] {rel_path} -> {output_path}")
+                except Exception as e:
+                    record = {"status": "failed", "error": str(e)}
+                    stats["failed"] += 1
+                    print(f"❌ [{stats['done'] + stats['failed']}/{len(pending)}] {rel_path}: {e}")
+                span.set_attribute("status", record["status"])
+                span.set_attribute("output_tokens", record.get("output_tokens", 0))
+                span.set_attribute("map_reduce", record.get("map_reduce", False))
+
+            async with progress_lock:
+                progress[rel_path] = record
+                save_progress(progress_path, progress)
+
+    print(f"⏳ Generating documentation for {len(pending)} files (Mode: {mode}, concurrency: {concurrency})...")
+    run_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - run_started
+
+    # Throughput Summary
+    files_per_min = stats["done"] / (elapsed / 60) if elapsed > 0 else 0.0
+    tokens_per_sec = stats["output_tokens"] / elapsed if elapsed > 0 else 0.0
+    print("\n" + "=" * 50)
+    print("📊 BATCH SUMMARY")
+    print("=" * 50)
+    print(f"Files documented : {stats['done']}")
+    print(f"Files failed     : {stats['failed']}")
+    print(f"Elapsed          : {elapsed:.1f}s")
+    print(f"Throughput       : {files_per_min:.2f} files/min, {tokens_per_sec:.2f} tokens/sec")
+    if stats["ttft"]:
+        ttfts = sorted(stats["ttft"])
+        print(f"Time to 1st token: mean {sum(ttfts) / len(ttfts):.2f}s, "
+              f"max {ttfts[-1]:.2f}s over {len(ttfts)} streamed files")
+    if llm.cache:
+        print(llm.cache.stats_line())
+    print(f"💾 Progress saved to: {progress_path}")
 
 
 def main():
@@ -184,19 +504,101 @@ Examples:
 
     # With RAG (LLM + VectorDB context):
     python src/generate_docs.py target.cpp --mode rag
+
+    # With RAG, merging vector and BM25 hits (better for exact identifiers):
+    python src/generate_docs.py target.cpp --mode rag --retrieval hybrid
+
+    # With RAG, one query per public symbol so large files are covered end to end:
+    python src/generate_docs.py sessions.py --mode rag --retrieval symbols
+
+    # Whole repository, 4 files in flight (resumes automatically):
+    python src/generate_docs.py test_data/requests --mode rag --concurrency 4
+
+    # Only Rust files of a tree:
+    python src/generate_docs.py test_data/tokio --glob "*.rs"
+
+    # Stream tokens into the output file as they arrive and report time-to-first-token:
+    python src/generate_docs.py target.cpp --mode rag --stream
+
+    # Force segment-wise (map-reduce) generation, 6 segments in flight:
+    python src/generate_docs.py sqlite3.c --mode rag --map-reduce on --segment-concurrency 6
         """
     )
-    parser.add_argument("file", help="Path to the source code file")
+    parser.add_argument("file", help="Path to the source code file, or a directory to document recursively")
     parser.add_argument(
         "--mode",
         choices=["no-rag", "rag"],
         default="no-rag",
         help="Generation mode: 'no-rag' (LLM only) or 'rag' (LLM + VectorDB context). Default: no-rag"
     )
-    
+    parser.add_argument(
+        "--retrieval",
+        choices=RETRIEVAL_CHOICES,
+        default="similarity",
+        help="RAG retrieval: 'similarity' (vector), 'hybrid' (vector + BM25), 'lexical' (BM25 only) "
+             "or 'symbols' (per-symbol queries merged with MMR). Default: similarity"
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Bypass the LLM response cache (always call the model, store nothing)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write tokens to the output Markdown as they arrive (checkpointed to <name>.md.partial) "
+             "and log TTFT / latency / tokens-per-sec to output/stream_metrics.jsonl"
+    )
+    parser.add_argument(
+        "--map-reduce",
+        choices=MAP_REDUCE_CHOICES,
+        default="auto",
+        help="Document large files segment by segment and merge the parts: 'auto' (files over the "
+             "context threshold), 'on' or 'off'. Default: auto"
+    )
+    parser.add_argument(
+        "--segment-concurrency",
+        type=int,
+        default=SEGMENT_CONCURRENCY,
+        help=f"Map-reduce mode: segments of one file generated at once (default: {SEGMENT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--glob",
+        help="Directory mode: only document files matching this pattern (default: known source extensions)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Directory mode: maximum files processed at once (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Directory mode: ignore saved progress and regenerate every file"
+    )
+
     args = parser.parse_args()
-    
-    generate_documentation(args.file, args.mode)
+    init_tracing("generate_docs")
+
+    if os.path.isdir(args.file):
+        asyncio.run(generate_batch(
+            args.file,
+            args.mode,
+            pattern=args.glob,
+            concurrency=args.concurrency,
+            resume=not args.restart,
+            search_type=args.retrieval,
+            use_cache=not args.no_llm_cache,
+            map_reduce=args.map_reduce,
+            segment_concurrency=args.segment_concurrency,
+            stream=args.stream
+        ))
+    else:
+        with tracer.start_as_current_span("generate.file", attributes={"file": args.file, "mode": args.mode}):
+            generate_documentation(args.file, args.mode, search_type=args.retrieval,
+                                   use_cache=not args.no_llm_cache, map_reduce=args.map_reduce,
+                                   segment_concurrency=args.segment_concurrency, stream=args.stream)
 
 
 if __name__ == "__main__":
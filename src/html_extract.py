@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Streaming HTML Text Extraction for AutoDoc-RAG.
+A faster alternative to ingest_web.bs4_extractor for large single-page specs
+(CppCoreGuidelines, dbus-specification.html, ...). Instead of building a
+BeautifulSoup tree, the page is fed to lxml's HTML parser with a parser
+target, so text is collected from parse events and no tree is ever built.
+
+lxml_extractor() returns the same text as bs4_extractor().
+extract_sections() additionally splits the page at its h1-h6 headings and
+returns the heading path of every section, which ends up in chunk metadata.
+
+Micro-benchmark against bs4_extractor:
+    python src/html_extract.py ground_truth/rust
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from lxml import etree
+
+# Elements whose text never reaches the output: removed by bs4_extractor
+# (script, style, nav, footer, header) or held in string containers that
+# BeautifulSoup's get_text() skips (template, rt, rp).
+SKIPPED_TAGS = {"script", "style", "nav", "footer", "header", "template", "rt", "rp"}
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+def clean_text_node(text: str, lines: List[str]):
+    """bs4_extractor's whitespace clean-up, applied to one stripped text node."""
+    for line in text.splitlines():
+        for phrase in line.strip().split("  "):
+            phrase = phrase.strip()
+            if phrase:
+                lines.append(phrase)
+
+
+class SectionCollector:
+    """
+    lxml parser target turning parse events into (headings, text lines) sections.
+    Text between two tag events is one text node, exactly as BeautifulSoup
+    sees it, so node boundaries (and therefore line breaks) match bs4.
+    """
+
+    def __init__(self):
+        self.sections: List[Tuple[Dict[str, str], List[str]]] = []
+        self.headings: Dict[int, str] = {}
+        self.lines: List[str] = []
+        self.buffer: List[str] = []
+        self.skip_depth = 0
+        self.heading_level = 0
+        self.heading_text: List[str] = []
+
+    def _flush_text(self):
+        if not self.buffer:
+            return
+        text = "".join(self.buffer).strip()
+        self.buffer = []
+        if text:
+            clean_text_node(text, self.lines)
+            if self.heading_level:
+                self.heading_text.append(text)
+
+    def _flush_section(self):
+        if self.lines:
+            headings = {f"h{level}": self.headings[level] for level in sorted(self.headings)}
+            self.sections.append((headings, self.lines))
+        self.lines = []
+
+    def start(self, tag, attrib):
+        self._flush_text()
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in HEADING_TAGS and not self.skip_depth and not self.heading_level:
+            self._flush_section()
+            self.heading_level = HEADING_TAGS[tag]
+            self.heading_text = []
+
+    def end(self, tag):
+        self._flush_text()
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif self.heading_level and HEADING_TAGS.get(tag) == self.heading_level:
+            level = self.heading_level
+            self.headings = {k: v for k, v in self.headings.items() if k < level}
+            self.headings[level] = " ".join(" ".join(self.heading_text).split())
+            self.heading_level = 0
+
+    def data(self, text):
+        if not self.skip_depth:
+            self.buffer.append(text)
+
+    def comment(self, text):
+        self._flush_text()
+
+    def pi(self, target, data=None):
+        self._flush_text()
+
+    def doctype(self, *args):
+        self._flush_text()
+
+    def close(self):
+        self._flush_text()
+        self._flush_section()
+        return self.sections
+
+
+def parse_sections(html: str) -> List[Tuple[Dict[str, str], List[str]]]:
+    """Run the streaming parser over a page."""
+    collector = SectionCollector()
+    parser = etree.HTMLParser(target=collector, recover=True)
+    if not html:
+        html = " "
+    for offset in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[offset:offset + FEED_CHUNK_SIZE])
+    return parser.close()
+
+
+def lxml_extractor(html: str) -> str:
+    """Extract text content from HTML; same output as bs4_extractor."""
+    return "\n".join(line for _, lines in parse_sections(html) for line in lines)
+
+
+def extract_sections(html: str) -> List[Tuple[Dict[str, str], str]]:
+    """
+    Extract the text of a page split at its headings.
+
+    Returns:
+        (heading metadata, section text) pairs in page order. The metadata maps
+        'h1'..'h6' to the enclosing headings of the section, e.g.
+        {'h1': 'D-Bus Specification', 'h2': 'Message Protocol'}.
+    """
+    return [(headings, "\n".join(lines)) for headings, lines in parse_sections(html)]
+
+
+def benchmark(corpus_dir: str, repeat: int = 3):
+    """Compare bs4_extractor and lxml_extractor on every .html file under a directory."""
+    from ingest_web import bs4_extractor
+
+    paths = sorted(
+        os.path.join(dirpath, name)
+        for dirpath, _, filenames in os.walk(corpus_dir)
+        for name in filenames if name.endswith(".html")
+    )
+    if not paths:
+        print(f"❌ No .html files found in {corpus_dir}")
+        return
+    pages = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    total_mb = sum(len(page.encode("utf-8")) for page in pages) / (1024 * 1024)
+    largest = max(range(len(pages)), key=lambda i: len(pages[i]))
+    print(f"📂 {len(pages)} HTML files, {total_mb:.1f} MB (largest: {paths[largest]})")
+
+    extractors = {"bs4_extractor": bs4_extractor, "lxml_extractor": lxml_extractor}
+    results = {}
+    for name, extractor in extractors.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outputs = [extractor(page) for page in pages]
+            best = min(best, time.perf_counter() - started)
+        tracemalloc.start()
+        extractor(pages[largest])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": best, "peak_mb": peak / (1024 * 1024), "outputs": outputs}
+
+    identical = sum(a == b for a, b in zip(results["bs4_extractor"]["outputs"], results["lxml_extractor"]["outputs"]))
+    print(f"\n{'Extractor':<16} {'Time (s)':>10} {'MB/s':>10} {'Pages/s':>10} {'Peak MB*':>10}")
+    print("-" * 60)
+    for name, result in results.items():
+        print(f"{name:<16} {result['seconds']:>10.2f} {total_mb / result['seconds']:>10.1f} "
+              f"{len(pages) / result['seconds']:>10.1f} {result['peak_mb']:>10.1f}")
+    print("-" * 60)
+    speedup = results["bs4_extractor"]["seconds"] / results["lxml_extractor"]["seconds"]
+    print(f"Speed-up: {speedup:.1f}x, identical output on {identical}/{len(pages)} pages")
+    print(f"* traced Python allocations while extracting the largest page (best of {repeat} for times)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming HTML extractor against bs4_extractor")
+    parser.add_argument("corpus", nargs="?", default="ground_truth/rust",
+                        help="Directory of .html files (default: ground_truth/rust)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per extractor, best is reported (default: 3)")
+    args = parser.parse_args()
+    benchmark(args.corpus, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Multi-source Ingestion Script for AutoDoc-RAG.
+Ingests every web URL and local directory listed in a sources file (YAML or
+JSON) in a single process: sources are crawled and loaded in parallel, and all
+of their chunks go through one embedder and one Chroma writer.
+
+Sources file:
+    max_depth: 2                 # default crawl depth for URLs
+    sources:
+      - url: https://arc42.org/overview
+      - url: https://isocpp.github.io/CppCoreGuidelines/CppCoreGuidelines
+        max_depth: 1
+      - dir: docs
+
+Usage:
+    python src/ingest_batch.py ingest_sources.yaml
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from typing import Iterator, List, Tuple
+
+import yaml
+from langchain_chroma import Chroma
+
+from embedding_backend import create_embeddings
+from embedding_cache import CachedEmbeddings
+from ingest_data import iter_sources as iter_directory_sources
+from ingest_manifest import directory_scope, load_manifest
+from ingest_pipeline import EMBED_BATCH_SIZE, MAX_IN_FLIGHT, QUEUE_SIZE, run_ingest_pipeline
+from tracing import init_tracing
+from ingest_web import EXTRACTORS, create_crawler, iter_web_sources
+from web_crawler import CONCURRENCY, PER_HOST_CONCURRENCY, RATE_LIMIT
+
+# Configuration (Must match ingest_data.py)
+DB_DIR = "data/vector_db"
+EMBEDDING_MODEL = "nomic-embed-text"
+OLLAMA_BASE_URL = "http://localhost:11434"
+COLLECTION_NAME = "autodoc_rag"
+SOURCES_FILE = "ingest_sources.yaml"
+PARALLEL_SOURCES = 4
+DEFAULT_MAX_DEPTH = 2
+
+_DONE = object()
+
+
+def load_sources_file(path: str) -> List[dict]:
+    """
+    Read a YAML or JSON sources file.
+
+    Returns:
+        One dict per source with 'kind' ('url' or 'dir'), 'location' and, for
+        URLs, 'max_depth'.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            config = json.load(f)
+        else:
+            config = yaml.safe_load(f)
+
+    default_depth = config.get("max_depth", DEFAULT_MAX_DEPTH)
+    entries = []
+    for item in config.get("sources", []):
+        if isinstance(item, str):
+            item = {"url": item} if item.startswith(("http://", "https://")) else {"dir": item}
+        if "url" in item:
+            entries.append({"kind": "url", "location": item["url"],
+                            "max_depth": item.get("max_depth", default_depth)})
+        elif "dir" in item:
+            entries.append({"kind": "dir", "location": item["dir"]})
+        else:
+            raise ValueError(f"Source entry needs a 'url' or 'dir' key: {item}")
+    return entries
+
+
+def source_scope(entry: dict) -> str:
+    """Directory or URL a source entry is responsible for in the manifest (see in_scope)."""
+    if entry["kind"] == "url":
+        return entry["location"]
+    return directory_scope(entry["location"])
+
+
+class SourceMerger:
+    """
+    Runs one loader thread per source entry (at most `parallel` at a time) and
+    merges their output into a single stream for the ingestion pipeline.
+    Each entry ends up in `results` as loaded or failed, and the scopes of
+    successful entries are left in `scopes` for the pipeline's purge step.
+    """
+
+    def __init__(self, entries: List[dict], manifest: dict, crawl_options: dict,
+                 parallel: int = PARALLEL_SOURCES, queue_size: int = QUEUE_SIZE):
+        self.entries = entries
+        self.manifest = manifest
+        self.crawl_options = crawl_options
+        self.parallel = threading.Semaphore(max(1, parallel))
+        self.buffer: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.scopes = [source_scope(entry) for entry in entries]
+        self.results = {}
+
+    def _load(self, entry: dict) -> Iterator[Tuple]:
+        if entry["kind"] == "url":
+            crawler = create_crawler(entry["location"], entry["max_depth"], self.manifest, **self.crawl_options)
+            yield from iter_web_sources(crawler, {"pages": 0})
+            print(f"   {entry['location']}: {crawler.stats_line()}")
+        else:
+            if not os.path.isdir(entry["location"]):
+                raise FileNotFoundError(f"Directory not found: {entry['location']}")
+            yield from iter_directory_sources(entry["location"])
+
+    def _run(self, entry: dict):
+        with self.parallel:
+            count = 0
+            try:
+                for item in self._load(entry):
+                    count += 1
+                    self.buffer.put(item)
+                if not count:
+                    raise RuntimeError("No documents found")
+                self.results[entry["location"]] = {"status": "loaded", "sources": count}
+            except Exception as e:
+                # Keep everything this entry ingested before
+                self.scopes.remove(source_scope(entry))
+                self.results[entry["location"]] = {"status": "failed", "sources": count, "error": str(e)}
+            print(f"📦 Finished loading: {entry['location']} ({count} sources)")
+
+    def __iter__(self):
+        threads = [threading.Thread(target=self._run, args=(entry,), daemon=True) for entry in self.entries]
+        for thread in threads:
+            thread.start()
+
+        def finish():
+            for thread in threads:
+                thread.join()
+            self.buffer.put(_DONE)
+
+        threading.Thread(target=finish, daemon=True).start()
+        while True:
+            item = self.buffer.get()
+            if item is _DONE:
+                return
+            yield item
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest every web URL and directory of a sources file into VectorDB",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/ingest_batch.py
+    python src/ingest_batch.py ingest_sources.yaml --parallel-sources 6 --rate-limit 5
+        """
+    )
+    parser.add_argument("sources_file", nargs="?", default=SOURCES_FILE,
+                        help=f"YAML or JSON list of URLs and directories (default: {SOURCES_FILE})")
+    parser.add_argument("--parallel-sources", type=int, default=PARALLEL_SOURCES,
+                        help=f"Sources crawled/loaded at the same time (default: {PARALLEL_SOURCES})")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Pages fetched concurrently per URL source (default: {CONCURRENCY})")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY,
+                        help=f"Pages fetched concurrently from one host (default: {PER_HOST_CONCURRENCY})")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="Requests per second per host, 0 for unlimited (default: 0)")
+    parser.add_argument("--extractor", choices=list(EXTRACTORS), default="bs4",
+                        help="'bs4' (BeautifulSoup) or 'lxml' (streaming, keeps heading metadata). Default: bs4")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore saved frontiers of interrupted crawls and start from the roots")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help=f"Chunks per embedding request and per write (default: {EMBED_BATCH_SIZE})")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT,
+                        help=f"Maximum concurrent embedding requests (default: {MAX_IN_FLIGHT})")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help=f"Capacity of the queues between pipeline stages (default: {QUEUE_SIZE})")
+    args = parser.parse_args()
+    init_tracing("ingest_batch")
+
+    entries = load_sources_file(args.sources_file)
+    print("=" * 42)
+    print("Starting Bulk Ingestion")
+    print(f"Sources: {len(entries)} from {args.sources_file}")
+    print("=" * 42)
+
+    # 1. One embedder and one Chroma writer for every source
+    backend = create_embeddings(EMBEDDING_MODEL, OLLAMA_BASE_URL)
+    print(f"🔢 Initializing embeddings with model '{backend.model}'...")
+    embeddings = CachedEmbeddings(backend, backend.model)
+    vector_store = Chroma(
+        persist_directory=DB_DIR,
+        embedding_function=embeddings,
+        collection_name=COLLECTION_NAME
+    )
+
+    # 2. Parallel loaders -> one split/embed/write pipeline
+    manifest = load_manifest()
+    merger = SourceMerger(
+        entries,
+        manifest,
+        crawl_options={
+            "concurrency": args.concurrency,
+            "per_host": args.per_host,
+            "rate_limit": args.rate_limit,
+            "resume": not args.restart,
+            "extractor": args.extractor,
+        },
+        parallel=args.parallel_sources,
+        queue_size=args.queue_size
+    )
+    try:
+        stats = run_ingest_pipeline(
+            merger,
+            vector_store,
+            embeddings,
+            manifest,
+            scope=merger.scopes,
+            batch_size=args.embed_batch_size,
+            max_in_flight=args.max_in_flight,
+            queue_size=args.queue_size
+        )
+    except Exception as e:
+        print(f"❌ Ingestion pipeline failed: {e}")
+        sys.exit(1)
+
+    # 3. Per-source report
+    failed = []
+    print("-" * 42)
+    for entry in entries:
+        result = merger.results.get(entry["location"], {"status": "failed", "sources": 0, "error": "not loaded"})
+        if result["status"] == "loaded":
+            print(f"✅ Success: {entry['location']} ({result['sources']} sources)")
+        else:
+            print(f"❌ Failed: {entry['location']} ({result['error']})")
+            failed.append(entry["location"])
+
+    print("\n" + "=" * 42)
+    print("Ingestion Summary")
+    print("=" * 42)
+    print(f"Sources: {stats['sources_changed']} new/changed, {stats['sources_unchanged']} unchanged, "
+          f"{stats['sources_deleted']} deleted.")
+    print(f"Indexed {stats['chunks_written']} chunks in {stats['batches_written']} batches, "
+          f"purged {stats['chunks_purged']} chunks ({stats['seconds']}s).")
+    print(embeddings.stats_line())
+
+    if not failed:
+        print("All tasks completed successfully!")
+    else:
+        print("Some sources failed to ingest:")
+        for location in failed:
+            print(f" - {location}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
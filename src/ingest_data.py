@@ -1,120 +1,144 @@
 #!/usr/bin/env python3
+"""
+Local Data Ingestion Script for AutoDoc-RAG.
+Streams Markdown, PDF and source code (C/C++, Rust, Go, Python) from a
+directory into ChromaDB through the bounded ingestion pipeline (load -> split
+-> embed in batches -> write in batches). Memory stays flat on large corpora
+and completed batches are persisted as the run progresses. Markdown/PDF files
+are loaded (see doc_loader.py) and code is chunked at function/class boundaries
+(see code_chunker.py) in process pools.
+
+Usage:
+    python src/ingest_data.py [--source docs/] [--embed-batch-size 64] [--max-in-flight 2] [--workers 4]
+"""
+import argparse
 import os
-import glob
-from typing import List
-
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, TextLoader
-from langchain_community.document_loaders.generic import GenericLoader
-from langchain_community.document_loaders.parsers import LanguageParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
-from langchain_ollama import OllamaEmbeddings
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+from code_chunker import PreChunked, iter_code_chunks
+from doc_loader import LoadTimings, iter_text_documents
+from embedding_backend import create_embeddings
+from embedding_cache import CachedEmbeddings
+from ingest_manifest import directory_scope, load_manifest
+from ingest_pipeline import EMBED_BATCH_SIZE, MAX_IN_FLIGHT, QUEUE_SIZE, run_ingest_pipeline
+from tracing import init_tracing
+
 # Configuration
 DOCS_DIR = "docs"
 DB_DIR = "data/vector_db"
 EMBEDDING_MODEL = "nomic-embed-text"
 OLLAMA_BASE_URL = "http://localhost:11434"
+COLLECTION_NAME = "autodoc_rag"
 
-def load_text_documents(source_dir: str) -> List[Document]:
-    """Load Markdown and PDF documents."""
-    documents = []
-    
-    # Load Markdown
-    print(f"Loading Markdown files from {source_dir}...")
-    md_loader = DirectoryLoader(
-        source_dir,
-        glob="**/*.md",
-        loader_cls=TextLoader,
-        recursive=True,
-        show_progress=True
-    )
-    documents.extend(md_loader.load())
-
-    # Load PDFs
-    print(f"Loading PDF files from {source_dir}...")
-    pdf_loader = DirectoryLoader(
-        source_dir,
-        glob="**/*.pdf",
-        loader_cls=PyPDFLoader,
-        recursive=True,
-        show_progress=True
-    )
-    documents.extend(pdf_loader.load())
-    
-    return documents
-
-def load_code_documents(source_dir: str) -> List[Document]:
-    """Load C/C++ source code."""
-    print(f"Loading C/C++ files from {source_dir}...")
-    loader = GenericLoader.from_filesystem(
-        source_dir,
-        glob="**/*",
-        suffixes=[".c", ".cpp", ".h", ".hpp", ".cc"],
-        parser=LanguageParser(language=Language.CPP, parser_threshold=500),
-        show_progress=True
+
+def load_text_documents(source_dir: str, workers: Optional[int] = None) -> Iterator[Tuple[str, List[Document]]]:
+    """Load Markdown and PDF documents in parallel, one source at a time, and report load times."""
+    print(f"Loading Markdown and PDF files from {source_dir}...")
+    timings = LoadTimings()
+    yield from iter_text_documents(source_dir, workers, timings)
+    timings.print_report()
+
+
+def load_code_documents(source_dir: str, workers: Optional[int] = None) -> Iterator[Tuple[str, List[Document]]]:
+    """Chunk C/C++, Rust, Go and Python source code in parallel, one source at a time."""
+    print(f"Chunking source code from {source_dir}...")
+    yield from iter_code_chunks(source_dir, workers)
+
+
+def iter_sources(source_dir: str, workers: Optional[int] = None) -> Iterator[Tuple[str, List[Document], object]]:
+    """
+    Stream every source under source_dir together with the splitter it needs.
+    The directory is normalized first, so ./docs and docs produce the same
+    manifest keys and chunk IDs (and match directory_scope).
+    """
+    source_dir = os.path.normpath(source_dir)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", " ", ""]
     )
-    return loader.load()
+    code_splitter = PreChunked()
+    for source, docs in load_text_documents(source_dir, workers):
+        yield source, docs, text_splitter
+    for source, docs in load_code_documents(source_dir, workers):
+        yield source, docs, code_splitter
+
 
 def main():
-    # 1. Load Documents
-    text_docs = load_text_documents(DOCS_DIR)
-    code_docs = load_code_documents(DOCS_DIR)
-    
-    if not text_docs and not code_docs:
-        print("No documents found in docs/ directory.")
-        return
-
-    print(f"Loaded {len(text_docs)} text documents and {len(code_docs)} code documents.")
-
-    # 2. Split Documents
-    all_chunks = []
-
-    # Split Text
-    if text_docs:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        text_chunks = text_splitter.split_documents(text_docs)
-        print(f"Split text documents into {len(text_chunks)} chunks.")
-        all_chunks.extend(text_chunks)
-
-    # Split Code
-    if code_docs:
-        code_splitter = RecursiveCharacterTextSplitter.from_language(
-            language=Language.CPP,
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        code_chunks = code_splitter.split_documents(code_docs)
-        print(f"Split code documents into {len(code_chunks)} chunks.")
-        all_chunks.extend(code_chunks)
-
-    if not all_chunks:
-        print("No chunks to index.")
-        return
-
-    # 3. Initialize Embeddings
-    print(f"Initializing embeddings with model '{EMBEDDING_MODEL}'...")
-    embeddings = OllamaEmbeddings(
-        model=EMBEDDING_MODEL,
-        base_url=OLLAMA_BASE_URL
+    parser = argparse.ArgumentParser(
+        description="Ingest local documents and source code into VectorDB",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/ingest_data.py
+    python src/ingest_data.py --source ground_truth/python/ --embed-batch-size 128 --max-in-flight 4
+    python src/ingest_data.py --source ~/src/ripgrep --workers 8
+        """
+    )
+    parser.add_argument("--source", default=DOCS_DIR, help=f"Directory to ingest (default: {DOCS_DIR})")
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help=f"Chunks per embedding request and per write (default: {EMBED_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=MAX_IN_FLIGHT,
+        help=f"Maximum concurrent embedding requests (default: {MAX_IN_FLIGHT})"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=QUEUE_SIZE,
+        help=f"Capacity of the queues between pipeline stages (default: {QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes loading documents and chunking source code in parallel (default: CPU count)"
     )
+    args = parser.parse_args()
+    init_tracing("ingest_data")
+
+    # 1. Initialize Embeddings
+    backend = create_embeddings(EMBEDDING_MODEL, OLLAMA_BASE_URL)
+    print(f"Initializing embeddings with model '{backend.model}'...")
+    embeddings = CachedEmbeddings(backend, backend.model)
 
-    # 4. Save to ChromaDB
-    print(f"Indexing {len(all_chunks)} chunks to ChromaDB at {DB_DIR}...")
     # Using persist_directory to create a persistent instance
-    vector_store = Chroma.from_documents(
-        documents=all_chunks,
-        embedding=embeddings,
+    vector_store = Chroma(
         persist_directory=DB_DIR,
-        collection_name="autodoc_rag"
+        embedding_function=embeddings,
+        collection_name=COLLECTION_NAME
+    )
+
+    # 2. Stream load -> split -> embed -> write
+    print(f"Ingesting {args.source} into ChromaDB at {DB_DIR}...")
+    stats = run_ingest_pipeline(
+        iter_sources(args.source, args.workers),
+        vector_store,
+        embeddings,
+        load_manifest(),
+        scope=directory_scope(args.source),
+        batch_size=args.embed_batch_size,
+        max_in_flight=args.max_in_flight,
+        queue_size=args.queue_size
     )
-    
+
+    print(f"Sources: {stats['sources_changed']} new/changed, {stats['sources_unchanged']} unchanged, "
+          f"{stats['sources_deleted']} deleted.")
+    print(f"Indexed {stats['chunks_written']} chunks in {stats['batches_written']} batches, "
+          f"purged {stats['chunks_purged']} chunks ({stats['seconds']}s).")
     print("Ingestion complete!")
+    print(embeddings.stats_line())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Ingestion Manifest for AutoDoc-RAG.
+Records the content hash and chunk IDs of every ingested source so that
+re-running ingestion only touches what changed:
+  - unchanged sources are skipped,
+  - changed sources are re-split and upserted under deterministic chunk IDs,
+  - sources that disappeared are purged from the collection.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List
+
+from langchain_core.documents import Document
+
+# Configuration
+MANIFEST_PATH = "data/ingest_manifest.json"
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """Load the manifest, returning an empty one if it does not exist yet."""
+    if not os.path.exists(path):
+        return {"sources": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    """Atomically write the manifest to disk."""
+    manifest_dir = os.path.dirname(path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def group_by_source(documents: Iterable[Document]) -> Dict[str, List[Document]]:
+    """Group loaded documents (e.g. PDF pages) by their 'source' metadata."""
+    grouped: Dict[str, List[Document]] = {}
+    for doc in documents:
+        grouped.setdefault(doc.metadata.get("source", "Unknown"), []).append(doc)
+    return grouped
+
+
+def content_hash(documents: List[Document]) -> str:
+    """Hash of the loaded content of one source."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def make_chunk_ids(source: str, chunks: List[Document]) -> List[str]:
+    """Deterministic chunk IDs derived from source, position and text."""
+    return [
+        hashlib.sha256(f"{source}\0{index}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+def directory_scope(path: str) -> str:
+    """Scope of a directory run: the normalized path with a trailing separator."""
+    return os.path.join(os.path.normpath(path), "")
+
+
+def in_scope(source: str, scope: str) -> bool:
+    """
+    True if a source lies inside a scope at a path boundary: https://host/docs
+    covers https://host/docs and https://host/docs/api, not https://host/docs-old.
+    """
+    if not source.startswith(scope):
+        return False
+    rest = source[len(scope):]
+    return not rest or scope.endswith(("/", os.sep)) or rest[0] in "/?"
+
+
+def is_unchanged(manifest: dict, source: str, source_hash: str) -> bool:
+    """True if the source was already ingested with the same content."""
+    entry = manifest["sources"].get(source)
+    return bool(entry) and entry.get("hash") == source_hash
+
+
+def find_deleted(manifest: dict, seen_sources: Iterable[str], scope: str) -> List[str]:
+    """
+    Manifest sources inside the run's scope that were not seen in this run.
+
+    Args:
+        manifest: Loaded manifest.
+        seen_sources: Every source loaded during this run, changed or not.
+        scope: Directory (see directory_scope) or URL this run is responsible for.
+    """
+    seen = set(seen_sources)
+    return [source for source in manifest["sources"] if in_scope(source, scope) and source not in seen]
+
+
+def clear_untracked_source(vector_store, manifest: dict, source: str):
+    """
+    Remove chunks of a source the manifest does not know yet.
+    These are left behind by earlier random-ID ingestion runs and must be
+    cleared before the source is written under deterministic IDs.
+    """
+    if source not in manifest["sources"]:
+        vector_store._collection.delete(where={"source": source})
+
+
+def commit_source(vector_store, manifest: dict, source: str, source_hash: str,
+                  chunk_ids: List[str]) -> List[str]:
+    """
+    Record a source whose chunks have all been written, and delete the
+    chunks of its previous version that no longer exist.
+
+    Returns:
+        IDs of the stale chunks that were deleted.
+    """
+    stale = []
+    entry = manifest["sources"].get(source)
+    if entry:
+        stale = sorted(set(entry.get("chunk_ids", [])) - set(chunk_ids))
+        if stale:
+            vector_store.delete(ids=stale)
+
+    manifest["sources"][source] = {
+        "hash": source_hash,
+        "chunk_ids": chunk_ids,
+        "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return stale
+
+
+def purge_sources(vector_store, manifest: dict, sources: List[str]) -> List[str]:
+    """
+    Remove deleted sources from the collection and the manifest.
+
+    Returns:
+        IDs of the chunks that were deleted.
+    """
+    removed = []
+    for source in sources:
+        ids = manifest["sources"].pop(source, {}).get("chunk_ids", [])
+        if ids:
+            vector_store.delete(ids=ids)
+            removed.extend(ids)
+    return removed
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Streaming Ingestion Pipeline for AutoDoc-RAG.
+Moves documents through load -> split -> embed -> write with bounded queues
+between the stages, so memory stays flat regardless of corpus size and every
+completed batch is already persisted if the run crashes.
+
+    loader thread --(queue)--> splitter thread --(queue)--> embedding pool --> writer
+
+Sources are fed as (source, documents, splitter) tuples. A loader that already
+knows a source is unchanged (e.g. an HTTP 304), or failed to load it and wants
+its previous chunks kept, passes documents=None. Each source is checked against
+the ingestion manifest; only new or changed sources are split and embedded, and
+a source is committed to the manifest once its last batch has
+been written. The lexical BM25 index (src/bm25_index.py) is updated in place
+with the same writes and deletions. Both are checkpointed every
+CHECKPOINT_INTERVAL seconds and when the run ends (also on failure): the BM25
+transaction is committed, then the manifest is saved. Sources committed after
+the last checkpoint of a crashed run are simply re-ingested under the same
+chunk IDs.
+Every stage is traced (ingest.split, ingest.embed, ingest.write under one
+ingest.run span, see tracing.py). Every write and deletion bumps the
+collection version, which invalidates cached retrieval results (see
+retrieval_cache.py).
+"""
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+from bm25_index import INDEX_PATH as LEXICAL_INDEX_PATH, BM25Index
+from retrieval_cache import bump_version
+from tracing import tracer
+from ingest_manifest import (
+    clear_untracked_source, commit_source, content_hash, find_deleted, in_scope,
+    is_unchanged, make_chunk_ids, purge_sources, save_manifest
+)
+
+# Defaults
+EMBED_BATCH_SIZE = 64
+MAX_IN_FLIGHT = 2
+QUEUE_SIZE = 4
+CHECKPOINT_INTERVAL = 15  # seconds between BM25 index commits + manifest saves
+
+_DONE = object()
+
+
+class _StageError:
+    """Carries an exception raised inside a prefetch thread to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(iterable: Iterable, maxsize: int = QUEUE_SIZE) -> Iterator:
+    """
+    Run an iterable in a background thread, buffering at most `maxsize` items.
+    The producer blocks when the consumer falls behind.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(_StageError(e))
+        buffer.put(_DONE)
+
+    # The producer inherits the caller's context, so its spans share the caller's trace
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(produce,), daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+class ChunkBatch:
+    """A batch of chunks to embed, plus the sources whose last chunk it carries."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.chunks: List[Document] = []
+        self.completed: List[Tuple[str, str, List[str]]] = []
+
+
+def run_ingest_pipeline(sources: Iterable[Tuple[str, List[Document], object]],
+                        vector_store, embeddings, manifest: dict, scope: Union[str, List[str]],
+                        batch_size: int = EMBED_BATCH_SIZE,
+                        max_in_flight: int = MAX_IN_FLIGHT,
+                        queue_size: int = QUEUE_SIZE,
+                        lexical_index_path: Optional[str] = LEXICAL_INDEX_PATH) -> dict:
+    """
+    Incrementally ingest a stream of sources into the vector store.
+
+    Args:
+        sources: Iterable of (source, documents, splitter) tuples, one per source;
+            documents=None marks a source the loader knows to be unchanged.
+        vector_store: Target Chroma store.
+        embeddings: Embedding model used for the chunks (e.g. CachedEmbeddings).
+        manifest: Loaded ingestion manifest, updated as sources complete and saved
+            at every checkpoint.
+        scope: Directory (see directory_scope) or URL of this run, or a list of
+            them; unseen manifest sources inside a scope (see in_scope) are purged. Nothing is purged from a scope in
+            which the run saw no sources at all, which protects the collection from
+            a failed crawl or a mistyped path. A list is read only after the source
+            stream is exhausted, so callers may drop the scopes of failed loaders.
+        batch_size: Number of chunks per embedding request and per write.
+        max_in_flight: Maximum number of embedding requests running at once.
+        queue_size: Capacity of the queues between the load, split and embed stages.
+        lexical_index_path: BM25 index kept in sync with the collection (None disables it).
+
+    Returns:
+        Counters describing the run.
+    """
+    stats = {
+        "sources_changed": 0,
+        "sources_unchanged": 0,
+        "sources_deleted": 0,
+        "chunks_written": 0,
+        "chunks_purged": 0,
+        "batches_written": 0,
+    }
+    seen_sources = set()
+    lexical_index = BM25Index(lexical_index_path) if lexical_index_path else None
+    last_checkpoint = time.monotonic()
+    pending = False
+
+    def checkpoint(force: bool = False):
+        nonlocal last_checkpoint, pending
+        if not pending:
+            return
+        if force or time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+            # BM25 first: the saved manifest never lists a source the index lacks
+            if lexical_index is not None:
+                lexical_index.commit()
+                bump_version()
+            save_manifest(manifest)
+            last_checkpoint = time.monotonic()
+            pending = False
+
+    def chunk_batches() -> Iterator[ChunkBatch]:
+        batch = ChunkBatch()
+        for source, docs, splitter in prefetch(sources, queue_size):
+            seen_sources.add(source)
+            if docs is None:
+                stats["sources_unchanged"] += 1
+                continue
+            source_hash = content_hash(docs)
+            if is_unchanged(manifest, source, source_hash):
+                stats["sources_unchanged"] += 1
+                continue
+
+            stats["sources_changed"] += 1
+            with tracer.start_as_current_span("ingest.split", attributes={"source": source, "documents": len(docs)}) as span:
+                chunks = splitter.split_documents(docs)
+                span.set_attribute("chunks", len(chunks))
+            ids = make_chunk_ids(source, chunks)
+            clear_untracked_source(vector_store, manifest, source)
+
+            for chunk_id, chunk in zip(ids, chunks):
+                batch.ids.append(chunk_id)
+                batch.chunks.append(chunk)
+                if len(batch.ids) >= batch_size:
+                    yield batch
+                    batch = ChunkBatch()
+            batch.completed.append((source, source_hash, ids))
+        if batch.ids or batch.completed:
+            yield batch
+
+    def embed(batch: ChunkBatch) -> List[List[float]]:
+        if not batch.chunks:
+            return []
+        with tracer.start_as_current_span("ingest.embed", attributes={"chunks": len(batch.chunks)}):
+            return embeddings.embed_documents([chunk.page_content for chunk in batch.chunks])
+
+    def write(batch: ChunkBatch, vectors: List[List[float]]):
+        with tracer.start_as_current_span("ingest.write", attributes={
+            "chunks": len(batch.ids), "sources_completed": len(batch.completed)
+        }):
+            write_batch(batch, vectors)
+
+    def write_batch(batch: ChunkBatch, vectors: List[List[float]]):
+        nonlocal pending
+        if batch.ids:
+            texts = [chunk.page_content for chunk in batch.chunks]
+            vector_store._collection.upsert(
+                ids=batch.ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[chunk.metadata or None for chunk in batch.chunks],
+            )
+            if lexical_index is not None:
+                lexical_index.add(batch.ids, texts, [chunk.metadata for chunk in batch.chunks], commit=False)
+            stats["chunks_written"] += len(batch.ids)
+            stats["batches_written"] += 1
+            if stats["batches_written"] % 10 == 0:
+                print(f"   ... {stats['chunks_written']} chunks written")
+        for source, source_hash, ids in batch.completed:
+            stale = commit_source(vector_store, manifest, source, source_hash, ids)
+            if lexical_index is not None:
+                lexical_index.remove(stale, commit=False)
+        if batch.ids or batch.completed:
+            bump_version()
+            pending = True
+            checkpoint()
+
+    started = time.perf_counter()
+    in_flight: deque = deque()
+    with tracer.start_as_current_span("ingest.run", attributes={
+        "batch_size": batch_size, "max_in_flight": max_in_flight
+    }) as run_span:
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+                for batch in prefetch(chunk_batches(), queue_size):
+                    in_flight.append((batch, pool.submit(contextvars.copy_context().run, embed, batch)))
+                    # Write in submission order so manifest commits follow their chunks
+                    while len(in_flight) >= max(1, max_in_flight):
+                        done_batch, future = in_flight.popleft()
+                        write(done_batch, future.result())
+                while in_flight:
+                    done_batch, future = in_flight.popleft()
+                    write(done_batch, future.result())
+
+            scopes = [scope] if isinstance(scope, str) else list(scope)
+            deleted = []
+            for prefix in scopes:
+                if any(in_scope(source, prefix) for source in seen_sources):
+                    deleted.extend(find_deleted(manifest, seen_sources, prefix))
+            deleted = list(dict.fromkeys(deleted))
+            if deleted:
+                purged = purge_sources(vector_store, manifest, deleted)
+                if lexical_index is not None:
+                    lexical_index.remove(purged, commit=False)
+                stats["chunks_purged"] = len(purged)
+                stats["sources_deleted"] = len(deleted)
+                pending = True
+                bump_version()
+        finally:
+            checkpoint(force=True)
+            if lexical_index is not None:
+                lexical_index.close()
+            for key, value in stats.items():
+                run_span.set_attribute(key, value)
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
@@ -2,6 +2,9 @@
 """
 Web URL Data Ingestion Script for AutoDoc-RAG.
 Recursively crawls a URL and ingests all linked pages into ChromaDB.
+Pages are fetched concurrently by src/web_crawler.py; pages the server reports
+as unchanged (HTTP 304) are skipped before extraction and embedding, and an
+interrupted crawl resumes from its saved frontier.
 
 Usage:
     python src/ingest_web.py <URL> [--max-depth=2]
@@ -11,15 +14,21 @@ Example:
 """
 import argparse
 import re
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 from bs4 import BeautifulSoup
 
-from langchain_community.document_loaders.recursive_url_loader import RecursiveUrlLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+from embedding_backend import create_embeddings
+from embedding_cache import CachedEmbeddings
+from html_extract import extract_sections
+from ingest_manifest import load_manifest
+from ingest_pipeline import EMBED_BATCH_SIZE, MAX_IN_FLIGHT, run_ingest_pipeline
+from tracing import init_tracing
+from web_crawler import CONCURRENCY, PER_HOST_CONCURRENCY, RATE_LIMIT, WebCrawler
+
 # Configuration (Must match ingest_data.py)
 DB_DIR = "data/vector_db"
 EMBEDDING_MODEL = "nomic-embed-text"
@@ -46,33 +55,58 @@ def bs4_extractor(html: str) -> str:
     return text
 
 
-def load_web_documents(url: str, max_depth: int = 2) -> List[Document]:
+# 'lxml' streams the page through lxml's parser (much faster on large spec
+# pages) and keeps the h1-h6 heading path of every section as chunk metadata.
+EXTRACTORS = {
+    "bs4": bs4_extractor,
+    "lxml": extract_sections,
+}
+
+
+def create_crawler(url: str, max_depth: int = 2, manifest: dict = None, extractor: str = "bs4",
+                   **options) -> WebCrawler:
     """
-    Recursively load documents from a URL.
+    Create the crawler for a root URL.
     
     Args:
         url: The root URL to start crawling from.
         max_depth: Maximum depth of links to follow (default: 2).
+        manifest: Ingestion manifest, used to decide which stored pages may be revalidated.
+        extractor: Key of EXTRACTORS used to turn pages into documents.
+        **options: Further WebCrawler options (concurrency, per_host, rate_limit, resume).
         
     Returns:
-        List of Document objects containing the web page content.
+        WebCrawler extracting pages with the chosen extractor.
     """
     print(f"🌐 Starting recursive crawl from: {url}")
     print(f"   Max depth: {max_depth}")
     
-    loader = RecursiveUrlLoader(
-        url=url,
+    return WebCrawler(
+        url,
+        EXTRACTORS[extractor],
         max_depth=max_depth,
-        extractor=bs4_extractor,
-        prevent_outside=True,  # Stay within the same domain
+        manifest=manifest,
         timeout=30,
-        check_response_status=True,
+        **options
     )
-    
-    documents = loader.load()
-    print(f"   Loaded {len(documents)} pages.")
-    
-    return documents
+
+
+def iter_web_sources(crawler: WebCrawler, stats: dict) -> Iterator[Tuple[str, Optional[List[Document]], object]]:
+    """
+    Stream crawled pages as pipeline sources, counting them in stats['pages'].
+    Unchanged pages are passed on without documents so they are neither
+    re-split nor purged.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    for page in crawler.iter_pages():
+        if page.status in ("failed", "skipped"):
+            continue
+        stats["pages"] += 1
+        yield page.url, page.documents, text_splitter
 
 
 def main():
@@ -92,50 +126,95 @@ Examples:
         default=2, 
         help="Maximum depth of links to follow (default: 2)"
     )
-    
-    args = parser.parse_args()
-    
-    # 1. Load Web Documents
-    web_docs = load_web_documents(args.url, args.max_depth)
-    
-    if not web_docs:
-        print("❌ No documents found from the URL.")
-        return
-    
-    # 2. Split Documents
-    print(f"✂️  Splitting {len(web_docs)} documents...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", ". ", " ", ""]
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help=f"Pages fetched concurrently (default: {CONCURRENCY})"
     )
-    chunks = text_splitter.split_documents(web_docs)
-    print(f"   Split into {len(chunks)} chunks.")
-    
-    if not chunks:
-        print("❌ No chunks to index.")
-        return
-    
-    # 3. Initialize Embeddings
-    print(f"🔢 Initializing embeddings with model '{EMBEDDING_MODEL}'...")
-    embeddings = OllamaEmbeddings(
-        model=EMBEDDING_MODEL,
-        base_url=OLLAMA_BASE_URL
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=PER_HOST_CONCURRENCY,
+        help=f"Pages fetched concurrently from one host (default: {PER_HOST_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=RATE_LIMIT,
+        help="Requests per second per host, 0 for unlimited (default: 0)"
+    )
+    parser.add_argument(
+        "--extractor",
+        choices=list(EXTRACTORS),
+        default="bs4",
+        help="'bs4' (BeautifulSoup) or 'lxml' (streaming, keeps heading metadata). Default: bs4"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the saved frontier of an interrupted crawl and start from the root"
+    )
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help=f"Chunks per embedding request and per write (default: {EMBED_BATCH_SIZE})"
     )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=MAX_IN_FLIGHT,
+        help=f"Maximum concurrent embedding requests (default: {MAX_IN_FLIGHT})"
+    )
+    
+    args = parser.parse_args()
+    init_tracing("ingest_web")
     
-    # 4. Save to ChromaDB (Append to existing collection)
-    print(f"💾 Indexing {len(chunks)} chunks to ChromaDB at {DB_DIR}...")
-    vector_store = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
+    # 1. Initialize Embeddings
+    backend = create_embeddings(EMBEDDING_MODEL, OLLAMA_BASE_URL)
+    print(f"🔢 Initializing embeddings with model '{backend.model}'...")
+    embeddings = CachedEmbeddings(backend, backend.model)
+    vector_store = Chroma(
         persist_directory=DB_DIR,
+        embedding_function=embeddings,
         collection_name=COLLECTION_NAME
     )
-    
+
+    # 2. Stream crawl -> split -> embed -> write (Append to existing collection)
+    manifest = load_manifest()
+    crawler = create_crawler(
+        args.url,
+        args.max_depth,
+        manifest,
+        extractor=args.extractor,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        rate_limit=args.rate_limit,
+        resume=not args.restart
+    )
+    crawl_stats = {"pages": 0}
+    stats = run_ingest_pipeline(
+        iter_web_sources(crawler, crawl_stats),
+        vector_store,
+        embeddings,
+        manifest,
+        scope=args.url,
+        batch_size=args.embed_batch_size,
+        max_in_flight=args.max_in_flight
+    )
+
+    if not crawl_stats["pages"]:
+        print("❌ No documents found from the URL.")
+        return
+
     print("✅ Web ingestion complete!")
     print(f"   Source: {args.url}")
-    print(f"   Pages crawled: {len(web_docs)}")
-    print(f"   Chunks indexed: {len(chunks)}")
+    print(f"   Pages crawled: {crawl_stats['pages']} ({stats['sources_unchanged']} unchanged)")
+    print(f"   Chunks indexed: {stats['chunks_written']}")
+    print(f"   Chunks purged: {stats['chunks_purged']}")
+    print(f"   {crawler.stats_line()}")
+    print(f"   {embeddings.stats_line()}")
 
 
 if __name__ == "__main__":
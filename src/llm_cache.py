@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Persistent LLM Response Cache for AutoDoc-RAG.
+A LangChain cache backed by SQLite, shared by generate_docs.py,
+evaluate_docs.py and rag_agent.py. Each entry is keyed by a hash of the model
+name, the decoding parameters and the fully rendered prompt, so re-running an
+experiment with identical inputs returns instantly instead of repeating a
+multi-minute CPU inference.
+
+Usage:
+    llm = ChatOllama(model=LLM_MODEL, temperature=0.1)
+    cache = attach_llm_cache(llm)          # or attach_llm_cache(llm, enabled=False) to bypass
+    ...
+    print(cache.stats_line())
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+# Configuration
+CACHE_PATH = "data/llm_cache.sqlite"
+MAX_BYTES = 512 * 1024 * 1024
+
+# Model attributes that change the output and therefore belong in the cache key
+DECODING_PARAMS = [
+    "model", "temperature", "top_p", "top_k", "num_ctx", "num_predict", "seed",
+    "repeat_penalty", "repeat_last_n", "stop", "format", "mirostat", "mirostat_eta",
+    "mirostat_tau", "tfs_z",
+]
+
+
+def llm_fingerprint(llm) -> str:
+    """Stable description of a model and its decoding parameters."""
+    params = {"class": type(llm).__name__}
+    for name in DECODING_PARAMS:
+        value = getattr(llm, name, None)
+        if value is not None:
+            params[name] = value
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def serialize_generation(generation: Generation) -> dict:
+    """Plain-JSON form of a cached generation."""
+    if isinstance(generation, ChatGeneration):
+        message = generation.message
+        return {
+            "type": "chat",
+            "content": message.content,
+            "usage_metadata": getattr(message, "usage_metadata", None),
+            "response_metadata": message.response_metadata,
+        }
+    return {"type": "text", "text": generation.text}
+
+
+def deserialize_generation(data: dict) -> Generation:
+    """Inverse of serialize_generation."""
+    if data["type"] == "chat":
+        message = AIMessage(
+            content=data["content"],
+            usage_metadata=data.get("usage_metadata"),
+            response_metadata=data.get("response_metadata") or {},
+        )
+        return ChatGeneration(message=message)
+    return Generation(text=data["text"])
+
+
+class DiskLLMCache(BaseCache):
+    """
+    SQLite-backed LangChain cache with least-recently-used size eviction.
+
+    Args:
+        namespace: Model fingerprint mixed into every key (see llm_fingerprint).
+        cache_path: SQLite file holding the cached responses.
+        max_bytes: Least recently used entries are evicted beyond this total size.
+    """
+
+    def __init__(self, namespace: str = "", cache_path: str = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return [deserialize_generation(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = json.dumps([serialize_generation(generation) for generation in return_val], default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, len(value), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC").fetchall()
+        victims = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats_line(self) -> str:
+        """One-line summary of the cache counters."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        return (f"LLM cache: {self.hits} hits, {self.misses} misses "
+                f"({hit_rate:.1f}% hit rate), {self.evictions} evicted")
+
+
+def attach_llm_cache(llm, enabled: bool = True, cache_path: str = CACHE_PATH) -> Optional[DiskLLMCache]:
+    """
+    Give an LLM its own namespace in the disk cache.
+
+    Args:
+        llm: LangChain chat model (e.g. ChatOllama).
+        enabled: False bypasses caching entirely (no reads, no writes).
+        cache_path: SQLite file holding the cached responses.
+
+    Returns:
+        The attached cache, or None when bypassed.
+    """
+    if not enabled:
+        llm.cache = False
+        return None
+    cache = DiskLLMCache(namespace=llm_fingerprint(llm), cache_path=cache_path)
+    llm.cache = cache
+    return cache
+
+
+def lookup_messages(llm, messages: List[BaseMessage]) -> Optional[AIMessage]:
+    """
+    Cached response for a chat request, for code paths that bypass
+    invoke() (LangChain's stream() neither reads nor writes the cache).
+    Uses the same key as invoke(), so both paths share entries.
+    """
+    if not isinstance(llm.cache, BaseCache):
+        return None
+    cached = llm.cache.lookup(dumps(messages), llm._get_llm_string())
+    if not cached:
+        return None
+    generation = cached[0]
+    if isinstance(generation, ChatGeneration):
+        return generation.message
+    return AIMessage(content=generation.text)
+
+
+def store_messages(llm, messages: List[BaseMessage], message: AIMessage):
+    """Store a response produced outside invoke() (see lookup_messages)."""
+    if isinstance(llm.cache, BaseCache):
+        llm.cache.update(dumps(messages), llm._get_llm_string(), [ChatGeneration(message=message)])
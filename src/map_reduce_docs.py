@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Map-reduce Documentation Generation for AutoDoc-RAG.
+Files that do not fit the model context window (sqlite3.c, requests'
+sessions.py, ...) are documented in segments instead of one huge prompt:
+
+  1. split: the file is cut at function/class boundaries (code_chunker.py)
+     into segments of about SEGMENT_TOKENS,
+  2. map: every segment is documented concurrently with its own retrieval
+     query (RAG mode), so each prompt stays small,
+  3. reduce: the module overview and usage example are written from the
+     segment summaries, and all parts are merged into the layout of
+     generate_docs.RAG_TEMPLATE.
+
+The reduce prompts stay small as well: while the segment summaries exceed
+REDUCE_TOKEN_BUDGET, batches of consecutive summaries are condensed into one
+(hierarchically, over several rounds if needed), and the symbol list is
+sampled down to MAX_REDUCE_SYMBOLS. In no-rag mode segments are only
+summarized and the summaries merged into one summary, the shape of
+generate_docs.NO_RAG_TEMPLATE, so the baseline is not given the RAG layout.
+
+Generation time therefore grows with the number of segments divided by the
+concurrency, not with the prompt length. With an on_token sink (generate_docs.py
+--stream) the final reduce request is streamed into the document: the module
+overview in RAG mode, the merged summary in no-rag mode.
+
+Usage:
+    document, messages, _ = await generate_map_reduce(llm, "sessions.py", content, "rag")
+"""
+import asyncio
+import re
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+
+from code_chunker import CodeChunker
+from retrieval import estimate_tokens, multi_search, search
+from streaming import StreamMetrics, astream_generation
+from symbol_queries import build_queries, detect_language
+from tracing import tracer
+
+# Configuration
+MAP_REDUCE_THRESHOLD_TOKENS = 4000
+SEGMENT_TOKENS = 1500
+SEGMENT_CONCURRENCY = 4
+SEGMENT_CONTEXT_K = 3
+SEGMENT_CONTEXT_TOKEN_BUDGET = 1000
+REDUCE_TOKEN_BUDGET = 2500  # segment summaries per reduce prompt
+MAX_REDUCE_ROUNDS = 4
+MAX_REDUCE_SYMBOLS = 80
+MAX_REDUCE_REFERENCES = 20
+MAP_REDUCE_CHOICES = ["auto", "on", "off"]
+
+MAP_TEMPLATE = """You are an expert technical writer and software engineer.
+Document one segment (lines {start_line}-{end_line}) of the source code file "{file_name}".
+The rest of the file is documented separately, so describe only what is in this segment.
+{reference_block}
+**Source Code Segment**:
+```
+{segment}
+```
+
+Answer in exactly this format:
+SUMMARY: <one or two sentences on what this segment does>
+
+### Classes/Structs
+For each class or struct defined here: a `####` heading with its name, a description,
+public/protected member variables, and its methods (Signature + Description + Parameters + Return Value).
+Write "None" if there are none.
+
+### Functions
+For each free function defined here: a `####` heading with its name, the signature,
+a description, parameters and return value. Write "None" if there are none.
+"""
+
+MAP_REFERENCE_BLOCK = """
+**Reference Context** (from VectorDB - use its terminology, patterns and guidelines where relevant):
+{rag_context}
+"""
+
+OVERVIEW_TEMPLATE = """You are an expert technical writer and software engineer.
+The source code file "{file_name}" was documented in segments. These are the segment summaries:
+
+{summaries}
+
+Defined symbols: {symbols}
+{reference_line}
+Write the **Module Overview** of the file: 1-3 paragraphs on what the module does and how its
+parts fit together. Output only the overview text in GitHub Flavored Markdown, without a heading.
+"""
+
+USAGE_TEMPLATE = """You are an expert technical writer and software engineer.
+The source code file "{file_name}" defines these symbols: {symbols}
+
+Segment summaries:
+{summaries}
+
+Write a short **Usage Example**: one code snippet showing how to use the key components of the
+file, with a sentence of explanation. Use only the symbols listed above. Output only the example
+in GitHub Flavored Markdown, without a heading.
+"""
+
+CONDENSE_TEMPLATE = """You are an expert technical writer and software engineer.
+The source code file "{file_name}" was documented in segments. These are the summaries of
+consecutive segments covering lines {start_line}-{end_line}:
+
+{summaries}
+
+Merge them into one summary of at most {max_words} words that keeps the most important
+components and what they do. Output only the merged summary.
+"""
+
+# no-rag mode: the baseline prompt (generate_docs.NO_RAG_TEMPLATE), per segment and merged
+NO_RAG_MAP_TEMPLATE = """Analyze the following segment (lines {start_line}-{end_line}) of the source code file: "{file_name}" and provide a summary of its contents.
+
+Describe the main components and functions briefly.
+
+**Source Code Segment**:
+```
+{segment}
+```
+
+**Summary**:
+"""
+
+NO_RAG_REDUCE_TEMPLATE = """Analyze the source code file: "{file_name}" and provide a summary of its contents.
+The file was read in segments; these are the summaries of its segments, in file order:
+
+{summaries}
+
+Describe the main components and functions briefly.
+
+**Summary**:
+"""
+
+SUMMARY_PATTERN = re.compile(r"^\s*\**SUMMARY\**\s*:\s*\**\s*(.*)$", re.IGNORECASE | re.MULTILINE)
+SECTION_PATTERN = re.compile(r"^#{1,6}\s*(?:\d+\.\s*)?\**\s*(Classes/Structs|Classes|Functions)\b.*$",
+                             re.IGNORECASE | re.MULTILINE)
+NONE_PATTERN = re.compile(r"^\W*none\W*$", re.IGNORECASE)
+
+
+def needs_map_reduce(file_content: str, setting: str = "auto",
+                     threshold_tokens: int = MAP_REDUCE_THRESHOLD_TOKENS) -> bool:
+    """Whether a file is generated in segments ('on', 'off', or 'auto' by size)."""
+    if setting == "on":
+        return True
+    if setting == "off":
+        return False
+    return estimate_tokens(file_content) > threshold_tokens
+
+
+def split_segments(file_content: str, file_name: str,
+                   segment_tokens: int = SEGMENT_TOKENS) -> List[Tuple[str, List[str], int, int]]:
+    """(text, symbols, first line, last line) segments cut at definition boundaries."""
+    chunker = CodeChunker(file_content, detect_language(file_name), chunk_size=segment_tokens * 4)
+    return chunker.chunks()
+
+
+def segment_contexts(segments: List[Tuple[str, List[str], int, int]], file_name: str,
+                     search_type: str = "similarity") -> List[List[Document]]:
+    """Retrieve the reference chunks of every segment (one batch for non-symbol search types)."""
+    if search_type == "symbols":
+        return [
+            multi_search(build_queries(text, file_name), token_budget=SEGMENT_CONTEXT_TOKEN_BUDGET)
+            for text, _, _, _ in segments
+        ]
+    queries = [
+        f"API documentation context for: {file_name} {', '.join(symbols)}\n{text[:2000]}"
+        for text, symbols, _, _ in segments
+    ]
+    return search(queries, k=SEGMENT_CONTEXT_K, search_type=search_type)
+
+
+def format_context(documents: List[Document]) -> str:
+    return "\n\n---\n\n".join(
+        f"[Source {i}: {doc.metadata.get('source', 'Unknown')}]\n{doc.page_content}"
+        for i, doc in enumerate(documents, 1)
+    )
+
+
+def parse_segment_doc(text: str) -> Tuple[str, str, str]:
+    """
+    Split a map response into (summary, classes, functions).
+    Text before the first section heading (preamble) is dropped; responses
+    that ignore the section headings end up under functions.
+    """
+    summary = ""
+    match = SUMMARY_PATTERN.search(text)
+    if match:
+        summary = match.group(1).strip()
+        text = text[:match.start()] + text[match.end():]
+
+    sections = {"classes": [], "functions": []}
+    headings = list(SECTION_PATTERN.finditer(text))
+    if not headings:
+        sections["functions"].append(text)
+    else:
+        for index, heading in enumerate(headings):
+            end = headings[index + 1].start() if index + 1 < len(headings) else len(text)
+            key = "functions" if heading.group(1).lower() == "functions" else "classes"
+            sections[key].append(text[heading.end():end])
+
+    def clean(parts: List[str]) -> str:
+        return "\n\n".join(part.strip() for part in parts if part.strip() and not NONE_PATTERN.match(part.strip()))
+
+    return summary, clean(sections["classes"]), clean(sections["functions"])
+
+
+def sample_evenly(items: list, limit: int) -> list:
+    """At most `limit` items, picked at even steps so they span the whole list."""
+    if len(items) <= limit:
+        return list(items)
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+def format_symbols(symbols: List[str], limit: int = MAX_REDUCE_SYMBOLS) -> str:
+    """Symbol list for the reduce prompts, sampled across the file when it is long."""
+    if not symbols:
+        return "none detected"
+    listed = ", ".join(sample_evenly(symbols, limit))
+    return f"{listed} (and {len(symbols) - limit} more)" if len(symbols) > limit else listed
+
+
+def format_summaries(items: List[Tuple[int, int, str]]) -> str:
+    return "\n".join(f"- lines {start}-{end}: {summary or 'no summary'}" for start, end, summary in items)
+
+
+def group_summaries(items: List[Tuple[int, int, str]], token_budget: int) -> List[List[Tuple[int, int, str]]]:
+    """Consecutive runs of summaries, each within the token budget (a longer single summary is its own run)."""
+    groups, current, used = [], [], 0
+    for item in items:
+        cost = estimate_tokens(format_summaries([item]))
+        if current and used + cost > token_budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def condense_summaries(llm, file_name: str, items: List[Tuple[int, int, str]], limiter: asyncio.Semaphore,
+                             token_budget: int = REDUCE_TOKEN_BUDGET) -> Tuple[List[Tuple[int, int, str]], list]:
+    """
+    Shrink (first line, last line, summary) items until they fit the token budget
+    by merging consecutive runs with the LLM, round after round.
+
+    Returns:
+        The condensed items and the LLM response messages.
+    """
+    chain = ChatPromptTemplate.from_template(CONDENSE_TEMPLATE) | llm
+    messages = []
+
+    async def condense(group: List[Tuple[int, int, str]], max_words: int) -> Tuple[int, int, str]:
+        start_line, end_line = group[0][0], group[-1][1]
+        if len(group) == 1 and estimate_tokens(group[0][2]) <= max_words:
+            return group[0]
+        async with limiter:
+            message = await chain.ainvoke({
+                "file_name": file_name,
+                "start_line": start_line,
+                "end_line": end_line,
+                "summaries": format_summaries(group),
+                "max_words": max_words,
+            })
+        messages.append(message)
+        return start_line, end_line, str(message.content).strip()
+
+    for round_index in range(MAX_REDUCE_ROUNDS):
+        if len(items) <= 1 or estimate_tokens(format_summaries(items)) <= token_budget:
+            break
+        groups = group_summaries(items, token_budget)
+        # ~0.75 words per token, leaving room for the line prefixes
+        max_words = max(20, token_budget * 3 // 4 // len(groups) - 10)
+        with tracer.start_as_current_span("generate.condense", attributes={
+            "file": file_name, "round": round_index, "summaries": len(items), "groups": len(groups)
+        }):
+            items = list(await asyncio.gather(*(condense(group, max_words) for group in groups)))
+    # The model may ignore the word limit: never hand an oversized prompt to the reduce step
+    while estimate_tokens(format_summaries(items)) > token_budget:
+        if len(items) == 1:
+            start_line, end_line, summary = items[0]
+            items = [(start_line, end_line, summary[:token_budget * 4])]
+            break
+        items = sample_evenly(items, len(items) * 3 // 4)
+    return items, messages
+
+
+def stripped_sink(on_token: Callable[[str], None]) -> Callable[[str], None]:
+    """Token sink writing what str.strip() would keep of the streamed text."""
+    state = {"started": False, "held": ""}
+
+    def write(text: str):
+        if not state["started"]:
+            text = text.lstrip()
+            if not text:
+                return
+            state["started"] = True
+        text = state["held"] + text
+        body = text.rstrip()
+        state["held"] = text[len(body):]
+        if body:
+            on_token(body)
+
+    return write
+
+
+def document_header(file_name: str) -> str:
+    """Start of the merged document, up to the module overview."""
+    return f"# {file_name} API Documentation\n\n## 1. Module Overview\n"
+
+
+def assemble_document(file_name: str, overview: str, parsed: List[Tuple[str, str, str]],
+                      usage: str, references: List[str]) -> str:
+    """Merge the reduced parts into the structured layout of the RAG template."""
+    classes = "\n\n".join(part[1] for part in parsed if part[1]) or "None."
+    functions = "\n\n".join(part[2] for part in parsed if part[2]) or "None."
+    lines = [
+        overview.strip(),
+        "",
+        "## 2. Classes/Structs",
+        classes,
+        "",
+        "## 3. Functions",
+        functions,
+        "",
+        "## 4. Usage Example",
+        usage.strip(),
+    ]
+    if references:
+        lines += ["", "## 5. Related References"] + [f"- {source}" for source in references]
+    return document_header(file_name) + "\n".join(lines) + "\n"
+
+
+async def generate_map_reduce(llm, file_name: str, file_content: str, mode: str,
+                              search_type: str = "similarity",
+                              concurrency: int = SEGMENT_CONCURRENCY,
+                              segment_tokens: int = SEGMENT_TOKENS,
+                              on_token: Optional[Callable[[str], None]] = None,
+                              label: Optional[str] = None) -> Tuple[str, list, Optional[StreamMetrics]]:
+    """
+    Document a large file segment by segment.
+
+    Args:
+        llm: Shared chat model (e.g. generate_docs.create_llm()).
+        file_name: Name of the file being documented.
+        file_content: Full source code.
+        mode: 'no-rag' (merged summary) or 'rag' (per-segment retrieval, full layout).
+        search_type: Retrieval type used in 'rag' mode.
+        concurrency: Maximum segment requests running at once.
+        segment_tokens: Approximate size of one segment.
+        on_token: Receives the document as it is written, the final reduce
+            request token by token (see streaming.py); None to not stream.
+        label: Name of the streamed request in the metrics log (default: file_name).
+
+    Returns:
+        The merged Markdown document, every non-streamed LLM response message
+        (for token accounting), and the metrics of the streamed request (None
+        without on_token).
+    """
+    segments = split_segments(file_content, file_name, segment_tokens)
+    print(f"🧩 {file_name}: {len(segments)} segments of ~{segment_tokens} tokens "
+          f"(concurrency: {concurrency})")
+
+    contexts: List[List[Document]] = [[] for _ in segments]
+    if mode == "rag":
+        contexts = await asyncio.to_thread(segment_contexts, segments, file_name, search_type)
+
+    map_template = MAP_TEMPLATE if mode == "rag" else NO_RAG_MAP_TEMPLATE
+    map_chain = ChatPromptTemplate.from_template(map_template) | llm
+    limiter = asyncio.Semaphore(max(1, concurrency))
+    finished = 0
+
+    async def document_segment(index: int):
+        nonlocal finished
+        text, _, start_line, end_line = segments[index]
+        reference_block = ""
+        if contexts[index]:
+            reference_block = MAP_REFERENCE_BLOCK.format(rag_context=format_context(contexts[index]))
+        async with limiter:
+            with tracer.start_as_current_span("generate.segment", attributes={
+                "file": file_name, "start_line": start_line, "end_line": end_line,
+                "context_chunks": len(contexts[index])
+            }):
+                message = await map_chain.ainvoke({
+                    "file_name": file_name,
+                    "start_line": start_line,
+                    "end_line": end_line,
+                    "reference_block": reference_block,
+                    "segment": text,
+                })
+        finished += 1
+        print(f"   [{finished}/{len(segments)}] lines {start_line}-{end_line} documented")
+        return message
+
+    map_messages = await asyncio.gather(*(document_segment(i) for i in range(len(segments))))
+    if mode == "rag":
+        parsed = [parse_segment_doc(str(message.content)) for message in map_messages]
+    else:
+        parsed = [(str(message.content).strip(), "", "") for message in map_messages]
+
+    # Reduce: condense the summaries until they fit one prompt
+    items = [(start, end, summary) for (_, _, start, end), (summary, _, _) in zip(segments, parsed)]
+    items, condense_messages = await condense_summaries(llm, file_name, items, limiter)
+    reduce_args = {"file_name": file_name, "summaries": format_summaries(items)}
+
+    messages = list(map_messages) + condense_messages
+    if mode != "rag":
+        summary_prompt = ChatPromptTemplate.from_template(NO_RAG_REDUCE_TEMPLATE)
+        with tracer.start_as_current_span("generate.reduce", attributes={"file": file_name, "segments": len(segments)}):
+            if on_token is None:
+                summary_message = await (summary_prompt | llm).ainvoke(reduce_args)
+                return str(summary_message.content).strip() + "\n", messages + [summary_message], None
+            summary, metrics = await astream_generation(
+                llm, summary_prompt.invoke(reduce_args).to_messages(), label or file_name, stripped_sink(on_token)
+            )
+        on_token("\n")
+        return summary.strip() + "\n", messages, metrics
+
+    # Overview and usage example from the summaries, both at once
+    symbols: List[str] = []
+    seen = set()
+    for _, segment_symbols, _, _ in segments:
+        for symbol in segment_symbols:
+            if symbol not in seen:
+                seen.add(symbol)
+                symbols.append(symbol)
+    references: List[str] = []
+    for documents in contexts:
+        for doc in documents:
+            source = doc.metadata.get("source", "Unknown")
+            if source not in references:
+                references.append(source)
+    reduce_args.update({
+        "symbols": format_symbols(symbols),
+        "reference_line": (f"Reference documents: {', '.join(references[:MAX_REDUCE_REFERENCES])}\n"
+                           if references else ""),
+    })
+    overview_prompt = ChatPromptTemplate.from_template(OVERVIEW_TEMPLATE)
+    usage_chain = ChatPromptTemplate.from_template(USAGE_TEMPLATE) | llm
+    metrics = None
+    with tracer.start_as_current_span("generate.reduce", attributes={"file": file_name, "segments": len(segments)}):
+        if on_token is None:
+            overview_message, usage_message = await asyncio.gather(
+                (overview_prompt | llm).ainvoke(reduce_args), usage_chain.ainvoke(reduce_args)
+            )
+            overview = str(overview_message.content)
+            messages.append(overview_message)
+        else:
+            # Stream the overview into the document while the usage example is written
+            usage_task = asyncio.create_task(usage_chain.ainvoke(reduce_args))
+            on_token(document_header(file_name))
+            try:
+                overview, metrics = await astream_generation(
+                    llm, overview_prompt.invoke(reduce_args).to_messages(), label or file_name,
+                    stripped_sink(on_token)
+                )
+            except BaseException:
+                usage_task.cancel()
+                raise
+            usage_message = await usage_task
+        messages.append(usage_message)
+
+    document = assemble_document(file_name, overview, parsed, str(usage_message.content), references)
+    if on_token is not None:
+        on_token(document[len(document_header(file_name)) + len(overview.strip()):])
+    return document, messages, metrics
@@ -1,63 +1,155 @@
 #!/usr/bin/env python3
+import argparse
 import sys
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings, ChatOllama
+import time
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from langchain_ollama import ChatOllama
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
+from answer_cache import THRESHOLD as ANSWER_CACHE_THRESHOLD, SemanticAnswerCache
+from llm_cache import attach_llm_cache
+from retrieval import SEARCH_TYPES, ServiceRetriever, embed_queries, get_vector_store, SERVICE_URL
+from streaming import stream_generation
+from tracing import init_tracing, instrument_llm, tracer
+
 # Configuration (Must match ingest_data.py)
-DB_DIR = "data/vector_db"
-EMBEDDING_MODEL = "nomic-embed-text"
 LLM_MODEL = "llama3.1:8b"
-COLLECTION_NAME = "autodoc_rag"
+RETRIEVAL_K = 5
 
-def main():
-    print("Initializing AutoDoc-RAG Agent...")
+QA_TEMPLATE = """You are an expert middleware developer assistant. 
+    Use the following pieces of retrieved context to answer the question. 
+    If the context does not contain the answer, say "I don't have enough information in the provided documents to answer that." 
+    Keep the answer technical, concise, and accurate.
 
-    # 1. Initialize Embeddings (Must match ingestion)
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-
-    # 2. Load Existing Vector DB
-    try:
-        vector_store = Chroma(
-            persist_directory=DB_DIR,
-            embedding_function=embeddings,
-            collection_name=COLLECTION_NAME
-        )
-    except Exception as e:
-        print(f"Error loading Vector DB: {e}")
-        return
+    Context:
+    {context}
 
-    # 3. Setup Retriever
-    # search_kwargs={"k": 5}: Retrieve top 5 most relevant chunks
-    retriever = vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 5}
-    )
+    Question: {question}
+
+    Answer:"""
 
-    # 4. Initialize LLM (Llama 3.1 via Ollama)
+QA_CHAIN_PROMPT = PromptTemplate.from_template(QA_TEMPLATE)
+
+
+def create_llm(use_cache: bool = True):
+    """Chat model of the agent (Llama 3.1 via Ollama), with the LLM response cache attached."""
     llm = ChatOllama(
         model=LLM_MODEL,
         temperature=0.1, # Low temperature for factual accuracy
         keep_alive="5m"
     )
+    # Repeated questions with the same retrieved context are answered from disk
+    cache = attach_llm_cache(llm, enabled=use_cache)
+    instrument_llm(llm)
+    return llm, cache
 
-    # 5. Define Contextual Prompt
-    template = """You are an expert middleware developer assistant. 
-    Use the following pieces of retrieved context to answer the question. 
-    If the context does not contain the answer, say "I don't have enough information in the provided documents to answer that." 
-    Keep the answer technical, concise, and accurate.
 
-    Context:
-    {context}
+def create_answer_cache(search_type: str, k: int = RETRIEVAL_K, threshold: float = ANSWER_CACHE_THRESHOLD,
+                        enabled: bool = True) -> Optional[SemanticAnswerCache]:
+    """Semantic answer cache for questions asked with this model and retrieval setup (None when disabled)."""
+    if not enabled:
+        return None
+    return SemanticAnswerCache(namespace=f"{LLM_MODEL}|{search_type}|{k}", threshold=threshold)
 
-    Question: {question}
 
-    Answer:"""
-    
-    QA_CHAIN_PROMPT = PromptTemplate.from_template(template)
+def build_messages(question: str, sources: List[Document]):
+    """The 'stuff' chain prompt for a question and its retrieved chunks."""
+    context = "\n\n".join(doc.page_content for doc in sources)
+    return QA_CHAIN_PROMPT.invoke({"context": context, "question": question}).to_messages()
+
+
+def source_records(sources: List[Document]) -> List[dict]:
+    """Structured form of the referenced source documents."""
+    return [
+        {
+            "rank": i,
+            "id": doc.id,
+            "source": doc.metadata.get("source", "Unknown"),
+            "metadata": doc.metadata,
+            "page_content": doc.page_content,
+        }
+        for i, doc in enumerate(sources, 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interactive Q&A over the AutoDoc-RAG knowledge base")
+    parser.add_argument(
+        "--retrieval",
+        choices=SEARCH_TYPES,
+        default="similarity",
+        help="'similarity' (vector), 'hybrid' (vector + BM25) or 'lexical' (BM25 only). Default: similarity"
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Bypass the LLM response cache (always call the model, store nothing)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the answer token by token and report time-to-first-token (logged to output/stream_metrics.jsonl)"
+    )
+    parser.add_argument(
+        "--no-answer-cache",
+        action="store_true",
+        help="Always retrieve and generate, even for questions similar to earlier ones"
+    )
+    parser.add_argument(
+        "--answer-threshold",
+        type=float,
+        default=ANSWER_CACHE_THRESHOLD,
+        help=f"Cosine similarity to an earlier question at which its answer is reused (default: {ANSWER_CACHE_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as an HTTP service answering many concurrent sessions, streamed over SSE (see agent_server.py)"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address in --serve mode (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8770, help="Port in --serve mode (default: 8770)")
+    parser.add_argument(
+        "--max-llm-concurrency",
+        type=int,
+        default=2,
+        help="LLM requests generated at once in --serve mode; further questions wait (default: 2)"
+    )
+    args = parser.parse_args()
+    init_tracing("rag_agent")
+
+    if args.serve:
+        from agent_server import serve
+        serve(args.host, args.port, search_type=args.retrieval, use_cache=not args.no_llm_cache,
+              max_llm_concurrency=args.max_llm_concurrency, answer_cache=not args.no_answer_cache,
+              answer_threshold=args.answer_threshold)
+        return
+
+    print("Initializing AutoDoc-RAG Agent...")
 
-    # 6. Create QA Chain
+    # 1. Setup Retriever
+    # Served by the retrieval service if it is running, otherwise by an
+    # in-process Vector DB handle opened once here.
+    # k=5: Retrieve top 5 most relevant chunks
+    retriever = ServiceRetriever(k=RETRIEVAL_K, search_type=args.retrieval)
+    if SERVICE_URL:
+        print(f"Using retrieval service at {SERVICE_URL} (falls back to local Vector DB)")
+    else:
+        try:
+            get_vector_store()
+        except Exception as e:
+            print(f"Error loading Vector DB: {e}")
+            return
+
+    # 2. Initialize LLM (Llama 3.1 via Ollama)
+    llm, cache = create_llm(use_cache=not args.no_llm_cache)
+    # Near-identical questions reuse an earlier answer without retrieval or generation
+    answer_cache = create_answer_cache(args.retrieval, threshold=args.answer_threshold,
+                                       enabled=not args.no_answer_cache)
+
+    # 3. Create QA Chain
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
@@ -66,7 +158,7 @@ def main():
         chain_type_kwargs={"prompt": QA_CHAIN_PROMPT}
     )
 
-    # 7. Interactive Loop
+    # 4. Interactive Loop
     print("\n✅ Agent Ready! Ask questions about your middleware. (Type 'exit' to quit)")
     print("-" * 50)
     
@@ -76,20 +168,43 @@ def main():
             if not query:
                 continue
             if query.lower() in ["exit", "quit", "q"]:
+                if cache:
+                    print(cache.stats_line())
+                if answer_cache:
+                    print(answer_cache.stats_line())
                 print("Goodbye!")
                 break
 
             print("Thinking...")
-            result = qa_chain.invoke({"query": query})
-            
-            answer = result["result"]
-            sources = result["source_documents"]
-
-            print(f"\n>> Answer:\n{answer}\n")
+            started = time.perf_counter()
+            with tracer.start_as_current_span("agent.question", attributes={"stream": args.stream}) as span:
+                question_vector = embed_queries([query])[0] if answer_cache else None
+                hit = answer_cache.lookup(question_vector, started) if answer_cache else None
+                span.set_attribute("answer_cache_hit", hit is not None)
+                if hit:
+                    print(f"\n>> Answer (cached, {hit['similarity']:.2f} similar to \"{hit['question']}\"):\n"
+                          f"{hit['answer']}\n")
+                    records = hit["source_documents"]
+                elif args.stream:
+                    # Same prompt as the 'stuff' chain, streamed straight to the terminal
+                    sources = retriever.invoke(query)
+                    messages = build_messages(query, sources)
+                    print("\n>> Answer:")
+                    answer, metrics = stream_generation(llm, messages, query)
+                    print(f"\n\n({metrics.stats_line()})\n")
+                    records = source_records(sources)
+                else:
+                    result = qa_chain.invoke({"query": query})
+
+                    answer = result["result"]
+                    records = source_records(result["source_documents"])
+
+                    print(f"\n>> Answer:\n{answer}\n")
+                if answer_cache and not hit:
+                    answer_cache.store(query, question_vector, answer, records, time.perf_counter() - started)
             print("[Referenced Sources]")
-            for i, doc in enumerate(sources, 1):
-                source_name = doc.metadata.get('source', 'Unknown')
-                print(f"{i}. {source_name}")
+            for record in records:
+                print(f"{record['rank']}. {record['source']}")
 
         except KeyboardInterrupt:
             print("\nGoodbye!")
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Retrieval Client for AutoDoc-RAG.
+Single entry point for VectorDB lookups used by generate_docs.py,
+rag_agent.py and verify_ingestion.py.
+
+If the retrieval service (src/retrieval_service.py) is running, queries are
+sent to it and answered from its warm collection. Otherwise the client falls
+back to in-process mode with one Chroma handle shared by the whole process.
+
+Search types:
+  - similarity: dense vector search (default)
+  - lexical: BM25 over data/bm25_index.sqlite, no embedding round-trip
+  - hybrid: vector and lexical hits merged with reciprocal-rank fusion
+
+multi_search() answers many short queries with one batched embedding call and
+returns a single merged list, diversified with MMR under a token budget.
+Every lookup is traced (retrieve.* spans, see tracing.py). Results are cached
+per query and invalidated whenever ingestion writes (see retrieval_cache.py).
+
+With AUTODOC_VECTOR_STORE=mmap, vector searches run against the compact
+memory-mapped export of the collection (src/vector_index.py) instead of
+Chroma; if no export exists the client falls back to Chroma.
+"""
+import json
+import os
+import threading
+import urllib.request
+from typing import List, Optional
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from bm25_index import (
+    INDEX_PATH as LEXICAL_INDEX_PATH, LEGACY_INDEX_PATH as LEGACY_LEXICAL_INDEX_PATH, BM25Index,
+    reciprocal_rank_fusion
+)
+from embedding_backend import EMBEDDING_BACKEND, create_embeddings
+from retrieval_cache import VersionWatcher, get_retrieval_cache
+from tracing import tracer
+from vector_index import INDEX_DIR as VECTOR_INDEX_DIR, VectorIndex
+
+# Configuration (Must match ingest scripts)
+DB_DIR = "data/vector_db"
+EMBEDDING_MODEL = "nomic-embed-text"
+COLLECTION_NAME = "autodoc_rag"
+
+# Retrieval service endpoint. Set AUTODOC_RETRIEVAL_URL="" to always run in-process.
+SERVICE_URL = os.environ.get("AUTODOC_RETRIEVAL_URL", "http://127.0.0.1:8765")
+SERVICE_TIMEOUT = 120
+
+# Vector store searched in-process: "chroma" or "mmap" (the vector_index.py export)
+VECTOR_STORES = ["chroma", "mmap"]
+VECTOR_STORE = os.environ.get("AUTODOC_VECTOR_STORE", "chroma")
+
+SEARCH_TYPES = ["similarity", "hybrid", "lexical"]
+# In hybrid mode each ranker contributes k * HYBRID_CANDIDATES hits before fusion
+HYBRID_CANDIDATES = 4
+
+# multi_search defaults
+MULTI_FETCH_K = 4
+MULTI_MAX_CHUNKS = 12
+MULTI_TOKEN_BUDGET = 3000
+MMR_LAMBDA = 0.5
+
+_vector_store = None
+_vector_store_versions = VersionWatcher()
+_vector_store_lock = threading.Lock()
+_lexical_index = None
+_lexical_index_lock = threading.Lock()
+_vector_index = None
+_vector_index_mtime = None
+_vector_index_lock = threading.Lock()
+_query_embeddings = None
+
+
+def _forget_chroma_system(persist_directory: str):
+    """
+    Drop chromadb's process-wide client for a directory, so the next handle
+    re-reads the collection from disk instead of sharing the old in-memory index.
+    """
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient._identifier_to_system.pop(persist_directory, None)
+    SharedSystemClient._identifier_to_refcount.pop(persist_directory, None)
+
+
+def get_vector_store() -> Chroma:
+    """
+    Open the Chroma collection once per process and reuse it, reopening it when
+    the collection version changes (another process re-ingested: its in-memory
+    index would still return the replaced chunk IDs).
+    """
+    global _vector_store
+    with _vector_store_lock:
+        _, changed = _vector_store_versions.current()
+        if _vector_store is None or changed:
+            if _vector_store is not None:
+                _forget_chroma_system(DB_DIR)
+            embeddings = create_embeddings(EMBEDDING_MODEL)
+            _vector_store = Chroma(
+                persist_directory=DB_DIR,
+                embedding_function=embeddings,
+                collection_name=COLLECTION_NAME
+            )
+        return _vector_store
+
+
+def get_lexical_index() -> BM25Index:
+    """
+    Open the BM25 index once per process. It is updated in place, so writes
+    committed by ingestion are visible without reopening.
+    """
+    global _lexical_index
+    with _lexical_index_lock:
+        if _lexical_index is None:
+            _lexical_index = BM25Index(LEXICAL_INDEX_PATH)
+            if not len(_lexical_index) and os.path.exists(LEGACY_LEXICAL_INDEX_PATH):
+                print(f"⚠️  {LEGACY_LEXICAL_INDEX_PATH} is no longer read "
+                      f"(run: python src/bm25_index.py --rebuild)")
+        return _lexical_index
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """
+    Map the compact vector index once per process, remapping it when it is re-exported.
+    Returns None (and warns once) when no export exists.
+    """
+    global _vector_index, _vector_index_mtime
+    meta_path = os.path.join(VECTOR_INDEX_DIR, "meta.json")
+    with _vector_index_lock:
+        mtime = os.path.getmtime(meta_path) if os.path.exists(meta_path) else None
+        if mtime is None:
+            if _vector_index_mtime != "missing":
+                print(f"⚠️  No vector index in {VECTOR_INDEX_DIR} (run: python src/vector_index.py --export); "
+                      f"searching Chroma")
+                _vector_index, _vector_index_mtime = None, "missing"
+            return None
+        if _vector_index is None or mtime != _vector_index_mtime:
+            _vector_index = VectorIndex(VECTOR_INDEX_DIR)
+            _vector_index_mtime = mtime
+        return _vector_index
+
+
+def _active_vector_index() -> Optional[VectorIndex]:
+    return get_vector_index() if VECTOR_STORE == "mmap" else None
+
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed a batch of queries in one request (without opening the vector store)."""
+    global _query_embeddings
+    with _vector_store_lock:
+        if _query_embeddings is None:
+            _query_embeddings = create_embeddings(EMBEDDING_MODEL)
+    return _query_embeddings.embed_documents(queries)
+
+
+def query_vectors(query_embeddings: List[List[float]], n_results: int, include: List[str]) -> dict:
+    """Nearest chunks per query, in the result layout of Chroma's Collection.query()."""
+    index = _active_vector_index()
+    if index is not None:
+        return index.query(query_embeddings, n_results=n_results, include=tuple(include))
+    return get_vector_store()._collection.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        include=include
+    )
+
+
+def search_vector(queries: List[str], k: int = 5) -> List[List[Document]]:
+    """
+    Run a batch of similarity searches in-process.
+    All queries are embedded in one request and searched in one collection query.
+    """
+    if not queries:
+        return []
+    with tracer.start_as_current_span("retrieve.embed_queries", attributes={"queries": len(queries)}):
+        query_embeddings = embed_queries(queries)
+    with tracer.start_as_current_span("retrieve.similarity_search",
+                                      attributes={"queries": len(queries), "k": k, "store": VECTOR_STORE}):
+        response = query_vectors(query_embeddings, k, ["documents", "metadatas", "distances"])
+
+    results = []
+    for ids, documents, metadatas in zip(response["ids"], response["documents"], response["metadatas"]):
+        # Chunks deleted since the index was loaded come back without text
+        results.append([
+            Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(ids, documents, metadatas)
+            if text is not None
+        ])
+    return results
+
+
+def search_lexical(queries: List[str], k: int = 5) -> List[List[Document]]:
+    """Run a batch of BM25 searches in-process (no embedding call)."""
+    index = get_lexical_index()
+    with tracer.start_as_current_span("retrieve.bm25_search", attributes={"queries": len(queries), "k": k}):
+        return [
+            [index.get_document(chunk_id) for chunk_id, _ in index.search(query, k)]
+            for query in queries
+        ]
+
+
+def search_local(queries: List[str], k: int = 5, search_type: str = "similarity") -> List[List[Document]]:
+    """Run a batch of searches of the given type in-process."""
+    if search_type == "lexical":
+        return search_lexical(queries, k)
+    if search_type == "hybrid":
+        candidates = k * HYBRID_CANDIDATES
+        vector_results = search_vector(queries, candidates)
+        lexical_results = search_lexical(queries, candidates)
+        return [
+            reciprocal_rank_fusion([vector_hits, lexical_hits], k=k)
+            for vector_hits, lexical_hits in zip(vector_results, lexical_results)
+        ]
+    if search_type == "similarity":
+        return search_vector(queries, k)
+    raise ValueError(f"Unknown search type: {search_type}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def mmr_select(doc_vectors: np.ndarray, relevance: np.ndarray, costs: List[int],
+               max_items: int, token_budget: int, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """
+    Maximal marginal relevance selection under a token budget.
+
+    Args:
+        doc_vectors: L2-normalized candidate embeddings, one row per candidate.
+        relevance: Relevance of each candidate to the query set.
+        costs: Token cost of each candidate.
+        max_items: Maximum number of candidates to select.
+        token_budget: Total token cost allowed.
+        lambda_mult: 1.0 ranks purely by relevance, 0.0 purely by diversity.
+
+    Returns:
+        Indices of the selected candidates, in selection order.
+    """
+    selected: List[int] = []
+    remaining = set(range(len(costs)))
+    max_similarity = np.zeros(len(costs))
+    budget_left = token_budget
+    while remaining and len(selected) < max_items:
+        candidates = [i for i in remaining if costs[i] <= budget_left]
+        if not candidates:
+            break
+        scores = lambda_mult * relevance[candidates] - (1 - lambda_mult) * max_similarity[candidates]
+        best = candidates[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.discard(best)
+        budget_left -= costs[best]
+        max_similarity = np.maximum(max_similarity, doc_vectors @ doc_vectors[best])
+    return selected
+
+
+def multi_search_local(queries: List[str], fetch_k: int = MULTI_FETCH_K,
+                       max_chunks: int = MULTI_MAX_CHUNKS, token_budget: int = MULTI_TOKEN_BUDGET,
+                       lambda_mult: float = MMR_LAMBDA) -> List[Document]:
+    """
+    Answer a set of related queries with one merged, deduplicated, MMR-diversified list.
+    All queries are embedded in one request and searched in one collection query.
+    """
+    if not queries:
+        return []
+    with tracer.start_as_current_span("retrieve.embed_queries", attributes={"queries": len(queries)}):
+        query_matrix = np.asarray(embed_queries(queries), dtype=np.float32)
+    with tracer.start_as_current_span("retrieve.similarity_search",
+                                      attributes={"queries": len(queries), "k": fetch_k, "store": VECTOR_STORE}):
+        response = query_vectors(query_matrix.tolist(), fetch_k, ["documents", "metadatas", "embeddings"])
+
+    # Merge and deduplicate candidates across queries
+    documents, vectors, seen = [], [], set()
+    for ids, texts, metadatas, embeddings in zip(
+        response["ids"], response["documents"], response["metadatas"], response["embeddings"]
+    ):
+        for chunk_id, text, metadata, embedding in zip(ids, texts, metadatas, embeddings):
+            if chunk_id in seen or text is None:
+                continue
+            seen.add(chunk_id)
+            documents.append(Document(id=chunk_id, page_content=text, metadata=metadata or {}))
+            vectors.append(embedding)
+    if not documents:
+        return []
+
+    doc_vectors = np.asarray(vectors, dtype=np.float32)
+    doc_vectors /= np.linalg.norm(doc_vectors, axis=1, keepdims=True) + 1e-12
+    query_matrix /= np.linalg.norm(query_matrix, axis=1, keepdims=True) + 1e-12
+    relevance = (doc_vectors @ query_matrix.T).max(axis=1)
+
+    costs = [estimate_tokens(doc.page_content) for doc in documents]
+    selected = mmr_select(doc_vectors, relevance, costs, max_chunks, token_budget, lambda_mult)
+    return [documents[i] for i in selected]
+
+
+def documents_to_json(results: List[List[Document]]) -> list:
+    """Serialize search results for the wire."""
+    return [
+        [{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+        for docs in results
+    ]
+
+
+def documents_from_json(payload: list) -> List[List[Document]]:
+    """Deserialize search results received from the service."""
+    return [
+        [
+            Document(id=item.get("id"), page_content=item["page_content"], metadata=item.get("metadata") or {})
+            for item in docs
+        ]
+        for docs in payload
+    ]
+
+
+def _cache_namespace() -> str:
+    """Settings that change search results without changing the query, k or search type."""
+    return f"{EMBEDDING_BACKEND}:{EMBEDDING_MODEL}:{VECTOR_STORE}"
+
+
+def _post(path: str, payload: dict) -> dict:
+    """POST a JSON request to the retrieval service."""
+    request = urllib.request.Request(
+        f"{SERVICE_URL}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=SERVICE_TIMEOUT) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def search_remote(queries: List[str], k: int = 5, search_type: str = "similarity") -> List[List[Document]]:
+    """Send a batch of queries to the retrieval service."""
+    payload = _post("/search", {"queries": queries, "k": k, "search_type": search_type})
+    return documents_from_json(payload["results"])
+
+
+def search(queries: List[str], k: int = 5, search_type: str = "similarity",
+           use_cache: bool = True) -> List[List[Document]]:
+    """
+    Retrieve the top-k chunks for each query.
+
+    Args:
+        queries: Query texts, searched as one batch.
+        k: Number of chunks per query.
+        search_type: 'similarity', 'hybrid' or 'lexical'.
+        use_cache: Serve repeated queries from the retrieval cache.
+
+    Returns:
+        One list of Documents per query, in query order.
+    """
+    with tracer.start_as_current_span("retrieve.search", attributes={
+        "queries": len(queries), "k": k, "search_type": search_type
+    }) as span:
+        def run(pending: List[str]) -> List[List[Document]]:
+            span.set_attribute("searched", len(pending))
+            if SERVICE_URL:
+                try:
+                    results = search_remote(pending, k, search_type)
+                    span.set_attribute("remote", True)
+                    return results
+                except OSError:
+                    # Service not running (or unreachable): fall back to in-process mode
+                    pass
+            span.set_attribute("remote", False)
+            return search_local(pending, k, search_type)
+
+        cache = get_retrieval_cache(_cache_namespace()) if use_cache else None
+        if cache is None:
+            return run(queries)
+        return cache.search_batch(queries, (search_type, k), run)
+
+
+def multi_search(queries: List[str], fetch_k: int = MULTI_FETCH_K,
+                 max_chunks: int = MULTI_MAX_CHUNKS, token_budget: int = MULTI_TOKEN_BUDGET,
+                 lambda_mult: float = MMR_LAMBDA, use_cache: bool = True) -> List[Document]:
+    """
+    Retrieve one merged context for many short queries.
+
+    Args:
+        queries: Query texts (e.g. one per public symbol of a file).
+        fetch_k: Candidates fetched per query before merging.
+        max_chunks: Maximum number of chunks returned.
+        token_budget: Maximum estimated tokens of all returned chunks together.
+        lambda_mult: MMR trade-off between relevance (1.0) and diversity (0.0).
+        use_cache: Serve a repeated query set from the retrieval cache.
+
+    Returns:
+        Deduplicated Documents in MMR selection order.
+    """
+    options = {"fetch_k": fetch_k, "max_chunks": max_chunks,
+               "token_budget": token_budget, "lambda_mult": lambda_mult}
+    with tracer.start_as_current_span("retrieve.multi_search", attributes={
+        "queries": len(queries), "fetch_k": fetch_k, "token_budget": token_budget
+    }) as span:
+        def run(pending: List[str]) -> List[Document]:
+            span.set_attribute("cached", False)
+            if SERVICE_URL:
+                try:
+                    payload = _post("/multi_search", {"queries": pending, **options})
+                    span.set_attribute("remote", True)
+                    return documents_from_json([payload["results"]])[0]
+                except OSError:
+                    pass
+            span.set_attribute("remote", False)
+            return multi_search_local(pending, **options)
+
+        cache = get_retrieval_cache(_cache_namespace()) if use_cache else None
+        if cache is None:
+            return run(queries)
+        span.set_attribute("cached", True)
+        return cache.search_group(queries, ("multi", fetch_k, max_chunks, token_budget, lambda_mult), run)
+
+
+class ServiceRetriever(BaseRetriever):
+    """LangChain retriever backed by search(), for use in chains such as RetrievalQA."""
+
+    k: int = 5
+    search_type: str = "similarity"
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return search([query], k=self.k, search_type=self.search_type)[0]
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Retrieval Result Cache for AutoDoc-RAG.
+Query-level cache used by retrieval.search() and retrieval.multi_search(), so
+repeated lookups (verify_ingestion.py's test queries, repeated rag_agent.py
+questions, regenerating a file in both modes) skip the embedding request and
+the collection search. Entries are keyed by the normalized query text, k and
+search type, and live in an in-process LRU backed by SQLite, which shares them
+between generate_docs.py, rag_agent.py and verify_ingestion.py runs.
+
+Every entry also carries the collection version, a counter in
+data/collection_version.json that ingestion bumps on every write (see
+ingest_pipeline.py). Entries of an older version are never served, so cached
+results cannot go stale after a re-ingest.
+
+Usage:
+    cache = get_retrieval_cache()
+    results = cache.search_batch(queries, ("similarity", 5), run_search)
+    print(cache.stats_line())
+
+    python src/retrieval_cache.py --stats          # entries, version, hit counters
+    python src/retrieval_cache.py --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# Configuration
+CACHE_PATH = "data/retrieval_cache.sqlite"
+VERSION_PATH = "data/collection_version.json"
+MAX_ENTRIES = 20000
+MEMORY_ENTRIES = 1024
+# Set AUTODOC_RETRIEVAL_CACHE=0 to disable the cache
+ENABLED = os.environ.get("AUTODOC_RETRIEVAL_CACHE", "1") != "0"
+
+_version_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_query(text: str) -> str:
+    """Query text as used in cache keys: Unicode NFC, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def read_version(path: str = VERSION_PATH) -> int:
+    """Current collection version (0 before the first write)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("version", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_version(path: str = VERSION_PATH) -> int:
+    """
+    Mark the collection as changed, invalidating every cached retrieval result.
+    Called by ingestion after each write or deletion. The read-modify-write
+    holds an flock on <path>.lock, so concurrent ingest processes never write
+    the same version twice.
+
+    Returns:
+        The new version.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _version_lock, open(f"{path}.lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        version = read_version(path) + 1
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f)
+        os.replace(tmp_path, path)
+        return version
+
+
+class VersionWatcher:
+    """Reads the collection version, re-reading the file only when it changes."""
+
+    def __init__(self, path: str = VERSION_PATH):
+        self.path = path
+        self.version: Optional[int] = None
+        self._stamp = None
+
+    def current(self) -> Tuple[int, bool]:
+        """The current version, and whether it differs from the previous call's."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp and self.version is not None:
+            return self.version, False
+        version = read_version(self.path)
+        changed = version != self.version
+        self.version, self._stamp = version, stamp
+        return version, changed
+
+
+def _to_records(documents: List[Document]) -> list:
+    return [{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+
+def _from_records(records: list) -> List[Document]:
+    return [
+        Document(id=record.get("id"), page_content=record["page_content"], metadata=record.get("metadata") or {})
+        for record in records
+    ]
+
+
+class RetrievalCache:
+    """
+    Two-level LRU cache of retrieval results: an in-process OrderedDict in
+    front of a SQLite table evicted by last use.
+
+    Args:
+        namespace: Mixed into every key (e.g. embedding model and vector store).
+        cache_path: SQLite file holding the cached results.
+        version_path: Collection version file written by ingestion.
+        max_entries: Least recently used SQLite entries are evicted beyond this count.
+        memory_entries: Entries kept in the in-process LRU.
+    """
+
+    def __init__(self, namespace: str = "", cache_path: str = CACHE_PATH, version_path: str = VERSION_PATH,
+                 max_entries: int = MAX_ENTRIES, memory_entries: int = MEMORY_ENTRIES):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._memory: "OrderedDict[str, list]" = OrderedDict()
+        self._versions = VersionWatcher(version_path)
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " value TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)")
+        self._conn.commit()
+
+    def current_version(self) -> int:
+        """Collection version; entries of other versions are dropped when it changes."""
+        with self._lock:
+            first = self._versions.version is None
+            version, changed = self._versions.current()
+            if changed:
+                if not first:
+                    self.invalidations += 1
+                self._memory.clear()
+                self._conn.execute("DELETE FROM results WHERE version != ?", (version,))
+                self._conn.commit()
+            return version
+
+    def _key(self, version: int, query: Hashable, params: Tuple) -> str:
+        material = json.dumps([self.namespace, version, query, list(params)], default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, records: list):
+        self._memory[key] = records
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, key: str) -> Optional[List[Document]]:
+        with self._lock:
+            records = self._memory.get(key)
+            if records is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                records = json.loads(row[0])
+                self._remember(key, records)
+            self.hits += 1
+        return _from_records(records)
+
+    def update(self, key: str, version: int, documents: List[Document]):
+        records = _to_records(documents)
+        value = json.dumps(records, ensure_ascii=False, default=str)
+        with self._lock:
+            self._remember(key, records)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, version, value, last_used) VALUES (?, ?, ?, ?)",
+                (key, version, value, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def search_batch(self, queries: List[str], params: Tuple,
+                     run: Callable[[List[str]], List[List[Document]]]) -> List[List[Document]]:
+        """
+        One result list per query: cached ones are served directly, the rest are
+        retrieved with a single call of `run` and cached.
+
+        Args:
+            queries: Query texts.
+            params: Everything besides the query that changes the result (k, search type).
+            run: Retrieves results for a list of queries.
+        """
+        version = self.current_version()
+        keys = [self._key(version, normalize_query(query), params) for query in queries]
+        results: List[Optional[List[Document]]] = [self.lookup(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fetched = run([queries[i] for i in missing])
+            for i, documents in zip(missing, fetched):
+                results[i] = documents
+                self.update(keys[i], version, documents)
+        return results
+
+    def search_group(self, queries: List[str], params: Tuple,
+                     run: Callable[[List[str]], List[Document]]) -> List[Document]:
+        """Cached result of one retrieval answering a whole set of queries (multi_search)."""
+        version = self.current_version()
+        key = self._key(version, [normalize_query(query) for query in queries], params)
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+        documents = run(queries)
+        self.update(key, version, documents)
+        return documents
+
+    def entry_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def stats_line(self) -> str:
+        """One-line summary of the cache counters."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        return (f"Retrieval cache: {self.hits} hits, {self.misses} misses "
+                f"({hit_rate:.1f}% hit rate), {self.invalidations} invalidations")
+
+
+def get_retrieval_cache(namespace: str = "") -> Optional[RetrievalCache]:
+    """The process-wide cache (None when AUTODOC_RETRIEVAL_CACHE=0)."""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.namespace != namespace:
+            _cache = RetrievalCache(namespace)
+        return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect or clear the retrieval result cache",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/retrieval_cache.py --stats
+    python src/retrieval_cache.py --clear
+        """
+    )
+    parser.add_argument("--stats", action="store_true", help="Show the entry count and collection version")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached result")
+    args = parser.parse_args()
+
+    if not args.stats and not args.clear:
+        parser.print_help()
+        return
+    cache = RetrievalCache()
+    if args.clear:
+        cache.clear()
+        print(f"🗑️  Cleared {CACHE_PATH}")
+    if args.stats:
+        print(f"📦 {CACHE_PATH}: {cache.entry_count()} entries at collection version {cache.current_version()}")
+
+
+if __name__ == "__main__":
+    main()
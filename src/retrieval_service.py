@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Retrieval Service for AutoDoc-RAG.
+Long-lived local HTTP daemon that keeps the Chroma collection and the
+embedding client warm, so scripts no longer pay the cold-open cost on
+every retrieval. Clients use src/retrieval.py, which falls back to
+in-process mode when this service is not running.
+
+Endpoints:
+    GET  /health  -> {"status": "ok", "count": <chunks>}
+    POST /search  {"queries": [...], "k": 5, "search_type": "similarity"|"hybrid"|"lexical"}
+                  -> {"results": [[{id, page_content, metadata}, ...], ...]}
+    POST /multi_search  {"queries": [...], "fetch_k": 4, "max_chunks": 12, "token_budget": 3000,
+                         "lambda_mult": 0.5} -> {"results": [{id, page_content, metadata}, ...]}
+
+Usage:
+    python src/retrieval_service.py [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from retrieval import (
+    SEARCH_TYPES, documents_to_json, get_lexical_index, get_vector_store, multi_search_local, search_local
+)
+from tracing import init_tracing
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_K = 100
+MAX_TOKEN_BUDGET = 100000
+# /multi_search options: (name, type, minimum, maximum)
+MULTI_SEARCH_OPTIONS = [
+    ("fetch_k", int, 1, MAX_K),
+    ("max_chunks", int, 1, MAX_K),
+    ("token_budget", int, 1, MAX_TOKEN_BUDGET),
+    ("lambda_mult", float, 0.0, 1.0),
+]
+
+
+class RetrievalHandler(BaseHTTPRequestHandler):
+    """Serves batched similarity searches from the warm collection."""
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "count": get_vector_store()._collection.count()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/search":
+            self._handle_search()
+        elif self.path == "/multi_search":
+            self._handle_multi_search()
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length).decode("utf-8"))
+        if not isinstance(request, dict):
+            raise TypeError("request body must be a JSON object")
+        return request
+
+    def _handle_search(self):
+        try:
+            request = self._read_json()
+            queries = request["queries"]
+            k = int(request.get("k", 5))
+            search_type = request.get("search_type", "similarity")
+            if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                raise ValueError("'queries' must be a list of strings")
+            if not 1 <= k <= MAX_K:
+                raise ValueError(f"'k' must be between 1 and {MAX_K}")
+            if search_type not in SEARCH_TYPES:
+                raise ValueError(f"'search_type' must be one of {SEARCH_TYPES}")
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        started = time.perf_counter()
+        try:
+            results = search_local(queries, k, search_type)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._send_json(200, {"results": documents_to_json(results), "elapsed_ms": round(elapsed_ms, 2)})
+
+    def _handle_multi_search(self):
+        try:
+            request = self._read_json()
+            queries = request["queries"]
+            if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                raise ValueError("'queries' must be a list of strings")
+            options = {}
+            for key, cast, minimum, maximum in MULTI_SEARCH_OPTIONS:
+                if key in request:
+                    options[key] = cast(request[key])
+                    if not minimum <= options[key] <= maximum:
+                        raise ValueError(f"'{key}' must be between {minimum} and {maximum}")
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        started = time.perf_counter()
+        try:
+            results = multi_search_local(queries, **options)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._send_json(200, {"results": documents_to_json([results])[0], "elapsed_ms": round(elapsed_ms, 2)})
+
+    def log_message(self, format, *args):
+        print(f"   {self.address_string()} - {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the AutoDoc-RAG retrieval service",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/retrieval_service.py
+    python src/retrieval_service.py --port 9000   # then export AUTODOC_RETRIEVAL_URL=http://127.0.0.1:9000
+        """
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    args = parser.parse_args()
+    init_tracing("retrieval_service")
+
+    # Warm up: open the collection and run one embedding round-trip
+    print("🔥 Warming up VectorDB and embedding client...")
+    count = get_vector_store()._collection.count()
+    if count:
+        search_local(["warm up"], k=1)
+    lexical_count = len(get_lexical_index())
+    print(f"   Collection ready ({count} chunks, {lexical_count} in BM25 index).")
+
+    server = ThreadingHTTPServer((args.host, args.port), RetrievalHandler)
+    print(f"✅ Retrieval service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
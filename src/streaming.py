@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Streaming LLM Output for AutoDoc-RAG.
+Streams a chat model response token by token to a sink (a Markdown file or
+the terminal) instead of blocking until the whole answer is done, and records
+latency metrics for every request:
+  - ttft_s: time to first token,
+  - latency_s: total request time,
+  - tokens_per_sec: output tokens per second after the first token.
+
+File output is written to '<output>.partial' and flushed to disk every
+CHECKPOINT_INTERVAL seconds; the file is renamed to its final name only when
+the response is complete, so a crash keeps everything generated so far.
+Every request is appended to METRICS_PATH (JSON lines).
+
+Usage:
+    messages = prompt.invoke(inputs).to_messages()
+    with CheckpointFile("output/rag/sessions.md") as sink:
+        text, metrics = stream_generation(llm, messages, "sessions.py", sink.write)
+        sink.commit()
+    print(metrics.stats_line())
+"""
+import json
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from llm_cache import lookup_messages, store_messages
+
+# Configuration
+METRICS_PATH = "output/stream_metrics.jsonl"
+CHECKPOINT_INTERVAL = 2.0
+
+
+class StreamMetrics:
+    """Timing and token counters of one streamed request."""
+
+    def __init__(self, label: str, model: str = ""):
+        self.label = label
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.output_tokens = 0
+        self.cached = False
+        self.status = "running"
+
+    def token(self, text: str):
+        if self.first_token_at is None and text:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, output_tokens: int, status: str = "done"):
+        self.finished_at = time.perf_counter()
+        self.output_tokens = output_tokens
+        self.status = status
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def latency(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started
+
+    @property
+    def tokens_per_sec(self) -> float:
+        if self.cached or self.first_token_at is None or self.finished_at is None:
+            return 0.0
+        decode_seconds = self.finished_at - self.first_token_at
+        return self.output_tokens / decode_seconds if decode_seconds > 0 else 0.0
+
+    def record(self) -> dict:
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "label": self.label,
+            "model": self.model,
+            "status": self.status,
+            "cached": self.cached,
+            "ttft_s": None if self.ttft is None else round(self.ttft, 3),
+            "latency_s": round(self.latency, 3),
+            "output_tokens": self.output_tokens,
+            "tokens_per_sec": round(self.tokens_per_sec, 2),
+        }
+
+    def stats_line(self) -> str:
+        """One-line summary of the request timings."""
+        ttft = "n/a" if self.ttft is None else f"{self.ttft:.2f}s"
+        if self.cached:
+            return f"TTFT {ttft}, total {self.latency:.2f}s, {self.output_tokens} tokens (LLM cache)"
+        return (f"TTFT {ttft}, total {self.latency:.2f}s, {self.output_tokens} tokens, "
+                f"{self.tokens_per_sec:.2f} tokens/sec")
+
+
+def append_metrics(metrics: StreamMetrics, path: str = METRICS_PATH):
+    """Append one request record to the metrics log."""
+    metrics_dir = os.path.dirname(path)
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(metrics.record(), ensure_ascii=False) + "\n")
+
+
+class CheckpointFile:
+    """
+    Streaming file sink: tokens go to '<path>.partial', which is flushed and
+    fsynced every `interval` seconds and renamed to `path` by commit().
+    Leaving the context without commit() keeps the partial file.
+    """
+
+    def __init__(self, path: str, interval: float = CHECKPOINT_INTERVAL):
+        self.path = path
+        self.partial_path = f"{path}.partial"
+        self.interval = interval
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._file = open(self.partial_path, "w", encoding="utf-8")
+        self._last_checkpoint = time.monotonic()
+        self.committed = False
+
+    def write(self, text: str):
+        self._file.write(text)
+        if time.monotonic() - self._last_checkpoint >= self.interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_checkpoint = time.monotonic()
+
+    def commit(self):
+        self.checkpoint()
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        self.committed = True
+
+    def close(self):
+        if not self._file.closed:
+            self.checkpoint()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def terminal_sink(text: str):
+    print(text, end="", flush=True)
+
+
+def count_stream_tokens(message: Optional[AIMessage], chunks: int) -> int:
+    """Output tokens reported by the model, or the number of streamed chunks."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("output_tokens") or chunks
+
+
+def _start(llm, messages: List[BaseMessage], label: str,
+           on_token: Callable[[str], None]) -> Tuple[StreamMetrics, Optional[str]]:
+    """Common request start: metrics object, plus the full text on a cache hit."""
+    metrics = StreamMetrics(label, getattr(llm, "model", ""))
+    cached = lookup_messages(llm, messages)
+    if cached is None:
+        return metrics, None
+    text = str(cached.content)
+    metrics.cached = True
+    metrics.token(text)
+    on_token(text)
+    metrics.finish(count_stream_tokens(cached, len(text.split())))
+    return metrics, text
+
+
+def _complete(llm, messages: List[BaseMessage], metrics: StreamMetrics,
+              full, parts: List[str], chunks: int, metrics_path: Optional[str]) -> str:
+    text = "".join(parts)
+    metrics.finish(count_stream_tokens(full, chunks))
+    if full is not None:
+        store_messages(llm, messages, AIMessage(
+            content=text,
+            usage_metadata=getattr(full, "usage_metadata", None),
+            response_metadata=full.response_metadata,
+        ))
+    if metrics_path:
+        append_metrics(metrics, metrics_path)
+    return text
+
+
+def stream_generation(llm, messages: List[BaseMessage], label: str,
+                      on_token: Callable[[str], None] = terminal_sink,
+                      metrics_path: Optional[str] = METRICS_PATH) -> Tuple[str, StreamMetrics]:
+    """
+    Stream one chat request.
+
+    Args:
+        llm: Chat model (its disk cache, if attached, is read and written).
+        messages: Rendered prompt messages.
+        label: Name of the request in the metrics log (file name, question, ...).
+        on_token: Called with every piece of text as it arrives.
+        metrics_path: JSON-lines metrics log, None to skip logging.
+
+    Returns:
+        The full response text and the request metrics.
+    """
+    metrics, text = _start(llm, messages, label, on_token)
+    if text is not None:
+        if metrics_path:
+            append_metrics(metrics, metrics_path)
+        return text, metrics
+
+    full, parts, chunks = None, [], 0
+    try:
+        for chunk in llm.stream(messages):
+            piece = str(chunk.content)
+            full = chunk if full is None else full + chunk
+            chunks += 1
+            if piece:
+                metrics.token(piece)
+                parts.append(piece)
+                on_token(piece)
+    except BaseException:
+        metrics.finish(count_stream_tokens(full, chunks), status="failed")
+        if metrics_path:
+            append_metrics(metrics, metrics_path)
+        raise
+    return _complete(llm, messages, metrics, full, parts, chunks, metrics_path), metrics
+
+
+async def astream_generation(llm, messages: List[BaseMessage], label: str,
+                             on_token: Callable[[str], None] = terminal_sink,
+                             metrics_path: Optional[str] = METRICS_PATH) -> Tuple[str, StreamMetrics]:
+    """Async version of stream_generation()."""
+    metrics, text = _start(llm, messages, label, on_token)
+    if text is not None:
+        if metrics_path:
+            append_metrics(metrics, metrics_path)
+        return text, metrics
+
+    full, parts, chunks = None, [], 0
+    try:
+        async for chunk in llm.astream(messages):
+            piece = str(chunk.content)
+            full = chunk if full is None else full + chunk
+            chunks += 1
+            if piece:
+                metrics.token(piece)
+                parts.append(piece)
+                on_token(piece)
+    except BaseException:
+        metrics.finish(count_stream_tokens(full, chunks), status="failed")
+        if metrics_path:
+            append_metrics(metrics, metrics_path)
+        raise
+    return _complete(llm, messages, metrics, full, parts, chunks, metrics_path), metrics
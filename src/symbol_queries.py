@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Symbol-aware Query Builder for AutoDoc-RAG.
+Instead of embedding only the first 2000 characters of a file, extract its
+public symbols (functions, classes, structs, traits, ...) and section headings
+and turn each into a short retrieval query. Together the queries cover the
+whole file, and retrieval.multi_search() answers them with one batched
+embedding call.
+"""
+import os
+import re
+from typing import List, Tuple
+
+# Configuration
+MAX_QUERIES = 32
+QUERY_CONTEXT_LINES = 3
+HEADER_QUERY_CHARS = 500
+
+# (pattern, group) per language; group 1 is always the symbol name.
+SYMBOL_PATTERNS = {
+    "python": [
+        re.compile(r"^(?:async\s+)?def\s+([A-Za-z]\w*)\s*\(", re.MULTILINE),
+        re.compile(r"^class\s+([A-Za-z]\w*)", re.MULTILINE),
+        re.compile(r"^    (?:async\s+)?def\s+([A-Za-z]\w*)\s*\(", re.MULTILINE),
+    ],
+    "rust": [
+        re.compile(r"^\s*pub(?:\([^)]*\))?\s+(?:async\s+|const\s+|unsafe\s+)*"
+                   r"(?:fn|struct|enum|trait|type|mod|const|static)\s+([A-Za-z_]\w*)", re.MULTILINE),
+        re.compile(r"^\s*impl(?:<[^>]*>)?\s+(?:[\w:<>, ]+\s+for\s+)?([A-Za-z_]\w*)", re.MULTILINE),
+    ],
+    "go": [
+        re.compile(r"^func\s+(?:\([^)]*\)\s*)?([A-Z]\w*)\s*\(", re.MULTILINE),
+        re.compile(r"^type\s+([A-Z]\w*)\s+", re.MULTILINE),
+    ],
+    "c": [
+        re.compile(r"^(?:class|struct|enum|union|namespace)\s+([A-Za-z_]\w*)\s*[:{]?", re.MULTILINE),
+        re.compile(r"^(?!static\b)[A-Za-z_][\w\s\*&:<>,]*?\b([A-Za-z_][\w:~]*)\s*\([^;{]*\)\s*(?:const\s*)?\{?\s*$",
+                   re.MULTILINE),
+        re.compile(r"^#define\s+([A-Z_][A-Z0-9_]+)", re.MULTILINE),
+    ],
+    "markdown": [
+        re.compile(r"^#{1,4}\s+(.+?)\s*#*\s*$", re.MULTILINE),
+    ],
+}
+
+EXTENSION_LANGUAGES = {
+    ".py": "python",
+    ".rs": "rust",
+    ".go": "go",
+    ".c": "c", ".h": "c", ".cc": "c", ".cpp": "c", ".hpp": "c", ".cxx": "c",
+    ".md": "markdown",
+}
+
+C_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof", "else"}
+
+
+def detect_language(file_name: str) -> str:
+    """Language key for SYMBOL_PATTERNS, or '' if unknown."""
+    return EXTENSION_LANGUAGES.get(os.path.splitext(file_name)[1].lower(), "")
+
+
+def extract_symbols(file_content: str, file_name: str) -> List[Tuple[str, int]]:
+    """
+    Find the public symbols and section headings of a file.
+
+    Returns:
+        (symbol name, character offset of its definition) pairs in file order,
+        deduplicated by name.
+    """
+    language = detect_language(file_name)
+    found = {}
+    for pattern in SYMBOL_PATTERNS.get(language, []):
+        for match in pattern.finditer(file_content):
+            name = match.group(1).strip()
+            if name in C_KEYWORDS or name.startswith("_"):
+                continue
+            if name not in found:
+                found[name] = match.start()
+    return sorted(found.items(), key=lambda item: item[1])
+
+
+def definition_snippet(file_content: str, offset: int, lines: int = QUERY_CONTEXT_LINES) -> str:
+    """The first `lines` lines starting at `offset`, without copying the rest of the file."""
+    end = offset
+    for _ in range(lines):
+        end = file_content.find("\n", end) + 1
+        if end == 0:
+            end = len(file_content)
+            break
+    return "\n".join(file_content[offset:end].splitlines()[:lines])
+
+
+def build_queries(file_content: str, file_name: str, max_queries: int = MAX_QUERIES) -> List[str]:
+    """
+    Build short retrieval queries covering the whole file.
+
+    The first query describes the file header; each further query is a symbol
+    name plus the first lines of its definition. When a file has more symbols
+    than max_queries, they are sampled evenly across the file.
+    """
+    queries = [f"API documentation context for: {file_name}\n{file_content[:HEADER_QUERY_CHARS]}"]
+
+    symbols = extract_symbols(file_content, file_name)
+    slots = max_queries - 1
+    if len(symbols) > slots > 0:
+        step = len(symbols) / slots
+        symbols = [symbols[int(i * step)] for i in range(slots)]
+
+    for name, offset in symbols[:slots]:
+        queries.append(f"{name} ({file_name})\n{definition_snippet(file_content, offset)}")
+    return queries
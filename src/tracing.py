@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Per-stage Tracing for AutoDoc-RAG.
+OpenTelemetry spans around the ingest (load, split, embed, write), retrieve,
+generate (LLM calls) and judge / BLEU stages, exported to a local JSON-lines
+file so a run's time can be broken down without attaching a profiler.
+
+Instrumented code uses the module-level `tracer`; until init_tracing() is
+called by a script's main() it is a no-op, so library imports stay free.
+Set AUTODOC_TRACING=0 to disable tracing, AUTODOC_TRACE_FILE to change the
+output file, and OTEL_EXPORTER_OTLP_ENDPOINT to also send spans to an OTLP
+collector. Once the file exceeds AUTODOC_TRACE_MAX_MB (default 50) it is
+rotated to <file>.1, replacing the previous rotation, so at most two files'
+worth of spans are kept.
+
+Usage:
+    init_tracing("generate_docs")
+    with tracer.start_as_current_span("generate.file", attributes={"file": path}):
+        ...
+
+    python src/tracing.py                       # p50/p95 latency per stage, all runs
+    python src/tracing.py --last                # only the most recent run
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import BaseCallbackHandler
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import Status, StatusCode
+
+# Configuration
+TRACE_PATH = os.environ.get("AUTODOC_TRACE_FILE", "output/traces/spans.jsonl")
+TRACING_ENABLED = os.environ.get("AUTODOC_TRACING", "1") != "0"
+TRACE_MAX_BYTES = int(float(os.environ.get("AUTODOC_TRACE_MAX_MB", "50")) * 1024 * 1024)
+
+tracer = trace.get_tracer("autodoc_rag")
+_provider: Optional[TracerProvider] = None
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends finished spans to a JSON-lines file, one span per line, rotated by size."""
+
+    def __init__(self, path: str = TRACE_PATH, max_bytes: int = TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        trace_dir = os.path.dirname(path)
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+
+    @staticmethod
+    def span_to_dict(span: ReadableSpan) -> dict:
+        context = span.get_span_context()
+        resource = span.resource.attributes if span.resource else {}
+        return {
+            "name": span.name,
+            "service": resource.get("service.name"),
+            "run": resource.get("service.instance.id"),
+            "trace_id": format(context.trace_id, "032x"),
+            "span_id": format(context.span_id, "016x"),
+            "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+            "start_ns": span.start_time,
+            "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+            "status": span.status.status_code.name,
+            "attributes": dict(span.attributes or {}),
+        }
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(self.span_to_dict(span), default=str) + "\n" for span in spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                size = f.tell()
+            if self.max_bytes > 0 and size >= self.max_bytes:
+                try:
+                    os.replace(self.path, f"{self.path}.1")
+                except OSError:
+                    pass  # another process rotated it first
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def init_tracing(service_name: str, trace_path: str = TRACE_PATH) -> Optional[TracerProvider]:
+    """
+    Install the tracer provider for this process (once).
+
+    Args:
+        service_name: Script name recorded with every span.
+        trace_path: JSON-lines file spans are appended to.
+
+    Returns:
+        The provider, or None when tracing is disabled.
+    """
+    global _provider
+    if not TRACING_ENABLED:
+        return None
+    if _provider is not None:
+        return _provider
+    resource = Resource.create({"service.name": service_name, "service.instance.id": uuid.uuid4().hex[:12]})
+    provider = TracerProvider(resource=resource)
+    provider.add_span_processor(BatchSpanProcessor(JsonlSpanExporter(trace_path)))
+    if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        except ImportError:
+            print("⚠️ OTEL_EXPORTER_OTLP_ENDPOINT is set but the OTLP exporter is not installed.")
+    trace.set_tracer_provider(provider)
+    atexit.register(provider.shutdown)
+    _provider = provider
+    return provider
+
+
+def record_span(name: str, seconds: float, attributes: Optional[dict] = None):
+    """Record a span that ended now and took `seconds` (e.g. work done in a worker process)."""
+    end_ns = time.time_ns()
+    span = tracer.start_span(name, start_time=end_ns - int(seconds * 1e9), attributes=attributes)
+    span.end(end_time=end_ns)
+
+
+class LLMSpanHandler(BaseCallbackHandler):
+    """LangChain callback handler wrapping every chat model call in an 'llm.call' span."""
+
+    run_inline = True  # keep the caller's span as parent in async chains
+
+    def __init__(self):
+        self._spans: Dict = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        params = kwargs.get("invocation_params") or {}
+        self._spans[run_id] = tracer.start_span("llm.call", attributes={
+            "llm.model": str(params.get("model") or (serialized or {}).get("name", "")),
+            "llm.prompt_chars": prompt_chars,
+        })
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        span.set_attribute("llm.prompt_tokens", prompt_tokens)
+        span.set_attribute("llm.completion_tokens", completion_tokens)
+        span.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
+
+
+def instrument_llm(llm):
+    """Attach an LLMSpanHandler to a LangChain chat model."""
+    llm.callbacks = list(llm.callbacks or []) + [LLMSpanHandler()]
+    return llm
+
+
+def load_spans(path: str = TRACE_PATH, last_run: bool = False) -> List[dict]:
+    """Read exported spans (rotated file first), optionally only those of the most recent run."""
+    spans = []
+    for file_path in (f"{path}.1", path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    spans.append(json.loads(line))
+    if last_run and spans:
+        latest = max(spans, key=lambda span: span["start_ns"])
+        spans = [span for span in spans if span.get("run") == latest.get("run")]
+    return spans
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize_spans(spans: List[dict]) -> List[dict]:
+    """Per span name: count, total, p50, p95 and max duration (ms), slowest total first."""
+    durations: Dict[str, List[float]] = {}
+    for span in spans:
+        durations.setdefault(span["name"], []).append(span["duration_ms"])
+    rows = [
+        {
+            "stage": name,
+            "count": len(values),
+            "total_ms": sum(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "max_ms": max(values),
+        }
+        for name, values in durations.items()
+    ]
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize exported spans: latency per stage")
+    parser.add_argument("trace_file", nargs="?", default=TRACE_PATH, help=f"Span file (default: {TRACE_PATH})")
+    parser.add_argument("--last", action="store_true", help="Only summarize the most recent run")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.trace_file) and not os.path.exists(f"{args.trace_file}.1"):
+        print(f"❌ Trace file not found: {args.trace_file}")
+        return
+    spans = load_spans(args.trace_file, args.last)
+    runs = sorted({span.get("run") for span in spans if span.get("run")})
+    services = sorted({span.get("service") for span in spans if span.get("service")})
+    print(f"📊 {len(spans)} spans from {len(runs)} run(s) ({', '.join(services)})")
+    print(f"\n{'Stage':<24} {'Count':>7} {'Total s':>9} {'p50 ms':>10} {'p95 ms':>10} {'Max ms':>10}")
+    print("-" * 74)
+    for row in summarize_spans(spans):
+        print(f"{row['stage']:<24} {row['count']:>7} {row['total_ms'] / 1000:>9.2f} "
+              f"{row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} {row['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
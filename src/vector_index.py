@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Compact Vector Index for AutoDoc-RAG.
+A read-only export of the Chroma collection for fast cold starts: vectors are
+stored quantized (int8 with a per-vector scale, or float16) in a NumPy file
+that is memory-mapped on open, so nothing is loaded until a query touches it
+and no HNSW graph is kept in RAM. Searches are exact: one vectorized
+matrix product over the mapped vectors (in blocks, never materializing a
+float32 copy) followed by argpartition top-k.
+
+Files in data/vector_index/:
+    meta.json          count, dimension, dtype, distance space, metadata column values
+    vectors.npy        [count, dim] int8 or float16
+    scales.npy         [count] float32 per-vector scale (int8 only)
+    norms.npy          [count] float32 squared norm of every (dequantized) vector
+    ids.bin/.npy       UTF-8 chunk IDs and their offsets
+    texts.bin/.npy     UTF-8 chunk texts and their offsets (read only for hits)
+    column_<i>.npy     int32 codes of metadata column i (dictionary-encoded, -1 = missing)
+
+retrieval.py searches this index instead of Chroma when AUTODOC_VECTOR_STORE=mmap.
+It is an export: re-run --export after ingesting.
+
+Usage:
+    python src/vector_index.py --export                 # int8 (default) or --dtype float16
+    python src/vector_index.py --benchmark              # startup, RSS and latency vs Chroma
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval_cache import bump_version
+
+# Configuration
+INDEX_DIR = "data/vector_index"
+DB_DIR = "data/vector_db"
+COLLECTION_NAME = "autodoc_rag"
+INDEX_DTYPES = ["int8", "float16"]
+DEFAULT_DTYPE = "int8"
+EXPORT_BATCH_SIZE = 1000
+SEARCH_BLOCK_ROWS = 32768
+BENCHMARK_QUERIES = 200
+BENCHMARK_K = 5
+INDEX_FORMAT = 1
+
+
+def collection_space(collection) -> str:
+    """Distance function of a Chroma collection ('l2', 'cosine' or 'ip')."""
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw = configuration.get("hnsw") or {}
+    return hnsw.get("space") or (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Quantized vectors and, for int8, the per-vector scale (symmetric, max-abs)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = codes.astype(np.float32)
+    return vectors * scales[:, None] if scales is not None else vectors
+
+
+def _write_strings(path: str, values: List[str]):
+    """UTF-8 blob (<path>.bin) plus int64 offsets (<path>.npy)."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    with open(f"{path}.bin", "wb") as f:
+        for value in encoded:
+            f.write(value)
+    np.save(f"{path}.npy", offsets)
+
+
+class _Strings:
+    """Memory-mapped string column written by _write_strings."""
+
+    def __init__(self, path: str):
+        self.offsets = np.load(f"{path}.npy", mmap_mode="r")
+        size = int(self.offsets[-1]) if len(self.offsets) else 0
+        self.blob = np.memmap(f"{path}.bin", dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+
+    def __getitem__(self, row: int) -> str:
+        return self.blob[int(self.offsets[row]):int(self.offsets[row + 1])].tobytes().decode("utf-8")
+
+
+def export_collection(index_dir: str = INDEX_DIR, dtype: str = DEFAULT_DTYPE,
+                      batch_size: int = EXPORT_BATCH_SIZE) -> dict:
+    """
+    Export every chunk of the Chroma collection into a compact index.
+    The index is written next to the target and swapped in when complete.
+
+    Returns:
+        The index metadata (meta.json).
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(persist_directory=DB_DIR, collection_name=COLLECTION_NAME)._collection
+    count = collection.count()
+    tmp_dir = f"{index_dir.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ids: List[str] = []
+    texts: List[str] = []
+    metadatas: List[dict] = []
+    vectors = scales = norms = None
+    row = 0
+    while row < count:
+        page = collection.get(limit=batch_size, offset=row, include=["embeddings", "documents", "metadatas"])
+        if not len(page["ids"]):
+            break
+        embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+",
+                                                dtype=np.dtype(dtype), shape=(count, embeddings.shape[1]))
+            scales = np.ones(count, dtype=np.float32)
+            norms = np.zeros(count, dtype=np.float32)
+        codes, page_scales = quantize(embeddings, dtype)
+        end = row + len(codes)
+        vectors[row:end] = codes
+        if page_scales is not None:
+            scales[row:end] = page_scales
+        norms[row:end] = np.square(dequantize(codes, page_scales)).sum(axis=1)
+        ids.extend(page["ids"])
+        texts.extend(text or "" for text in page["documents"])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+        row = end
+
+    if vectors is None:
+        vectors = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+",
+                                            dtype=np.dtype(dtype), shape=(0, 0))
+        scales = norms = np.zeros(0, dtype=np.float32)
+    vectors.flush()
+    del vectors
+    if dtype == "int8":
+        np.save(os.path.join(tmp_dir, "scales.npy"), scales[:row])
+    np.save(os.path.join(tmp_dir, "norms.npy"), norms[:row])
+    _write_strings(os.path.join(tmp_dir, "ids"), ids)
+    _write_strings(os.path.join(tmp_dir, "texts"), texts)
+
+    # Metadata: one dictionary-encoded column per key
+    keys = sorted({key for metadata in metadatas for key in metadata})
+    columns = []
+    for number, key in enumerate(keys):
+        values: List = []
+        positions: Dict[str, int] = {}
+        codes = np.full(len(metadatas), -1, dtype=np.int32)
+        for position, metadata in enumerate(metadatas):
+            if key not in metadata:
+                continue
+            value = metadata[key]
+            token = json.dumps(value)
+            if token not in positions:
+                positions[token] = len(values)
+                values.append(value)
+            codes[position] = positions[token]
+        np.save(os.path.join(tmp_dir, f"column_{number}.npy"), codes)
+        columns.append({"key": key, "values": values})
+
+    meta = {
+        "format": INDEX_FORMAT,
+        "count": row,
+        "dim": int(np.load(os.path.join(tmp_dir, "vectors.npy"), mmap_mode="r").shape[1]) if row else 0,
+        "dtype": dtype,
+        "space": collection_space(collection),
+        "columns": columns,
+        "source": DB_DIR,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Swap the finished index in
+    old_dir = f"{index_dir.rstrip(os.sep)}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    bump_version()
+    return meta
+
+
+class VectorIndex:
+    """Read-only, memory-mapped view of an exported index."""
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported vector index format in {index_dir}; re-export it")
+        self.space = self.meta["space"]
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(index_dir, "scales.npy")
+        self.scales = np.load(scales_path, mmap_mode="r") if self.meta["dtype"] == "int8" else None
+        self.norms = np.load(os.path.join(index_dir, "norms.npy"), mmap_mode="r")
+        self.ids = _Strings(os.path.join(index_dir, "ids"))
+        self.texts = _Strings(os.path.join(index_dir, "texts"))
+        self.columns = [
+            (column["key"], column["values"], np.load(os.path.join(index_dir, f"column_{i}.npy"), mmap_mode="r"))
+            for i, column in enumerate(self.meta["columns"])
+        ]
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def dot(self, query_vectors: np.ndarray) -> np.ndarray:
+        """[count, queries] dot products of the stored vectors with the queries."""
+        queries_t = np.ascontiguousarray(query_vectors.T, dtype=np.float32)
+        products = np.empty((len(self), queries_t.shape[1]), dtype=np.float32)
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            block_products = block.astype(np.float32) @ queries_t
+            if self.scales is not None:
+                block_products *= self.scales[start:start + SEARCH_BLOCK_ROWS, None]
+            products[start:start + len(block)] = block_products
+        return products
+
+    def distances(self, query_vectors: np.ndarray) -> np.ndarray:
+        """[count, queries] distances in the collection's space (smaller is closer, as in Chroma)."""
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        products = self.dot(query_vectors)
+        query_norms = np.square(query_vectors).sum(axis=1)
+        if self.space == "cosine":
+            denominator = np.sqrt(np.outer(self.norms, query_norms)) + 1e-12
+            return 1.0 - products / denominator
+        if self.space == "ip":
+            return 1.0 - products
+        return np.maximum(self.norms[:, None] + query_norms[None, :] - 2.0 * products, 0.0)
+
+    def search(self, query_vectors: np.ndarray, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Exact top-k (row, distance) per query, closest first."""
+        if not len(self):
+            return [[] for _ in np.atleast_2d(query_vectors)]
+        distances = self.distances(query_vectors)
+        k = min(k, len(self))
+        results = []
+        for column in distances.T:
+            top = np.argpartition(column, k - 1)[:k] if k < len(column) else np.arange(len(column))
+            top = top[np.argsort(column[top], kind="stable")]
+            results.append([(int(row), float(column[row])) for row in top])
+        return results
+
+    def metadata(self, row: int) -> dict:
+        return {key: values[codes[row]] for key, values, codes in self.columns if codes[row] >= 0}
+
+    def embedding(self, row: int) -> np.ndarray:
+        scale = self.scales[row] if self.scales is not None else 1.0
+        return self.vectors[row].astype(np.float32) * scale
+
+    def document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=self.metadata(row))
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 5,
+              include: Tuple[str, ...] = ("documents", "metadatas", "distances")) -> dict:
+        """Search with the result layout of chromadb Collection.query()."""
+        response = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        for hits in self.search(np.asarray(query_embeddings, dtype=np.float32), n_results):
+            rows = [row for row, _ in hits]
+            response["ids"].append([self.ids[row] for row in rows])
+            response["documents"].append([self.texts[row] for row in rows])
+            response["metadatas"].append([self.metadata(row) for row in rows])
+            response["distances"].append([distance for _, distance in hits])
+            if "embeddings" in include:
+                response["embeddings"].append([self.embedding(row) for row in rows])
+        return response
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_worker(store: str, index_dir: str, queries_path: str, k: int) -> dict:
+    """Measured in a fresh process: open time, RSS and per-query latency of one store."""
+    started = time.perf_counter()
+    rss_start = current_rss_mb()
+    queries = np.load(queries_path)
+    if store == "chroma":
+        from langchain_chroma import Chroma
+        collection = Chroma(persist_directory=DB_DIR, collection_name=COLLECTION_NAME)._collection
+
+        def run(query):
+            return collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])["ids"][0]
+    else:
+        index = VectorIndex(index_dir)
+
+        def run(query):
+            return [index.ids[row] for row, _ in index.search(query, k)[0]]
+    open_seconds = time.perf_counter() - started
+    rss_open = current_rss_mb()
+
+    latencies, results = [], []
+    for query in queries:
+        query_started = time.perf_counter()
+        results.append(run(query))
+        latencies.append((time.perf_counter() - query_started) * 1000)
+    ordered = sorted(latencies)
+    return {
+        "open_s": round(open_seconds, 4),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_open_mb": round(rss_open, 1),
+        "rss_after_queries_mb": round(current_rss_mb(), 1),
+        "first_query_ms": round(latencies[0], 3) if latencies else 0.0,
+        "p50_ms": round(ordered[len(ordered) // 2], 3) if ordered else 0.0,
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3) if ordered else 0.0,
+        "results": results,
+    }
+
+
+def run_benchmark(index_dir: str = INDEX_DIR, queries: int = BENCHMARK_QUERIES, k: int = BENCHMARK_K) -> dict:
+    """
+    Compare Chroma with the exported index, each store in a fresh process.
+    Queries are stored vectors of the index (plus a little noise), so no
+    embedding model is needed; recall@k is measured against Chroma's results.
+    """
+    index = VectorIndex(index_dir)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(index), size=min(queries, len(index)), replace=False)
+    query_vectors = np.stack([index.embedding(int(row)) for row in rows])
+    query_vectors += rng.normal(0, 0.01 * float(np.abs(query_vectors).mean()), query_vectors.shape)
+    queries_path = os.path.join(index_dir, "benchmark_queries.npy")
+    np.save(queries_path, query_vectors.astype(np.float32))
+
+    report = {"chunks": len(index), "dim": index.meta["dim"], "dtype": index.meta["dtype"],
+              "queries": len(rows), "k": k, "index_mb": round(sum(
+                  os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)) / 2**20, 2)}
+    try:
+        for store in ["chroma", "mmap"]:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--bench-worker", store,
+                 "--index-dir", index_dir, "--queries-file", queries_path, "-k", str(k)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            report[store] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        os.remove(queries_path)
+    chroma_results, mmap_results = report["chroma"].pop("results"), report["mmap"].pop("results")
+    matches = sum(len(set(a) & set(b)) for a, b in zip(chroma_results, mmap_results))
+    report["mmap"]["recall_vs_chroma"] = round(matches / max(1, sum(len(a) for a in chroma_results)), 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the Chroma collection into a compact memory-mapped index, or benchmark it",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/vector_index.py --export
+    python src/vector_index.py --export --dtype float16
+    python src/vector_index.py --benchmark --queries 500
+    AUTODOC_VECTOR_STORE=mmap python src/generate_docs.py target_file.py --mode rag
+        """
+    )
+    parser.add_argument("--export", action="store_true", help=f"Export {DB_DIR} into the index")
+    parser.add_argument("--dtype", choices=INDEX_DTYPES, default=DEFAULT_DTYPE,
+                        help=f"Stored vector type (default: {DEFAULT_DTYPE})")
+    parser.add_argument("--index-dir", default=INDEX_DIR, help=f"Index directory (default: {INDEX_DIR})")
+    parser.add_argument("--benchmark", action="store_true", help="Compare startup, RSS and query latency with Chroma")
+    parser.add_argument("--queries", type=int, default=BENCHMARK_QUERIES,
+                        help=f"Benchmark queries (default: {BENCHMARK_QUERIES})")
+    parser.add_argument("-k", type=int, default=BENCHMARK_K, help=f"Results per query (default: {BENCHMARK_K})")
+    parser.add_argument("--output", "-o", help="Write the benchmark report to this JSON file")
+    parser.add_argument("--bench-worker", choices=["chroma", "mmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench_worker:
+        print(json.dumps(bench_worker(args.bench_worker, args.index_dir, args.queries_file, args.k)))
+        return
+
+    if args.export:
+        print(f"📦 Exporting '{DB_DIR}' to {args.index_dir} ({args.dtype})...")
+        started = time.perf_counter()
+        meta = export_collection(args.index_dir, args.dtype)
+        size = sum(os.path.getsize(os.path.join(args.index_dir, name)) for name in os.listdir(args.index_dir))
+        print(f"✅ {meta['count']} chunks x {meta['dim']} dims, {size / 2**20:.1f} MB "
+              f"({meta['space']} distance) in {time.perf_counter() - started:.1f}s")
+
+    if args.benchmark:
+        if not os.path.exists(os.path.join(args.index_dir, "meta.json")):
+            print(f"❌ No index in {args.index_dir}; run --export first")
+            return
+        report = run_benchmark(args.index_dir, args.queries, args.k)
+        print(f"\n📊 {report['chunks']} chunks x {report['dim']} dims, {report['queries']} queries, k={report['k']} "
+              f"(index: {report['dtype']}, {report['index_mb']} MB)")
+        print(f"\n{'Store':<8} {'Open s':>8} {'RSS open':>9} {'RSS end':>8} {'1st ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        print("-" * 64)
+        for store in ["chroma", "mmap"]:
+            entry = report[store]
+            print(f"{store:<8} {entry['open_s']:>8.3f} {entry['rss_open_mb']:>8.1f}M {entry['rss_after_queries_mb']:>7.1f}M "
+                  f"{entry['first_query_ms']:>8.2f} {entry['p50_ms']:>8.3f} {entry['p99_ms']:>8.3f}")
+        print(f"\nRecall@{report['k']} of mmap vs Chroma: {report['mmap']['recall_vs_chroma']:.3f}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Report saved to: {args.output}")
+
+    if not args.export and not args.benchmark:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,261 @@
 """
 Verification Script for AutoDoc-RAG VectorDB.
 Checks if documents from specific sources have been successfully ingested.
+
+--full-scan walks the whole collection instead of a 100-chunk sample and
+writes a JSON health report: chunks per source (checked against the ingestion
+manifest), exact duplicate chunks, empty and tiny chunks, the embedding
+dimension distribution and the retrieval latency of the test queries. Chunks
+are fetched by ID in fixed-size batches, so every batch costs the same and the
+scan time grows linearly with the collection; per chunk only its ID and a
+16-byte content hash are kept.
+
+Usage:
+    python src/verify_ingestion.py                       # quick check (sample)
+    python src/verify_ingestion.py --full-scan --output output/ingestion_health.json
 """
 import argparse
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from ingest_manifest import load_manifest
+from retrieval import COLLECTION_NAME, DB_DIR, get_vector_store, search
+from tracing import init_tracing, percentile, tracer
+
+# Test retrieval queries (also used by benchmark.py for retrieval latency)
+TEST_QUERIES = [
+    "What is arc42?",
+    "How to use mermaid.js?",
+    "D-Bus message bus system",
+    "Protobuf style guide",
+    "Systemd service unit"
+]
+
+# Full-scan settings
+SCAN_BATCH_SIZE = 1000
+TINY_CHUNK_CHARS = 50
+REPORT_PATH = "output/ingestion_health.json"
+MAX_EXAMPLES = 20
+LATENCY_ROUNDS = 3
+
+
+def iter_collection(collection, batch_size: int = SCAN_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Yield the collection in pages of at most `batch_size` chunks
+    (ids, documents, metadatas, embeddings). IDs are listed once up front and
+    each page is fetched by ID, which stays constant-cost where deep
+    limit/offset pages slow down.
+    """
+    ids = collection.get(include=[])["ids"]
+    for start in range(0, len(ids), batch_size):
+        yield collection.get(ids=ids[start:start + batch_size], include=["documents", "metadatas", "embeddings"])
+
+
+def scan_collection(collection, batch_size: int = SCAN_BATCH_SIZE, tiny_chars: int = TINY_CHUNK_CHARS) -> dict:
+    """Single pass over every chunk, collecting the health statistics."""
+    source_counts: Counter = Counter()
+    dimensions: Counter = Counter()
+    first_by_hash: Dict[bytes, str] = {}
+    duplicates: Dict[bytes, List[str]] = {}
+    empty_ids: List[str] = []
+    tiny_ids: List[str] = []
+    lengths = {"min": None, "max": 0, "total": 0}
+    norms = {"min": None, "max": 0.0, "zero": 0, "missing": 0}
+    scanned = 0
+    started = time.perf_counter()
+
+    for page in iter_collection(collection, batch_size):
+        with tracer.start_as_current_span("verify.scan_batch", attributes={"chunks": len(page["ids"])}):
+            for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                text = text or ""
+                source_counts[(metadata or {}).get("source", "<no source>")] += 1
+
+                digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                if digest in first_by_hash:
+                    duplicates.setdefault(digest, [first_by_hash[digest]]).append(chunk_id)
+                else:
+                    first_by_hash[digest] = chunk_id
+
+                stripped = len(text.strip())
+                if stripped == 0:
+                    empty_ids.append(chunk_id)
+                elif stripped < tiny_chars:
+                    tiny_ids.append(chunk_id)
+                lengths["min"] = len(text) if lengths["min"] is None else min(lengths["min"], len(text))
+                lengths["max"] = max(lengths["max"], len(text))
+                lengths["total"] += len(text)
+
+            # Embedding statistics, vectorized per dimension group of the page
+            by_dimension: Dict[int, list] = {}
+            for embedding in (page["embeddings"] if page["embeddings"] is not None else []):
+                if embedding is None or len(embedding) == 0:
+                    norms["missing"] += 1
+                else:
+                    by_dimension.setdefault(len(embedding), []).append(embedding)
+            norms["missing"] += len(page["ids"]) - (len(page["embeddings"]) if page["embeddings"] is not None else 0)
+            for dimension, vectors in by_dimension.items():
+                dimensions[dimension] += len(vectors)
+                page_norms = np.linalg.norm(np.asarray(vectors, dtype=np.float32), axis=1)
+                norms["zero"] += int((page_norms == 0).sum())
+                low, high = float(page_norms.min()), float(page_norms.max())
+                norms["min"] = low if norms["min"] is None else min(norms["min"], low)
+                norms["max"] = max(norms["max"], high)
+            scanned += len(page["ids"])
+        print(f"   ... {scanned} chunks scanned", end="\r", flush=True)
+    seconds = time.perf_counter() - started
+    print()
+
+    duplicate_groups = sorted(duplicates.values(), key=len, reverse=True)
+    return {
+        "scanned": scanned,
+        "scan_seconds": round(seconds, 3),
+        "chunks_per_sec": round(scanned / seconds, 1) if seconds > 0 else 0.0,
+        "sources": dict(source_counts.most_common()),
+        "duplicates": {
+            "groups": len(duplicate_groups),
+            "redundant_chunks": sum(len(group) - 1 for group in duplicate_groups),
+            "examples": duplicate_groups[:MAX_EXAMPLES],
+        },
+        "empty_chunks": {"count": len(empty_ids), "examples": empty_ids[:MAX_EXAMPLES]},
+        "tiny_chunks": {"count": len(tiny_ids), "threshold_chars": tiny_chars, "examples": tiny_ids[:MAX_EXAMPLES]},
+        "chunk_chars": {
+            "min": lengths["min"] or 0,
+            "mean": round(lengths["total"] / scanned, 1) if scanned else 0.0,
+            "max": lengths["max"],
+        },
+        "embeddings": {
+            "dimensions": {str(dim): count for dim, count in dimensions.most_common()},
+            "missing": norms["missing"],
+            "zero_norm": norms["zero"],
+            "norm_min": round(norms["min"] or 0.0, 4),
+            "norm_max": round(norms["max"], 4),
+        },
+    }
+
+
+def compare_with_manifest(source_counts: Dict[str, int], manifest: dict) -> dict:
+    """Sources whose chunk count in the collection differs from the ingestion manifest."""
+    tracked = manifest.get("sources", {})
+    mismatched = {
+        source: {"manifest": len(entry.get("chunk_ids", [])), "collection": source_counts.get(source, 0)}
+        for source, entry in tracked.items()
+        if len(entry.get("chunk_ids", [])) != source_counts.get(source, 0)
+    }
+    return {
+        "tracked_sources": len(tracked),
+        "missing_from_collection": sorted(source for source in tracked if source not in source_counts),
+        "untracked_in_collection": sorted(source for source in source_counts if source not in tracked),
+        "count_mismatches": mismatched,
+    }
+
+
+def measure_retrieval(queries: List[str], k: int = 5, rounds: int = LATENCY_ROUNDS) -> dict:
+    """Latency of single-query retrieval (cache bypassed) and the top source per query."""
+    search(queries[:1], k=k, use_cache=False)  # warm-up
+    latencies, top_sources = [], {}
+    for _ in range(rounds):
+        for query in queries:
+            started = time.perf_counter()
+            results = search([query], k=k, use_cache=False)[0]
+            latencies.append((time.perf_counter() - started) * 1000)
+            top_sources[query] = results[0].metadata.get("source", "Unknown") if results else None
+    return {
+        "queries": len(queries),
+        "k": k,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3) if latencies else 0.0,
+        "top_sources": top_sources,
+    }
+
+
+def write_report(report: dict, path: str):
+    """Write the report atomically."""
+    report_dir = os.path.dirname(path)
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def full_scan(collection, batch_size: int, tiny_chars: int, output: str):
+    """Scan the whole collection, print a summary and write the JSON health report."""
+    count = collection.count()
+    print(f"\n🔬 Full scan of {count} chunks (batches of {batch_size})...")
+    with tracer.start_as_current_span("verify.full_scan", attributes={"chunks": count, "batch_size": batch_size}):
+        scan = scan_collection(collection, batch_size, tiny_chars)
+    manifest = compare_with_manifest(scan["sources"], load_manifest())
+    print("⏳ Measuring retrieval latency of the test queries...")
+    retrieval_stats = measure_retrieval(TEST_QUERIES)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "db_dir": DB_DIR,
+        "collection": COLLECTION_NAME,
+        "count": count,
+        **scan,
+        "manifest": manifest,
+        "retrieval": retrieval_stats,
+    }
+    write_report(report, output)
+
+    print(f"\n📊 {scan['scanned']} chunks from {len(scan['sources'])} sources "
+          f"in {scan['scan_seconds']:.1f}s ({scan['chunks_per_sec']:.0f} chunks/s)")
+    for source, chunks in list(scan["sources"].items())[:10]:
+        print(f"  {chunks:>7}  {source}")
+    if len(scan["sources"]) > 10:
+        print(f"  ... {len(scan['sources']) - 10} more sources")
+    duplicates = scan["duplicates"]
+    print(f"\n{'⚠️ ' if duplicates['groups'] else '✅'} Duplicates: {duplicates['redundant_chunks']} redundant chunks "
+          f"in {duplicates['groups']} groups")
+    print(f"{'⚠️ ' if scan['empty_chunks']['count'] else '✅'} Empty chunks: {scan['empty_chunks']['count']}, "
+          f"tiny (<{tiny_chars} chars): {scan['tiny_chunks']['count']}")
+    embeddings = scan["embeddings"]
+    dims = ", ".join(f"{dim}: {n}" for dim, n in embeddings["dimensions"].items())
+    print(f"{'⚠️ ' if len(embeddings['dimensions']) > 1 or embeddings['missing'] else '✅'} "
+          f"Embedding dimensions: {dims or 'none'} (missing: {embeddings['missing']}, zero norm: {embeddings['zero_norm']})")
+    issues = len(manifest["missing_from_collection"]) + len(manifest["count_mismatches"])
+    print(f"{'⚠️ ' if issues else '✅'} Manifest: {manifest['tracked_sources']} tracked sources, "
+          f"{len(manifest['missing_from_collection'])} missing, {len(manifest['count_mismatches'])} count mismatches, "
+          f"{len(manifest['untracked_in_collection'])} untracked")
+    print(f"🧪 Retrieval: p50 {retrieval_stats['p50_ms']:.1f} ms, p99 {retrieval_stats['p99_ms']:.1f} ms")
+    print(f"\n💾 Health report saved to: {output}")
 
-# Configuration (Must match ingest scripts)
-DB_DIR = "data/vector_db"
-EMBEDDING_MODEL = "nomic-embed-text"
-COLLECTION_NAME = "autodoc_rag"
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Verify what was ingested into the AutoDoc-RAG VectorDB",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python src/verify_ingestion.py
+    python src/verify_ingestion.py --full-scan
+    python src/verify_ingestion.py --full-scan --batch-size 5000 --tiny-chars 80 -o health.json
+        """
+    )
+    parser.add_argument("--full-scan", action="store_true",
+                        help="Scan every chunk and write a JSON health report (instead of sampling 100 chunks)")
+    parser.add_argument("--batch-size", type=int, default=SCAN_BATCH_SIZE,
+                        help=f"Chunks fetched per batch in --full-scan (default: {SCAN_BATCH_SIZE})")
+    parser.add_argument("--tiny-chars", type=int, default=TINY_CHUNK_CHARS,
+                        help=f"Chunks with fewer characters count as tiny (default: {TINY_CHUNK_CHARS})")
+    parser.add_argument("--output", "-o", default=REPORT_PATH, help=f"Health report path (default: {REPORT_PATH})")
+    args = parser.parse_args()
+
+    init_tracing("verify_ingestion")
     print(f"🔍 Connecting to VectorDB at '{DB_DIR}'...")
-    
+
     # 1. Initialize Embeddings & DB
     try:
-        embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-        vector_store = Chroma(
-            persist_directory=DB_DIR,
-            embedding_function=embeddings,
-            collection_name=COLLECTION_NAME
-        )
+        vector_store = get_vector_store()
     except Exception as e:
         print(f"❌ Error loading Vector DB: {e}")
         return
@@ -38,35 +272,31 @@ def main():
         print("⚠️  The database is empty.")
         return
 
+    if args.full_scan:
+        full_scan(collection, max(1, args.batch_size), args.tiny_chars, args.output)
+        return
+
     # 3. Verify Specific Sources by Querying Metadata
     # We'll sample metadata to look for source URLs
     print("\n🧐 Analyzing Sources (Sampling top 100 chunks)...")
-    
+
     # Peek at the first 100 items to see sources
     data = collection.peek(limit=100)
     metadatas = data.get('metadatas', [])
-    
+
     detected_sources = set()
     for meta in metadatas:
         if meta and 'source' in meta:
             detected_sources.add(meta['source'])
-    
+
     print("\n✅ Detected Sources in Sample:")
     for src in sorted(detected_sources):
         print(f"  - {src}")
 
     # 4. Interactive Search Check
     print("\n🧪 Running Test Retrieval...")
-    test_queries = [
-        "What is arc42?",
-        "How to use mermaid.js?",
-        "D-Bus message bus system",
-        "Protobuf style guide",
-        "Systemd service unit"
-    ]
-    
-    for query in test_queries:
-        results = vector_store.similarity_search(query, k=1)
+    # One batched lookup (served by the retrieval service when it is running)
+    for query, results in zip(TEST_QUERIES, search(TEST_QUERIES, k=1)):
         if results:
             top_doc = results[0]
             source = top_doc.metadata.get('source', 'Unknown')
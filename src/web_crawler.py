@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Async Documentation Crawler for AutoDoc-RAG.
+Replaces the serial RecursiveUrlLoader used by ingest_web.py:
+  - one pooled aiohttp session with a global and a per-host connection limit,
+  - optional per-host rate limiting,
+  - a crawl state file (data/crawl_state/) holding the frontier, so an
+    interrupted crawl resumes where it stopped,
+  - stored ETag / Last-Modified validators, so pages that come back as
+    304 Not Modified are skipped before extraction and embedding.
+
+Link following matches RecursiveUrlLoader: only links below the root URL are
+followed, and pages deeper than max_depth - 1 are not fetched.
+
+Dry run against any site (e.g. a local `python -m http.server` fixture):
+    python src/web_crawler.py http://127.0.0.1:8000/ --max-depth 3
+
+Self-check against a generated fixture site served by http.server (second
+crawl is all 304s, an interrupted crawl resumes, per-host limit and root
+boundary hold):
+    python src/web_crawler.py --self-check
+"""
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urldefrag, urlparse
+
+import aiohttp
+from langchain_core.documents import Document
+from langchain_core.utils.html import extract_sub_links
+
+from ingest_manifest import content_hash, in_scope
+from tracing import init_tracing, tracer
+
+# Configuration
+CRAWL_STATE_DIR = "data/crawl_state"
+CONCURRENCY = 16
+PER_HOST_CONCURRENCY = 4
+RATE_LIMIT = 0.0  # requests per second per host, 0 = unlimited
+TIMEOUT = 30
+STATE_SAVE_INTERVAL = 25  # pages between crawl state saves
+USER_AGENT = "AutoDoc-RAG-crawler/1.0"
+
+# Fixture site of --self-check: page -> relative links. The root URL is /docs
+# (index.html); missing.html is a 404 and /docs-old is outside the root.
+FIXTURE_PAGES = {
+    "index.html": ["p1.html", "p2.html", "p3.html", "p4.html", "p5.html", "p6.html",
+                   "missing.html", "/docs-old/index.html"],
+    "p1.html": ["sub/q1.html", "sub/q2.html"],
+    "p2.html": ["p3.html"],
+    "p3.html": [], "p4.html": [], "p5.html": [], "p6.html": [],
+    "sub/q1.html": ["../p1.html"], "sub/q2.html": [],
+}
+FIXTURE_DELAY = 0.05  # seconds per response, so concurrent requests overlap
+
+TITLE_PATTERN = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+LANG_PATTERN = re.compile(r"<html[^>]*\blang=[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+# documents is None when the page is known to be unchanged (status 'not_modified'
+# or 'resumed') or could not be fetched but was ingested before ('stale').
+CrawlPage = namedtuple("CrawlPage", ["url", "documents", "status"])
+
+_DONE = object()
+
+
+def state_path_for(root_url: str, state_dir: str = CRAWL_STATE_DIR) -> str:
+    """Crawl state file of a root URL."""
+    return os.path.join(state_dir, f"{hashlib.sha256(root_url.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def page_metadata(raw_html: str, url: str, content_type: str) -> dict:
+    """Document metadata in the shape RecursiveUrlLoader produced."""
+    metadata = {"source": url, "content_type": content_type}
+    title = TITLE_PATTERN.search(raw_html)
+    if title:
+        metadata["title"] = html.unescape(" ".join(title.group(1).split()))
+    lang = LANG_PATTERN.search(raw_html)
+    if lang:
+        metadata["language"] = lang.group(1)
+    return metadata
+
+
+class HostLimiter:
+    """Per-host concurrency cap and minimum interval between request starts."""
+
+    def __init__(self, concurrency: int, rate_limit: float):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.interval = 1.0 / rate_limit if rate_limit > 0 else 0.0
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self.lock:
+                now = time.monotonic()
+                wait = self.next_start - now
+                self.next_start = max(now, self.next_start) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class WebCrawler:
+    """
+    Breadth-first asyncio crawler below a root URL.
+
+    Args:
+        root_url: URL to start from; only links below it are followed.
+        extractor: Turns raw HTML into the page text (e.g. bs4_extractor), or into
+            (metadata, text) sections that become one document each
+            (e.g. html_extract.extract_sections).
+        max_depth: Maximum depth of links to follow (root page is depth 0).
+        concurrency: Maximum number of requests in flight overall.
+        per_host: Maximum number of requests in flight per host.
+        rate_limit: Maximum request starts per second per host (0 = unlimited).
+        timeout: Total timeout of one request in seconds.
+        manifest: Ingestion manifest. A stored page is only revalidated (or
+            skipped on resume) if the manifest holds exactly the content the
+            crawler last produced for it, so nothing that never reached the
+            vector store is skipped. None trusts the crawl state alone.
+        state_path: Crawl state file (default: derived from root_url).
+        resume: Continue an interrupted crawl from its saved frontier.
+    """
+
+    def __init__(self, root_url: str, extractor: Callable[[str], Union[str, List[Tuple[dict, str]]]],
+                 max_depth: int = 2,
+                 concurrency: int = CONCURRENCY, per_host: int = PER_HOST_CONCURRENCY,
+                 rate_limit: float = RATE_LIMIT, timeout: float = TIMEOUT,
+                 manifest: Optional[dict] = None, state_path: Optional[str] = None, resume: bool = True):
+        self.root_url = root_url
+        self.extractor = extractor
+        self.max_depth = max_depth
+        self.concurrency = max(1, concurrency)
+        self.per_host = per_host
+        self.rate_limit = rate_limit
+        self.timeout = timeout
+        self.manifest = manifest
+        self.state_path = state_path or state_path_for(root_url)
+        self.resume = resume
+        self.stats = {"fetched": 0, "not_modified": 0, "resumed": 0, "failed": 0, "skipped": 0}
+
+        self.pages: Dict[str, dict] = {}      # url -> {etag, last_modified, hash, links}
+        self.visited: Dict[str, int] = {}     # url -> depth, fully processed this crawl
+        self.pending: Dict[str, int] = {}     # url -> depth, queued or in flight
+        self._limiters: Dict[str, HostLimiter] = {}
+        self._since_save = 0
+
+    # -- crawl state ---------------------------------------------------------
+
+    def load_state(self) -> Dict[str, int]:
+        """Load validators and, when resuming, the saved frontier. Returns the frontier."""
+        frontier = {self.root_url: 0}
+        if not os.path.exists(self.state_path):
+            return frontier
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.pages = state.get("pages", {})
+        if self.resume and not state.get("complete", True) and state.get("max_depth") == self.max_depth:
+            frontier = dict(state.get("frontier", {}))
+            self.visited = dict(state.get("visited", {}))
+        return frontier
+
+    def save_state(self, complete: bool = False):
+        """Atomically persist validators, the visited set and the frontier."""
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        if complete:
+            # Forget pages that are no longer reachable from the root
+            self.pages = {url: entry for url, entry in self.pages.items() if url in self.visited}
+        state = {
+            "root": self.root_url,
+            "max_depth": self.max_depth,
+            "complete": complete,
+            "frontier": {} if complete else self.pending,
+            "visited": self.visited,
+            "pages": self.pages,
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def is_ingested(self, url: str) -> bool:
+        """True if the content last produced for this URL is what the manifest holds."""
+        entry = self.pages.get(url)
+        if not entry or not entry.get("hash"):
+            return False
+        if self.manifest is None:
+            return True
+        return self.manifest["sources"].get(url, {}).get("hash") == entry["hash"]
+
+    # -- fetching ------------------------------------------------------------
+
+    def _limiter(self, url: str) -> HostLimiter:
+        host = urlparse(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(self.per_host, self.rate_limit)
+        return self._limiters[host]
+
+    def _child_links(self, raw_html: str, url: str):
+        links = extract_sub_links(raw_html, url, base_url=self.root_url,
+                                  prevent_outside=True, continue_on_failure=True)
+        # prevent_outside is a plain prefix test; also stop at the root's path boundary
+        return sorted({urldefrag(link)[0] for link in links if in_scope(urldefrag(link)[0], self.root_url)})
+
+    def _failed_page(self, url: str, error: BaseException) -> CrawlPage:
+        self.stats["failed"] += 1
+        print(f"   ⚠️  {url}: {error}")
+        # Keep what was ingested before rather than purging it over a failed fetch
+        return CrawlPage(url, None, "stale" if self.is_ingested(url) else "failed")
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> CrawlPage:
+        with tracer.start_as_current_span("ingest.fetch", attributes={"url": url}) as span:
+            page = await self._fetch_page(session, url)
+            span.set_attribute("status", page.status)
+            span.set_attribute("documents", len(page.documents or []))
+            return page
+
+    async def _fetch_page(self, session: aiohttp.ClientSession, url: str) -> CrawlPage:
+        entry = self.pages.get(url, {})
+        headers = {}
+        if self.is_ingested(url):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            async with self._limiter(url):
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        self.stats["not_modified"] += 1
+                        return CrawlPage(url, None, "not_modified")
+                    response.raise_for_status()
+                    content_type = response.headers.get("Content-Type", "")
+                    if "html" not in content_type and "text/plain" not in content_type:
+                        self.stats["skipped"] += 1
+                        return CrawlPage(url, None, "skipped")
+                    raw_html = await response.text(errors="replace")
+                    final_url = str(response.url)
+                    validators = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+            return self._failed_page(url, e)
+
+        extracted = await asyncio.to_thread(self.extractor, raw_html)
+        metadata = page_metadata(raw_html, url, content_type)
+        if isinstance(extracted, str):
+            documents = [Document(page_content=extracted, metadata=metadata)]
+        else:
+            documents = [Document(page_content=text, metadata={**metadata, **section})
+                         for section, text in extracted] or [Document(page_content="", metadata=metadata)]
+        self.pages[url] = {
+            **validators,
+            "hash": content_hash(documents),
+            "links": self._child_links(raw_html, final_url),
+        }
+        self.stats["fetched"] += 1
+        return CrawlPage(url, documents, "fetched")
+
+    # -- crawl loop ----------------------------------------------------------
+
+    async def crawl(self, result_queue_size: int = 32) -> AsyncIterator[CrawlPage]:
+        """Yield every page below the root, fetched or known to be unchanged."""
+        frontier: asyncio.Queue = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue(maxsize=result_queue_size)
+
+        def enqueue(url: str, depth: int):
+            if depth < self.max_depth and url not in self.visited and url not in self.pending:
+                self.pending[url] = depth
+                frontier.put_nowait((url, depth))
+
+        # Resume: pages visited by the interrupted run are re-announced as
+        # unchanged if they reached the manifest, and fetched again otherwise.
+        resumed = []
+        for url, depth in self.load_state().items():
+            enqueue(url, depth)
+        for url, depth in list(self.visited.items()):
+            if self.is_ingested(url):
+                resumed.append(url)
+            else:
+                del self.visited[url]
+                enqueue(url, depth)
+
+        async def worker(session: aiohttp.ClientSession):
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    try:
+                        page = await self._fetch(session, url)
+                        if page.status != "failed":
+                            for link in self.pages.get(url, {}).get("links", []):
+                                enqueue(link, depth + 1)
+                    except Exception as e:
+                        # Extractor or link parsing errors fail this page, not the worker
+                        page = self._failed_page(url, e)
+                    await results.put(page)
+                    self.visited[url] = depth
+                    self.pending.pop(url, None)
+                    self._since_save += 1
+                    if self._since_save >= STATE_SAVE_INTERVAL:
+                        self._since_save = 0
+                        try:
+                            self.save_state()
+                        except OSError as e:
+                            print(f"   ⚠️  Could not save crawl state: {e}")
+                finally:
+                    frontier.task_done()
+
+        async def run():
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=max(1, self.per_host))
+            async with aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": USER_AGENT},
+            ) as session:
+                workers = [asyncio.create_task(worker(session)) for _ in range(self.concurrency)]
+                try:
+                    await frontier.join()
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+            await results.put(_DONE)
+
+        for url in resumed:
+            self.stats["resumed"] += 1
+            yield CrawlPage(url, None, "resumed")
+
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                page = await results.get()
+                if page is _DONE:
+                    break
+                yield page
+            await runner
+            self.save_state(complete=True)
+        finally:
+            if not runner.done():
+                runner.cancel()
+                self.save_state()
+
+    def iter_pages(self, queue_size: int = 32) -> Iterator[CrawlPage]:
+        """
+        Synchronous view of crawl(): the event loop runs in a background thread
+        and pages are handed over through a bounded queue.
+        """
+        buffer: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        async def produce():
+            async for page in self.crawl(queue_size):
+                await asyncio.to_thread(buffer.put, page)
+
+        def run():
+            try:
+                asyncio.run(produce())
+                buffer.put(_DONE)
+            except BaseException as e:
+                buffer.put(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def stats_line(self) -> str:
+        """One-line summary of the crawl counters."""
+        return (f"Crawler: {self.stats['fetched']} fetched, {self.stats['not_modified']} not modified, "
+                f"{self.stats['resumed']} resumed, {self.stats['failed']} failed, {self.stats['skipped']} skipped")
+
+
+def write_fixture_site(root: str):
+    """Write FIXTURE_PAGES below root/docs, plus a sibling root/docs-old the crawl must not enter."""
+    for path, links in list(FIXTURE_PAGES.items()) + [("../docs-old/index.html", [])]:
+        full_path = os.path.join(root, "docs", path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        anchors = "".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(f"<html><head><title>{path}</title></head><body><h1>{path}</h1>"
+                    f"<p>Fixture page {path}.</p><ul>{anchors}</ul></body></html>")
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Static file handler that records the peak number of concurrent requests."""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with FixtureHandler.lock:
+            FixtureHandler.active += 1
+            FixtureHandler.peak = max(FixtureHandler.peak, FixtureHandler.active)
+        try:
+            time.sleep(FIXTURE_DELAY)
+            super().do_GET()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the interrupted crawl closes its connections
+        finally:
+            with FixtureHandler.lock:
+                FixtureHandler.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def self_check(extractor, per_host: int = 2) -> bool:
+    """
+    Crawl a local fixture site (see FIXTURE_PAGES) and check the crawler's
+    guarantees. Pages are "ingested" into an in-memory manifest as they arrive.
+
+    Returns:
+        True if every check passed.
+    """
+    expected = len(FIXTURE_PAGES)
+    results = []
+
+    def check(name: str, passed: bool, detail: str):
+        results.append(passed)
+        print(f"{'✅' if passed else '❌'} {name}: {detail}")
+
+    def ingest(manifest: dict, page: CrawlPage):
+        if page.documents is not None:
+            manifest["sources"][page.url] = {"hash": content_hash(page.documents)}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        write_fixture_site(os.path.join(workdir, "site"))
+        server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                     partial(FixtureHandler, directory=os.path.join(workdir, "site")))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        root_url = f"http://127.0.0.1:{server.server_port}/docs"
+        manifest = {"sources": {}}
+
+        def crawler(name: str, **options) -> WebCrawler:
+            return WebCrawler(root_url, extractor, max_depth=3, concurrency=8, per_host=per_host,
+                              manifest=manifest, state_path=os.path.join(workdir, f"{name}.json"), **options)
+
+        try:
+            # 1. First crawl: every page fetched once, nothing outside the root
+            first = crawler("full")
+            for page in first.iter_pages():
+                ingest(manifest, page)
+            outside = [url for url in first.visited if not in_scope(url, root_url)]
+            check("first crawl", first.stats["fetched"] == expected and not outside,
+                  f"{first.stats_line()}, {len(outside)} pages outside {root_url}")
+            check("per-host limit", FixtureHandler.peak <= per_host,
+                  f"at most {FixtureHandler.peak} concurrent requests (limit {per_host})")
+
+            # 2. Second crawl: validators turn every page into a 304, nothing is re-extracted
+            second = crawler("full")
+            statuses = [page.status for page in second.iter_pages()]
+            check("second crawl", second.stats["fetched"] == 0 and second.stats["not_modified"] == expected,
+                  f"{second.stats_line()}, {statuses.count('fetched')} pages re-extracted")
+
+            # 3. Interrupted crawl: stop after two ingested pages, then resume from the saved frontier
+            manifest["sources"].clear()
+
+            async def interrupted(limit: int) -> list:
+                pages = []
+                crawl = crawler("resume", resume=False).crawl()
+                async for page in crawl:
+                    if page.documents is None:
+                        continue
+                    ingest(manifest, page)
+                    pages.append(page.url)
+                    if len(pages) == limit:
+                        break
+                await crawl.aclose()
+                return pages
+
+            consumed = asyncio.run(interrupted(2))
+            resumed = crawler("resume")
+            pages = [page for page in resumed.iter_pages()]
+            for page in pages:
+                ingest(manifest, page)
+            announced = [page.url for page in pages if page.status == "resumed"]
+            crawled = {page.url for page in pages if page.status != "failed"}
+            check("resumed crawl", set(announced) == set(consumed) and len(crawled) == expected,
+                  f"{len(consumed)} pages before the interruption, then {resumed.stats_line()}")
+        finally:
+            server.shutdown()
+            server.server_close()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl a documentation site without ingesting it (dry run)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python -m http.server 8000 --directory ground_truth/rust &
+    python src/web_crawler.py http://127.0.0.1:8000/ --max-depth 3
+    python src/web_crawler.py http://127.0.0.1:8000/ --max-depth 3   # second run: 304s
+    python src/web_crawler.py --self-check
+        """
+    )
+    parser.add_argument("url", nargs="?", help="Root URL to start crawling from")
+    parser.add_argument("--max-depth", type=int, default=2, help="Maximum depth of links to follow (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Requests in flight overall (default: {CONCURRENCY})")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY,
+                        help=f"Requests in flight per host (default: {PER_HOST_CONCURRENCY})")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="Requests per second per host, 0 for unlimited (default: 0)")
+    parser.add_argument("--restart", action="store_true", help="Ignore a saved frontier and crawl from the root")
+    parser.add_argument("--extractor", choices=["bs4", "lxml"], default="bs4",
+                        help="'bs4' (one document per page) or 'lxml' (streaming, one document per heading section)")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Crawl a generated local http.server site twice and check 304s, resume and limits")
+    args = parser.parse_args()
+    if not args.url and not args.self_check:
+        parser.error("a root URL or --self-check is required")
+    init_tracing("web_crawler")
+
+    from ingest_web import EXTRACTORS
+
+    if args.self_check:
+        if not self_check(EXTRACTORS[args.extractor], per_host=args.per_host):
+            sys.exit(1)
+        return
+
+    crawler = WebCrawler(args.url, EXTRACTORS[args.extractor], max_depth=args.max_depth, concurrency=args.concurrency,
+                         per_host=args.per_host, rate_limit=args.rate_limit, resume=not args.restart)
+    started = time.perf_counter()
+    for page in crawler.iter_pages():
+        size = sum(len(doc.page_content) for doc in page.documents or [])
+        print(f"[{page.status:>12}] {page.url} ({size} chars, {len(page.documents or [])} documents)")
+    elapsed = time.perf_counter() - started
+    print(f"\n{crawler.stats_line()} in {elapsed:.2f}s")
+    print(f"💾 Crawl state: {crawler.state_path}")
+
+
+if __name__ == "__main__":
+    main()